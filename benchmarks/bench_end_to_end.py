@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Measures insert, select and transaction throughput against a local
+database.
+
+:license: MIT, see LICENSE for details.
+"""
+import itertools
+
+from cuttle.reef import Cuttle
+
+from common import bench, heros_columns
+
+
+def make_db(sql_type, **kwargs):
+    """
+    Creates the benchmark database and returns the ``Cuttle`` object and the
+    ``Model`` subclass of its table.
+    """
+    db = Cuttle(sql_type, **kwargs)
+
+    class Heros(db.Model):
+        columns = heros_columns()
+
+    db.create_db(drop_existing=sql_type == 'mysql')
+    return db, Heros
+
+
+def run(sql_type='sqlite', number=2000, repeat=3, **kwargs):
+    """
+    Runs the end to end benchmarks and returns a list of results. The
+    database is dropped afterwards.
+
+    :param str sql_type: ``'sqlite'`` or ``'mysql'``.
+    :param \**kwargs: Arguments passed to ``Cuttle``.
+    """
+    db, Heros = make_db(sql_type, **kwargs)
+    counter = itertools.count(1)
+
+    def insert_commit():
+        with Heros() as heros:
+            heros.insert(['hero_name', 'power'], ['Goku', 9001])\
+                 .execute(commit=True)
+
+    def bulk_insert_1000():
+        with Heros() as heros:
+            heros.bulk_insert(['hero_name', 'power'],
+                              (('Hero', i) for i in range(1000)),
+                              commit=True)
+
+    def select_by_key():
+        with Heros() as heros:
+            heros.select().where(hero_id=next(counter) % number + 1)\
+                 .execute()
+            heros.fetchall()
+
+    def transaction_10():
+        with db.transaction() as t:
+            heros = Heros(transaction=t)
+            for i in range(10):
+                heros.insert(['hero_name', 'power'], ['Hero', i]).execute()
+
+    def writer_1000():
+        with db.writer(max_rows=500) as writer:
+            for i in range(1000):
+                writer.insert(Heros, ['hero_name', 'power'], ['Hero', i])
+
+    try:
+        return [
+            bench('end_to_end.insert_commit', insert_commit, number, repeat),
+            bench('end_to_end.bulk_insert_1000', bulk_insert_1000,
+                  max(number // 100, 1), repeat, rows=1000),
+            bench('end_to_end.select_by_key', select_by_key, number, repeat),
+            bench('end_to_end.transaction_10', transaction_10,
+                  max(number // 10, 1), repeat, rows=10),
+            bench('end_to_end.buffered_writer_1000', writer_1000,
+                  max(number // 100, 1), repeat, rows=1000),
+        ]
+    finally:
+        db.drop_db()
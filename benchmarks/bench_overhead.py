@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the pure-Python cost of building and running queries against an
+in-process fake driver.
+
+:license: MIT, see LICENSE for details.
+"""
+import functools
+
+from cuttle.reef import Cuttle
+
+import fakedb
+from common import bench, heros_columns
+
+
+def make_model(rows=1):
+    """
+    Returns a ``Model`` subclass whose connections come from the fake
+    driver.
+    """
+    db = Cuttle('mysql', db='bench')
+    # keep the pool class configured for MySQL but make fake connections
+    Pool = type(db.Model._pool)
+    db.Model._pool = Pool(functools.partial(fakedb.connect, rows), db='bench')
+
+    class Heros(db.Model):
+        columns = heros_columns()
+    return Heros
+
+
+def run(number=20000, repeat=3):
+    """
+    Runs the overhead benchmarks and returns a list of results.
+    """
+    Heros = make_model()
+    heros = Heros()
+    Wide = make_model(rows=1000)
+    wide = Wide()
+    columns = heros_columns()
+
+    def select():
+        heros.select('hero_name', 'power').where(hero_id=1)
+        heros.reset_query()
+
+    def insert():
+        heros.insert(['hero_name', 'power'], ['Goku', 9001])
+        heros.reset_query()
+
+    def update():
+        heros.update(hero_name='Gohan', power=10).where(hero_id=1)
+        heros.reset_query()
+
+    def where_chain():
+        heros.select().where(hero_id=1).where(condition='OR', power=3)
+        heros.reset_query()
+
+    def query():
+        heros.select().where(hero_id=1)
+        heros.query
+        heros.values
+        heros.reset_query()
+
+    def check_columns():
+        heros.check_columns('hero_id', 'hero_name', 'power')
+
+    def column_schema():
+        for column in columns:
+            column._column_schema()
+
+    def execute_fetchone():
+        heros.select().where(hero_id=1).execute()
+        heros.fetchone()
+
+    def execute_insert():
+        heros.insert(['hero_name', 'power'], ['Goku', 9001]).execute()
+
+    def fetchall_1000():
+        wide.select().execute()
+        wide.fetchall()
+
+    results = [
+        bench('overhead.select', select, number, repeat),
+        bench('overhead.insert', insert, number, repeat),
+        bench('overhead.update', update, number, repeat),
+        bench('overhead.where_chain', where_chain, number, repeat),
+        bench('overhead.query', query, number, repeat),
+        bench('overhead.check_columns', check_columns, number, repeat),
+        bench('overhead.column_schema', column_schema, number, repeat,
+              rows=len(columns)),
+        bench('overhead.execute_fetchone', execute_fetchone, number, repeat),
+        bench('overhead.execute_insert', execute_insert, number, repeat),
+        bench('overhead.fetchall_1000', fetchall_1000,
+              max(number // 100, 1), repeat, rows=1000),
+    ]
+
+    heros.close()
+    wide.close()
+    return results
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the benchmarks.
+
+:license: MIT, see LICENSE for details.
+"""
+import timeit
+
+from cuttle.reef import Column
+
+
+def heros_columns():
+    """
+    Returns the columns of the table used by the benchmarks.
+    """
+    return [
+        Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+        Column('hero_name', 'VARCHAR', maximum=16),
+        Column('power', 'INT'),
+        Column('alignment', 'VARCHAR', maximum=16)
+    ]
+
+
+def bench(name, func, number, repeat=3, rows=1):
+    """
+    Calls ``func`` ``number`` times, ``repeat`` times over, and returns a
+    dict with the results of the fastest run.
+
+    :param str name: The name of the benchmark.
+    :param func: The function to time.
+    :param int number: The number of calls per run.
+    :param int repeat: The number of runs.
+    :param int rows: The number of rows handled by each call.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return dict(name=name,
+                number=number,
+                seconds=best,
+                usec_per_op=best / number * 1e6,
+                ops_per_sec=number / best if best else float('inf'),
+                rows_per_sec=number * rows / best if best else float('inf'))
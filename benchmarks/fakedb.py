@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+An in-process DB-API driver which does no work, so benchmarks run against it
+measure only the overhead of Cuttle.
+
+:license: MIT, see LICENSE for details.
+"""
+
+
+def connect(rows=1, **kwargs):
+    """
+    Returns a ``Connection`` whose SELECT statements return ``rows`` rows.
+    """
+    return Connection(rows)
+
+
+class Connection(object):
+
+    client_flag = 0
+
+    def __init__(self, rows=1):
+        self.open = True
+        self.cursorclass = None
+        self._rows = tuple((i, 'Hero{}'.format(i)) for i in range(rows))
+
+    def cursor(self, cursorclass=None):
+        return Cursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+class Cursor(object):
+
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = ()
+        self._position = 0
+
+    def execute(self, query, args=None):
+        if query.lstrip()[:6].upper() == 'SELECT':
+            self.description = (('hero_id',), ('hero_name',))
+            self._rows = self.connection._rows
+        else:
+            self.description = None
+            self._rows = ()
+            self.lastrowid = 1
+        self._position = 0
+        self.rowcount = len(self._rows) or 1
+        return self.rowcount
+
+    def executemany(self, query, args):
+        count = 0
+        for values in args:
+            count += self.execute(query, values)
+        return count
+
+    def mogrify(self, query, args=None):
+        return query if args is None else query % tuple(args)
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=None):
+        start = self._position
+        self._position = min(start + (size or self.arraysize),
+                             len(self._rows))
+        return self._rows[start:self._position]
+
+    def fetchall(self):
+        start, self._position = self._position, len(self._rows)
+        return self._rows[start:]
+
+    def close(self):
+        self.connection = None
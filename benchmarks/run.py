@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Runs the Cuttle benchmarks and prints the results, optionally saving them as
+JSON so runs of different versions can be compared::
+
+  python benchmarks/run.py --output results.json
+  python benchmarks/run.py --suite end_to_end --sql-type mysql \\
+      --host localhost --user root --passwd secret
+
+:license: MIT, see LICENSE for details.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--suite', choices=['all', 'overhead', 'end_to_end'],
+                        default='all')
+    parser.add_argument('--output', help='file the JSON results are saved to')
+    parser.add_argument('--number', type=int, default=None,
+                        help='calls per run, defaults depend on the suite')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per benchmark, the fastest is kept')
+    parser.add_argument('--sql-type', choices=['sqlite', 'mysql'],
+                        default='sqlite')
+    parser.add_argument('--db', default='_cuttle_bench_db')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user')
+    parser.add_argument('--passwd')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # benchmark the checkout the script is in rather than an installed Cuttle
+    sys.path.insert(
+        0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import cuttle
+
+    import bench_end_to_end
+    import bench_overhead
+
+    args = parse_args(argv)
+    results = []
+
+    if args.suite in ('all', 'overhead'):
+        results.extend(bench_overhead.run(number=args.number or 20000,
+                                          repeat=args.repeat))
+
+    if args.suite in ('all', 'end_to_end'):
+        kwargs = dict(number=args.number or 2000, repeat=args.repeat)
+        directory = None
+        if args.sql_type == 'sqlite':
+            directory = tempfile.mkdtemp()
+            kwargs['db'] = os.path.join(directory, args.db)
+        else:
+            kwargs.update(db=args.db, host=args.host)
+            if args.user:
+                kwargs.update(user=args.user, passwd=args.passwd or '')
+        try:
+            results.extend(bench_end_to_end.run(args.sql_type, **kwargs))
+        finally:
+            if directory is not None:
+                shutil.rmtree(directory)
+
+    report = dict(cuttle=cuttle.__version__,
+                  python=platform.python_version(),
+                  implementation=platform.python_implementation(),
+                  platform=platform.platform(),
+                  sql_type=args.sql_type,
+                  time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  results=results)
+
+    for result in results:
+        print('{name:<36} {usec_per_op:>12.2f} us/op {ops_per_sec:>14.0f} '
+              'ops/s'.format(**result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains asyncio counterparts of ``Model`` and ``Transaction``.
+Blocking driver calls are run on a dedicated thread pool so many coroutines
+can share a small number of connections without blocking the event loop.
+
+The module requires Python 3.7+ and is not imported by the rest of Cuttle.
+
+:license: MIT, see LICENSE for details.
+"""
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
+from cuttle.transaction import Transaction
+
+# attributes of Model which block on the database and have no coroutine
+# counterpart on AsyncModel
+_BLOCKING_ATTRIBUTES = frozenset([
+    'connection',
+    'cursor',
+    'stream',
+    'iterate_by_key'
+])
+
+
+class AsyncPool(object):
+    """
+    A bounded, awaitable wrapper around the connection pool of a ``Cuttle``
+    object. Coroutines waiting for a connection are served in the order they
+    started waiting.
+
+    :param pool: The ``CuttlePool`` connections are taken from.
+    :param int size: The maximum number of connections in use at once.
+                     Defaults to the capacity of ``pool``.
+    :param executor: The ``concurrent.futures.Executor`` blocking calls run
+                     on. Defaults to a ``ThreadPoolExecutor`` with one thread
+                     per connection.
+
+    :raises ValueError: If size < 1.
+    """
+
+    def __init__(self, pool, size=None, executor=None):
+        if size is None:
+            size = pool._capacity
+        if size < 1:
+            raise ValueError('async pool requires a size of 1+ connections')
+
+        self._pool = pool
+        self._size = size
+        self._in_use = 0
+        self._waiters = collections.deque()
+
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(size)
+
+    @property
+    def size(self):
+        """
+        Returns the maximum number of connections in use at once.
+        """
+        return self._size
+
+    @property
+    def in_use(self):
+        """
+        Returns the number of connections currently in use.
+        """
+        return self._in_use
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs ``func`` on the executor and returns its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def acquire(self):
+        """
+        Returns a ``PoolConnection`` once one is available.
+        """
+        if self._in_use < self._size and not self._waiters:
+            self._in_use += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # pass the slot on if it was handed over as we were cancelled
+                if waiter.done() and not waiter.cancelled():
+                    self._release_slot()
+                raise
+
+        try:
+            return await self.run(self._pool.get_connection)
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def release(self, connection):
+        """
+        Returns ``connection`` to the pool and wakes the next waiting
+        coroutine, if any.
+
+        :param connection: A ``PoolConnection`` returned by ``acquire()``.
+        """
+        try:
+            connection.close()
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        """
+        Hands the slot of a released connection to the first waiter that is
+        still waiting or frees it.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_use -= 1
+
+    def close(self):
+        """
+        Shuts down the executor if it was created by the pool.
+        """
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+
+class AsyncTransaction(object):
+    """
+    The asyncio counterpart of ``Transaction``. It acquires a connection when
+    entered and commits, or rolls back if an exception was raised, when
+    exited::
+
+      async with adb.transaction() as t:
+          heros = adb.model(Heros, t)
+          await heros.insert(['hero_name'], ['Goku']).execute()
+
+    :param obj pool: An ``AsyncPool`` object.
+    :param bool pipeline: Queues write statements if ``True``. See
+                          :class:`~cuttle.transaction.Transaction`. Defaults
+                          to ``False``.
+    """
+
+    def __init__(self, pool, pipeline=False):
+        self._pool = pool
+        self._pipeline = pipeline
+        self._connection = None
+        self._transaction = None
+        # statements of models sharing the transaction share one cursor
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.begin()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type:
+                await self.rollback()
+            else:
+                await self.commit()
+        finally:
+            self.end()
+
+    async def begin(self):
+        """Acquires the connection used by the transaction."""
+        if self._transaction is None:
+            self._connection = await self._pool.acquire()
+            self._transaction = Transaction(self._connection,
+                                            pipeline=self._pipeline)
+
+    async def flush(self):
+        """Sends any queued statements and returns their results."""
+        async with self._lock:
+            return await self._pool.run(self._transaction.flush)
+
+    async def commit(self):
+        """Commits the transaction and returns the results of statements."""
+        async with self._lock:
+            return await self._pool.run(self._transaction.commit)
+
+    async def rollback(self):
+        """Rolls back the transaction."""
+        async with self._lock:
+            await self._pool.run(self._transaction.rollback)
+
+    def end(self):
+        """Ends the transaction and releases the connection."""
+        if self._transaction is not None:
+            self._transaction._connection = None
+            self._transaction = None
+            self._pool.release(self._connection)
+            self._connection = None
+
+
+class AsyncModel(object):
+    """
+    The asyncio counterpart of a ``Model`` object. Query methods such as
+    ``select()`` and ``where()``, including custom ones, are called as usual
+    and can be chained, while methods that talk to the database are
+    coroutines::
+
+      async with adb.model(Heros) as heros:
+          await heros.select().where(hero_id=1).execute()
+          async for row in heros:
+              print(row)
+
+    A connection is acquired on first use and held until the model is closed.
+    The rows of queries split by ``where_in()`` are fetched one chunk at a
+    time on that connection. ``stream()``, ``iterate_by_key()`` and the
+    ``connection`` and ``cursor`` of the model are not available as they
+    would block the event loop.
+
+    :param obj model: The ``Model`` object queries are built with.
+    :param obj pool: An ``AsyncPool`` object.
+    :param obj transaction: An ``AsyncTransaction`` object, if any.
+    """
+
+    #: The number of rows fetched at a time when iterating.
+    iter_batch_size = 100
+
+    def __init__(self, model, pool, transaction=None):
+        self._model = model
+        self._pool = pool
+        self._transaction = transaction
+        self._connection = None
+
+    def __getattr__(self, attr):
+        if attr in _BLOCKING_ATTRIBUTES:
+            raise AttributeError('{} is not supported by AsyncModel as it '
+                                 'blocks the event loop'.format(attr))
+
+        value = getattr(self._model, attr)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def method(*args, **kwargs):
+            rv = value(*args, **kwargs)
+            # keep query methods chainable on the async model
+            return self if rv is self._model else rv
+        return method
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            rows = await self.fetchmany(self.iter_batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+    async def _run(self, func, *args):
+        """
+        Runs a blocking method of the model on the executor.
+        """
+        if self._transaction is not None:
+            async with self._transaction._lock:
+                return await self._pool.run(func, *args)
+
+        if self._connection is None:
+            self._connection = await self._pool.acquire()
+            self._model._connection = self._connection
+        return await self._pool.run(func, *args)
+
+    async def execute(self, commit=False):
+        """
+        Executes the query. See :func:`~cuttle.model.Model.execute`.
+        """
+        if self._model._split is not None:
+            # run the chunks on the connection of the model so they stay
+            # within the AsyncPool
+            self._model._split.parallel = 1
+        return await self._run(self._model.execute, commit)
+
+    async def executemany(self, commit=False):
+        """
+        Executes the query with multiple values. See
+        :func:`~cuttle.model.Model.executemany`.
+        """
+        return await self._run(self._model.executemany, commit)
+
+    async def bulk_insert(self, columns, rows, **kwargs):
+        """
+        Inserts rows with multi-row INSERT statements. See
+        :func:`~cuttle.model.Model.bulk_insert`.
+        """
+        return await self._run(
+            functools.partial(self._model.bulk_insert, columns, rows,
+                              **kwargs))
+
+    async def upsert(self, columns, rows, **kwargs):
+        """
+        Inserts or updates rows with multi-row statements. See
+        :func:`~cuttle.model.Model.upsert`.
+        """
+        return await self._run(
+            functools.partial(self._model.upsert, columns, rows, **kwargs))
+
+    async def load(self, columns, rows, commit=False):
+        """
+        Loads rows with ``LOAD DATA LOCAL INFILE``. See
+        :func:`~cuttle.model.Model.load`.
+        """
+        return await self._run(
+            functools.partial(self._model.load, columns, rows, commit))
+
+    async def explain(self, analyze=False):
+        """
+        Explains the query. See :func:`~cuttle.model.Model.explain`.
+        """
+        return await self._run(self._model.explain, analyze)
+
+    async def fetchone(self):
+        """
+        Fetches the next row.
+        """
+        return await self._run(self._model.fetchone)
+
+    async def fetchmany(self, size=None):
+        """
+        Fetches ``size`` number of rows or all if ``size`` is ``None``.
+        """
+        return await self._run(self._model.fetchmany, size)
+
+    async def fetchall(self):
+        """
+        Fetches all the rows in the cursor.
+        """
+        return await self._run(self._model.fetchall)
+
+    async def fetch_columns(self, batch_size=10000, use_numpy=None):
+        """
+        Fetches the remaining rows column by column. See
+        :func:`~cuttle.model.Model.fetch_columns`.
+        """
+        return await self._run(
+            functools.partial(self._model.fetch_columns, batch_size,
+                              use_numpy))
+
+    async def commit(self):
+        """
+        Commits changes, or the transaction if the model is part of one.
+        """
+        if self._transaction is not None:
+            await self._transaction.commit()
+        else:
+            await self._run(self._model.commit)
+
+    async def rollback(self):
+        """
+        Rolls back the current transaction.
+        """
+        if self._transaction is not None:
+            await self._transaction.rollback()
+        else:
+            await self._run(self._model.rollback)
+
+    async def close(self):
+        """
+        Closes the cursor and releases the connection, if any.
+        """
+        self._model._close_cursor()
+        self._model._close_replica()
+        if self._connection is not None:
+            # validation may have replaced the connection the model holds
+            connection = self._model._connection
+            self._model._connection = None
+            self._connection = None
+            self._pool.release(connection)
+
+
+class AsyncCuttle(object):
+    """
+    Gives asyncio access to the database of a ``Cuttle`` object.
+
+    :param obj db: A ``Cuttle`` object.
+    :param int size: The maximum number of connections in use at once.
+                     Defaults to the capacity of the connection pool.
+    :param executor: The ``concurrent.futures.Executor`` blocking calls run
+                     on. Defaults to a ``ThreadPoolExecutor`` with one thread
+                     per connection.
+    """
+
+    def __init__(self, db, size=None, executor=None):
+        self._db = db
+        self._pool = AsyncPool(db.Model._pool, size=size, executor=executor)
+
+    @property
+    def pool(self):
+        """
+        Returns the ``AsyncPool`` object.
+        """
+        return self._pool
+
+    def model(self, model, transaction=None, **kwargs):
+        """
+        Returns an ``AsyncModel`` object for the ``Model`` subclass ``model``.
+
+        :param model: A ``Model`` subclass.
+        :param obj transaction: An entered ``AsyncTransaction`` object.
+        :param \**kwargs: Arguments passed to ``model``.
+
+        :raises ValueError: If the transaction hasn't been entered.
+        """
+        # replica connections aren't bounded by the AsyncPool
+        kwargs.setdefault('use_replicas', False)
+        if transaction is not None:
+            if transaction._transaction is None:
+                raise ValueError('the transaction must be entered before '
+                                 'models are made with it')
+            kwargs['transaction'] = transaction._transaction
+        return AsyncModel(model(**kwargs), self._pool, transaction)
+
+    def transaction(self, pipeline=False):
+        """
+        Returns an ``AsyncTransaction`` object.
+
+        :param bool pipeline: Queues write statements if ``True``. Defaults to
+                              ``False``.
+        """
+        return AsyncTransaction(self._pool, pipeline=pipeline)
+
+    def close(self):
+        """
+        Shuts down the executor if it was created by the pool.
+        """
+        self._pool.close()
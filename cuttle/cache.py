@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the caches used by Cuttle.
+
+:license: MIT, see LICENSE for details.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class StatementCache(object):
+    """
+    A bounded least recently used cache for compiled SQL statements.
+
+    :param int maxsize: The maximum number of statements held. Defaults to
+                        ``128``.
+
+    :raises ValueError: If maxsize < 0.
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 0:
+            raise ValueError('cache maxsize must be non negative')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._statements)
+
+    def get(self, key):
+        """
+        Returns the statement stored under ``key`` or ``None`` if it isn't
+        cached.
+
+        :param key: A hashable description of the query shape.
+        """
+        with self._lock:
+            try:
+                statement = self._statements.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            # reinsert to mark the statement as most recently used
+            self._statements[key] = statement
+            self.hits += 1
+            return statement
+
+    def put(self, key, statement):
+        """
+        Stores ``statement`` under ``key``, evicting the least recently used
+        statement if the cache is full.
+
+        :param key: A hashable description of the query shape.
+        :param str statement: The compiled SQL statement.
+        """
+        if self.maxsize == 0:
+            return
+
+        with self._lock:
+            self._statements.pop(key, None)
+            self._statements[key] = statement
+            if len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all statements and resets the counters.
+        """
+        with self._lock:
+            self._statements.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Returns a dict with the hits, misses, current size and maxsize of the
+        cache.
+        """
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._statements), maxsize=self.maxsize)
+
+
+class ResultCache(object):
+    """
+    A bounded least recently used cache for the rows returned by read
+    queries. Entries are tagged with the table they were read from so every
+    entry of a table can be invalidated at once when the table is written to,
+    and may expire after a time to live.
+
+    :param int maxsize: The maximum number of results held. Defaults to
+                        ``1024``.
+
+    :raises ValueError: If maxsize < 0.
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 0:
+            raise ValueError('cache maxsize must be non negative')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        self._results = OrderedDict()
+        self._tables = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def generation(self, table):
+        """
+        Returns a number which changes every time ``table`` is invalidated.
+        Passing it to ``put()`` keeps a result read before an invalidation
+        from being cached after it.
+
+        :param str table: The name of the table.
+        """
+        return self._generations.get(table, 0)
+
+    def get(self, key):
+        """
+        Returns a tuple of the description and rows stored under ``key`` or
+        ``None`` if they aren't cached or have expired.
+
+        :param key: A hashable ``(query, values)`` tuple.
+        """
+        with self._lock:
+            try:
+                entry = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+
+            table, expires, description, rows = entry
+            if expires is not None and expires <= time.time():
+                self._untag(table, key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # reinsert to mark the result as most recently used
+            self._results[key] = entry
+            self.hits += 1
+            return description, rows
+
+    def put(self, key, table, description, rows, ttl=None, generation=None):
+        """
+        Stores a result under ``key``, evicting the least recently used
+        result if the cache is full.
+
+        :param key: A hashable ``(query, values)`` tuple.
+        :param str table: The name of the table the result was read from.
+        :param tuple description: The description of the cursor.
+        :param tuple rows: The rows of the result.
+        :param float ttl: The number of seconds the result is valid for, or
+                          ``None`` if it doesn't expire.
+        :param int generation: The ``generation()`` of the table before the
+                               query was executed. The result is not stored
+                               if the table has been invalidated since.
+        """
+        if self.maxsize == 0:
+            return
+
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            if (generation is not None and
+                    generation != self._generations.get(table, 0)):
+                return
+
+            if key in self._results:
+                self._untag(self._results.pop(key)[0], key)
+            self._results[key] = (table, expires, description, rows)
+            self._tables.setdefault(table, set()).add(key)
+
+            while len(self._results) > self.maxsize:
+                old_key, entry = self._results.popitem(last=False)
+                self._untag(entry[0], old_key)
+
+    def invalidate(self, table):
+        """
+        Removes every result read from ``table``.
+
+        :param str table: The name of the table.
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in self._tables.pop(table, ()):
+                del self._results[key]
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Removes all results and resets the counters.
+        """
+        with self._lock:
+            self._results.clear()
+            self._tables.clear()
+            self.hits = self.misses = 0
+            self.expirations = self.invalidations = 0
+
+    def info(self):
+        """
+        Returns a dict with the hits, misses, hit rate, expirations,
+        invalidations, current size and maxsize of the cache.
+        """
+        lookups = self.hits + self.misses
+        return dict(hits=self.hits, misses=self.misses,
+                    hit_rate=float(self.hits) / lookups if lookups else 0.0,
+                    expirations=self.expirations,
+                    invalidations=self.invalidations,
+                    size=len(self._results), maxsize=self.maxsize)
+
+    def _untag(self, table, key):
+        """
+        Removes ``key`` from the keys of ``table``.
+        """
+        keys = self._tables.get(table)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tables[table]
+
+
+class CachedResult(object):
+    """
+    Serves rows of a cached result through the fetch methods of a cursor.
+
+    :param tuple description: The description of the cursor the rows were
+                              fetched from.
+    :param tuple rows: The rows.
+    """
+
+    arraysize = 1
+
+    def __init__(self, description, rows):
+        self.description = description
+        self.rowcount = len(rows)
+        self._rows = rows
+        self._position = 0
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=None):
+        start = self._position
+        self._position = min(start + (size or self.arraysize), len(self._rows))
+        return self._rows[start:self._position]
+
+    def fetchall(self):
+        start, self._position = self._position, len(self._rows)
+        return self._rows[start:]
+
+    def close(self):
+        self._position = len(self._rows)
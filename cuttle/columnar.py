@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains helpers for fetching results column by column into
+typed arrays.
+
+:license: MIT, see LICENSE for details.
+"""
+from array import array
+from collections import OrderedDict
+
+from cuttle.columns import (FIXED_POINT_TYPES, FLOATING_POINT_TYPES,
+                            INTEGER_TYPES)
+
+
+def typecode(column_type):
+    """
+    Returns the ``array`` typecode used to store values of ``column_type`` or
+    ``None`` if the values are kept in a list. Fixed point values are stored
+    as floats.
+
+    :param str column_type: The data type of the column.
+    """
+    column_type = (column_type or '').upper()
+    if column_type in INTEGER_TYPES:
+        return 'q'
+    if column_type in FLOATING_POINT_TYPES or column_type in FIXED_POINT_TYPES:
+        return 'd'
+    return None
+
+
+def fetch_columns(cursor, types, batch_size=10000, use_numpy=None):
+    """
+    Fetches the remaining rows of ``cursor`` column by column and returns an
+    ``OrderedDict`` mapping each column name to a tuple of its values and a
+    null mask.
+
+    Numeric columns are stored in ``array.array`` buffers with nulls stored as
+    ``0``, other columns in lists. The null mask is a ``bytearray`` where
+    ``1`` marks a null. If NumPy is used, values and masks are returned as
+    NumPy arrays sharing the memory of the buffers.
+
+    :param cursor: A cursor a query has been executed on.
+    :param dict types: Maps column names to their data type.
+    :param int batch_size: The number of rows fetched at a time. Defaults to
+                           ``10000``.
+    :param bool use_numpy: Returns NumPy arrays if ``True``. If ``None``,
+                           NumPy arrays are returned when NumPy is installed.
+                           Defaults to ``None``.
+
+    :raises ImportError: If use_numpy is ``True`` and NumPy isn't installed.
+    :raises ValueError: If batch_size < 1 or no query has been executed.
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size must be at least 1')
+    if cursor.description is None:
+        raise ValueError('no result set to fetch columns from')
+
+    numpy = None
+    if use_numpy or use_numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            if use_numpy:
+                raise
+
+    names = [d[0] for d in cursor.description]
+    codes = [typecode(types.get(name)) for name in names]
+    values = [array(code) if code else [] for code in codes]
+    masks = [bytearray() for __ in names]
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+
+        for idx, code in enumerate(codes):
+            column = [row[idx] for row in rows]
+            if None in column:
+                masks[idx].extend(v is None for v in column)
+                if code:
+                    column = [0 if v is None else v for v in column]
+            else:
+                masks[idx].extend(bytearray(len(column)))
+            values[idx].extend(column)
+
+    columns = OrderedDict()
+    for name, code, column, mask in zip(names, codes, values, masks):
+        if numpy is not None:
+            if code:
+                column = _numpy_view(numpy, column, column.typecode)
+            else:
+                column = numpy.array(column, dtype=object)
+            mask = _numpy_view(numpy, mask, numpy.bool_)
+        columns[name] = (column, mask)
+
+    return columns
+
+
+def _numpy_view(numpy, buf, dtype):
+    """
+    Returns a NumPy array sharing the memory of ``buf``.
+    """
+    if not len(buf):
+        return numpy.empty(0, dtype=dtype)
+    return numpy.frombuffer(buf, dtype=dtype)
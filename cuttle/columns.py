@@ -6,6 +6,28 @@ This module contains the Column class for specifying table columns.
 """
 import decimal
 
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2 has no read-only view of a dict
+    from collections import Mapping
+
+    class MappingProxyType(Mapping):
+
+        __slots__ = ('_mapping',)
+
+        def __init__(self, mapping):
+            self._mapping = mapping
+
+        def __getitem__(self, key):
+            return self._mapping[key]
+
+        def __iter__(self):
+            return iter(self._mapping)
+
+        def __len__(self):
+            return len(self._mapping)
+
 
 INTEGER_TYPES = [
     'INTEGER',
@@ -64,21 +86,49 @@ class Column(object):
                              Defaults to ``False``.
     """
 
+    __slots__ = (
+        '_name',
+        '_column_type',
+        '_maximum',
+        '_precision',
+        '_required',
+        '_unique',
+        '_auto_increment',
+        '_default',
+        '_update',
+        '_primary_key'
+    )
+
     def __init__(self, name, column_type, maximum=None, precision=None,
                  required=False, unique=False, auto_increment=False,
                  default=None, update=None, primary_key=False):
-        #: Contains values specifying column parameters.
-        self._attributes = dict(
-            name=name.lower(),
-            column_type=column_type.upper(),
-            maximum=maximum,
-            precision=precision,
-            required=required,
-            unique=unique,
-            auto_increment=auto_increment,
-            default=self._format_default(column_type, default),
-            update=update,
-            primary_key=primary_key
+        self._name = name.lower()
+        self._column_type = column_type.upper()
+        self._maximum = maximum
+        self._precision = precision
+        self._required = required
+        self._unique = unique
+        self._auto_increment = auto_increment
+        self._default = self._format_default(column_type, default)
+        self._update = update
+        self._primary_key = primary_key
+
+    @property
+    def _attributes(self):
+        """
+        Returns a dict of the values specifying column parameters.
+        """
+        return dict(
+            name=self._name,
+            column_type=self._column_type,
+            maximum=self._maximum,
+            precision=self._precision,
+            required=self._required,
+            unique=self._unique,
+            auto_increment=self._auto_increment,
+            default=self._default,
+            update=self._update,
+            primary_key=self._primary_key
         )
 
     @property
@@ -86,7 +136,21 @@ class Column(object):
         """
         Returns the name of the column in lower case.
         """
-        return self._attributes['name']
+        return self._name
+
+    @property
+    def column_type(self):
+        """
+        Returns the data type of the column in upper case.
+        """
+        return self._column_type
+
+    @property
+    def primary_key(self):
+        """
+        Returns ``True`` if the column is the primary key of the table.
+        """
+        return self._primary_key
 
     def _format_default(self, column_type, default):
         """
@@ -104,39 +168,219 @@ class Column(object):
 
         return default
 
-    def _column_schema(self):
+    def _type_schema(self, sql_type='mysql'):
+        """
+        Generates the data type of the column schema.
+
+        :param str sql_type: The SQL implementation the schema is written for.
+                             Defaults to ``'mysql'``.
+
+        :raises ValueError: If an auto incremented column is not the primary
+                            key of a SQLite table.
+        """
+        # SQLite only auto increments an INTEGER PRIMARY KEY (a rowid alias)
+        if sql_type == 'sqlite' and self._auto_increment:
+            if not self._primary_key:
+                raise ValueError('SQLite can only auto increment the primary '
+                                 'key')
+            return 'INTEGER'
+
+        if self._maximum is not None:
+            return '{}({})'.format(self._column_type, self._maximum)
+        elif self._precision is not None:
+            return '{}{}'.format(self._column_type, self._precision)
+        return self._column_type
+
+    def _column_schema(self, sql_type='mysql', constraints=True):
         """
         Generates column schema.
+
+        :param str sql_type: The SQL implementation the schema is written for.
+                             Defaults to ``'mysql'``.
+        :param bool constraints: Includes the UNIQUE and PRIMARY KEY
+                                 constraints if ``True``. Defaults to
+                                 ``True``.
+
+        :raises ValueError: If an auto incremented column is not the primary
+                            key of a SQLite table.
         """
-        create_col = [self.name]
-
-        # add attributes
-        if self._attributes['maximum'] is not None:
-            create_col.append('{}({})'.format(
-                self._attributes['column_type'],
-                self._attributes['maximum']))
-        elif self._attributes['precision'] is not None:
-            create_col.append('{}{}'.format(
-                self._attributes['column_type'],
-                self._attributes['precision']))
-        else:
-            create_col.append(self._attributes['column_type'])
-
-        if self._attributes['required']:
+        sqlite = sql_type == 'sqlite'
+        create_col = [self.name, self._type_schema(sql_type)]
+
+        if self._required:
             create_col.append('NOT NULL')
-        if self._attributes['unique']:
+        if self._unique and constraints:
             create_col.append('UNIQUE')
-        if self._attributes['auto_increment']:
+        if self._auto_increment and not sqlite:
             create_col.append('AUTO_INCREMENT')
-        if self._attributes['default'] is not None:
+        if self._default is not None:
             create_col.append(
-                'DEFAULT {}'.format(self._attributes['default']))
-        if self._attributes['update'] is not None:
+                'DEFAULT {}'.format(self._default))
+        # SQLite has no ON UPDATE clause for columns
+        if self._update is not None and not sqlite:
             create_col.append(
-                'ON UPDATE {}'.format(self._attributes['update']))
-        if self._attributes['primary_key']:
+                'ON UPDATE {}'.format(self._update))
+        if self._primary_key and constraints:
             create_col.append('PRIMARY KEY')
+        if self._auto_increment and sqlite:
+            create_col.append('AUTOINCREMENT')
 
         create_col[-1] += ',\n'
 
         return ' '.join(create_col)
+
+
+class ColumnIndex(object):
+    """
+    An index of the columns of a ``Model`` subclass. It is built once when the
+    class is defined so queries don't have to walk ``columns``, and is shared
+    by every model of the class, so its lookups are read-only.
+
+    :param columns: A sequence of ``Column`` objects.
+    """
+
+    __slots__ = (
+        'columns',
+        'names',
+        'by_name',
+        'positions',
+        'types',
+        'primary_key'
+    )
+
+    def __init__(self, columns=()):
+        #: The ``Column`` objects in the order they were declared.
+        self.columns = tuple(columns)
+        #: The lower case column names.
+        self.names = frozenset(column.name for column in self.columns)
+        #: Maps column names to ``Column`` objects.
+        self.by_name = MappingProxyType(
+            dict((column.name, column) for column in self.columns))
+        #: Maps column names to their ordinal position.
+        self.positions = MappingProxyType(
+            dict((column.name, idx)
+                 for idx, column in enumerate(self.columns)))
+        #: Maps column names to their data type.
+        self.types = MappingProxyType(
+            dict((column.name, column.column_type)
+                 for column in self.columns))
+        #: The primary key ``Column``, if any.
+        self.primary_key = next((column for column in self.columns
+                                 if column.primary_key), None)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.columns)
+
+
+class Index(object):
+    """
+    The Index class represents a secondary index of a table. Indexes are
+    declared in the ``indexes`` list of a ``Model`` subclass and created with
+    the table.
+
+    :param columns: The name of the indexed column or a sequence of names for
+                    a composite index. A ``(name, length)`` tuple indexes only
+                    the first ``length`` characters of the column (a prefix
+                    index).
+    :param str name: Name of index. Defaults to ``ix_`` followed by the table
+                     and column names.
+    :param bool unique: Requires values entered into the indexed columns are
+                        unique. Defaults to ``False``.
+    :param bool fulltext: Creates a FULLTEXT index. Defaults to ``False``.
+
+    :raises ValueError: If no columns are given or the index is both unique
+                        and FULLTEXT.
+    """
+
+    __slots__ = (
+        '_columns',
+        '_name',
+        '_unique',
+        '_fulltext'
+    )
+
+    def __init__(self, columns, name=None, unique=False, fulltext=False):
+        # a single column, either a name or a (name, length) tuple
+        if isinstance(columns, str) or (isinstance(columns, tuple) and
+                                        len(columns) == 2 and
+                                        isinstance(columns[1], int)):
+            columns = [columns]
+        if not columns:
+            raise ValueError('An index requires at least one column')
+        if unique and fulltext:
+            raise ValueError('An index can not be both unique and FULLTEXT')
+
+        self._columns = tuple(
+            (column[0].lower(), column[1]) if isinstance(column, tuple)
+            else (column.lower(), None) for column in columns)
+        self._name = name.lower() if name is not None else None
+        self._unique = unique
+        self._fulltext = fulltext
+
+    @property
+    def columns(self):
+        """
+        Returns a tuple of the lower case names of the indexed columns.
+        """
+        return tuple(column for column, __ in self._columns)
+
+    @property
+    def unique(self):
+        """
+        Returns ``True`` if the index is unique.
+        """
+        return self._unique
+
+    @property
+    def fulltext(self):
+        """
+        Returns ``True`` if the index is a FULLTEXT index.
+        """
+        return self._fulltext
+
+    def index_name(self, table):
+        """
+        Returns the name of the index on ``table``.
+
+        :param str table: The name of the table.
+        """
+        if self._name is not None:
+            return self._name
+        return 'ix_{}_{}'.format(table, '_'.join(self.columns))
+
+    def _index_schema(self, table, sql_type='mysql'):
+        """
+        Generates index schema. MySQL indexes are defined in the CREATE TABLE
+        statement of the table, SQLite indexes with a CREATE INDEX statement
+        of their own.
+
+        :param str table: The name of the table.
+        :param str sql_type: The SQL implementation the schema is written for.
+                             Defaults to ``'mysql'``.
+
+        :raises ValueError: If a FULLTEXT index is created on SQLite.
+        """
+        if sql_type == 'sqlite':
+            if self._fulltext:
+                raise ValueError('SQLite does not support FULLTEXT indexes')
+            # SQLite has no prefix indexes, the whole column is indexed
+            return 'CREATE {}INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                'UNIQUE ' if self._unique else '',
+                self.index_name(table),
+                table,
+                ', '.join(self.columns))
+
+        parts = []
+        for column, length in self._columns:
+            if length is not None:
+                column = '{}({})'.format(column, length)
+            parts.append(column)
+
+        kind = 'UNIQUE ' if self._unique else \
+            'FULLTEXT ' if self._fulltext else ''
+
+        return '{}INDEX {} ({})'.format(kind, self.index_name(table),
+                                        ', '.join(parts))
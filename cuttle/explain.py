@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the QueryPlan returned by ``Model.explain()`` and the
+PlanChecker hook which explains each query shape once and reports full table
+scans, filesorts and temporary tables.
+
+:license: MIT, see LICENSE for details.
+"""
+from collections import namedtuple
+import re
+import threading
+import warnings
+
+from cuttle.hooks import StatementHook
+from cuttle.stats import fingerprint
+
+#: One step of a query plan. ``rows`` is the estimated number of rows
+#: examined, or ``None`` if the database doesn't estimate it.
+PlanStep = namedtuple('PlanStep', ['table', 'access', 'key', 'rows',
+                                   'full_scan', 'filesort', 'temporary',
+                                   'detail'])
+
+#: Statements which can be explained.
+EXPLAINABLE_STATEMENTS = (
+    'SELECT',
+    'UPDATE',
+    'DELETE'
+)
+
+_SQLITE_STEP = re.compile(
+    r'^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS \S+)?'
+    r'(?: USING (?:COVERING )?'
+    r'(?:INDEX (\S+)|(INTEGER PRIMARY KEY|PRIMARY KEY)))?')
+
+
+class QueryPlanWarning(UserWarning):
+    """
+    Warns about a query whose plan has full table scans, filesorts or
+    temporary tables.
+    """
+
+
+class QueryPlanError(Exception):
+    """
+    Raised by a failing ``PlanChecker`` for a query whose plan has full table
+    scans, filesorts or temporary tables.
+    """
+
+
+class QueryPlan(object):
+    """
+    The plan of a query, as returned by :func:`~cuttle.model.Model.explain`.
+
+    :param str query: The explained query string.
+    :param tuple values: The values of the query.
+    :param list steps: The ``PlanStep`` tuples of the plan in the order the
+                       database reported them.
+    :param list rows: The rows returned by EXPLAIN as dicts.
+    :param str analyze: The output of EXPLAIN ANALYZE, if it was run.
+    """
+
+    def __init__(self, query, values, steps, rows, analyze=None):
+        self.query = query
+        self.values = values
+        self.steps = steps
+        self.rows = rows
+        self.analyze = analyze
+
+    def __repr__(self):
+        return '<QueryPlan {!r}: {}>'.format(
+            self.query, ', '.join(step.detail for step in self.steps))
+
+    @property
+    def full_scans(self):
+        """
+        Returns the steps which scan a whole table.
+        """
+        return [step for step in self.steps if step.full_scan]
+
+    @property
+    def filesorts(self):
+        """
+        Returns the steps which sort rows outside of an index.
+        """
+        return [step for step in self.steps if step.filesort]
+
+    @property
+    def temporary_tables(self):
+        """
+        Returns the steps which use a temporary table.
+        """
+        return [step for step in self.steps if step.temporary]
+
+    def problems(self, row_threshold=0):
+        """
+        Returns a list of strings describing the full table scans, filesorts
+        and temporary tables of the plan which examine at least
+        ``row_threshold`` rows. Steps without a row estimate, such as every
+        SQLite step, are always reported.
+
+        :param int row_threshold: The number of rows a step must examine to be
+                                  reported. Defaults to ``0``.
+        """
+        problems = []
+        for step in self.steps:
+            if step.rows is not None and step.rows < row_threshold:
+                continue
+
+            kinds = [kind for kind, flagged in (
+                ('full table scan', step.full_scan),
+                ('filesort', step.filesort),
+                ('temporary table', step.temporary)) if flagged]
+            if kinds:
+                problems.append('{} on {} ({} rows): {}'.format(
+                    ' and '.join(kinds), step.table or 'result',
+                    'unknown' if step.rows is None else step.rows,
+                    step.detail))
+        return problems
+
+
+def explain_query(cursor, sql_type, query, values=(), analyze=False):
+    """
+    Explains ``query`` on ``cursor`` and returns its ``QueryPlan``.
+
+    :param obj cursor: A cursor to the database.
+    :param str sql_type: ``'mysql'`` or ``'sqlite'``.
+    :param str query: The query string.
+    :param tuple values: The values of the query.
+    :param bool analyze: Also runs EXPLAIN ANALYZE, which executes the query,
+                         if ``True``. Defaults to ``False``.
+
+    :raises ValueError: If EXPLAIN ANALYZE is requested on SQLite.
+    """
+    values = tuple(values)
+
+    if sql_type == 'sqlite':
+        if analyze:
+            raise ValueError('SQLite does not support EXPLAIN ANALYZE')
+        rows = _plan_rows(cursor, 'EXPLAIN QUERY PLAN ' + query, values)
+        return QueryPlan(query, values,
+                         [_sqlite_step(row['detail']) for row in rows], rows)
+
+    rows = _plan_rows(cursor, 'EXPLAIN ' + query, values)
+    steps = [_mysql_step(row) for row in rows]
+
+    text = None
+    if analyze:
+        text = '\n'.join(str(row_value) for row in _plan_rows(
+            cursor, 'EXPLAIN ANALYZE ' + query, values)
+            for row_value in row.values())
+
+    return QueryPlan(query, values, steps, rows, text)
+
+
+def _plan_rows(cursor, query, values):
+    """
+    Executes ``query`` and returns its rows as dicts.
+    """
+    cursor.execute(query, values)
+    names = [column[0] for column in cursor.description]
+    return [row if isinstance(row, dict) else dict(zip(names, row))
+            for row in cursor.fetchall()]
+
+
+def _mysql_step(row):
+    """
+    Returns the ``PlanStep`` of a row of MySQL EXPLAIN output.
+    """
+    extra = row.get('Extra') or ''
+    access = row.get('type')
+    return PlanStep(
+        table=row.get('table'),
+        access=access,
+        key=row.get('key'),
+        rows=row.get('rows'),
+        full_scan=access == 'ALL',
+        filesort='Using filesort' in extra,
+        temporary='Using temporary' in extra,
+        detail='{} {}{}'.format(access, row.get('table'),
+                                ' ({})'.format(extra) if extra else ''))
+
+
+def _sqlite_step(detail):
+    """
+    Returns the ``PlanStep`` of a line of SQLite EXPLAIN QUERY PLAN output.
+    """
+    match = _SQLITE_STEP.match(detail)
+    if match is None:
+        # sorts, groupings and DISTINCT outside an index use a temp b-tree
+        temp = detail.startswith('USE TEMP B-TREE')
+        filesort = temp and detail.endswith('ORDER BY')
+        return PlanStep(
+            table=None,
+            access=None,
+            key=None,
+            rows=None,
+            full_scan=False,
+            filesort=filesort,
+            temporary=temp and not filesort,
+            detail=detail)
+
+    access, table, index, rowid = match.groups()
+    return PlanStep(
+        table=table,
+        access=access,
+        key=index or rowid,
+        rows=None,
+        full_scan=access == 'SCAN' and index is None and rowid is None,
+        filesort=False,
+        temporary=False,
+        detail=detail)
+
+
+class PlanChecker(StatementHook):
+    """
+    Explains every distinct query shape executed by the models of a database
+    the first time it is seen and warns about, or fails on, full table scans,
+    filesorts and temporary tables examining at least ``row_threshold`` rows.
+    It is meant for development and test runs, where it catches missing
+    indexes before they reach production::
+
+      db.add_hook(PlanChecker(row_threshold=1000, fail=True))
+
+    Only SELECT, UPDATE and DELETE statements are explained, and not those
+    executed with ``executemany()``. Queries are grouped into shapes by their
+    fingerprint.
+
+    :param int row_threshold: The number of rows a step must examine to be
+                              reported. SQLite doesn't estimate rows, so
+                              every problem is reported on SQLite. Defaults to
+                              ``1000``.
+    :param bool fail: Raises a ``QueryPlanError`` before a query with problems
+                      is executed, every time it is executed, if ``True``.
+                      Otherwise a ``QueryPlanWarning`` is issued the first
+                      time it is seen. Defaults to ``False``.
+    """
+
+    def __init__(self, row_threshold=1000, fail=False):
+        self.row_threshold = row_threshold
+        self.fail = fail
+        self._problems = {}
+        self._lock = threading.Lock()
+
+    def before(self, event):
+        query = event.query
+        if (event.many or
+                not query.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS)):
+            return
+
+        key = fingerprint(query)
+        with self._lock:
+            problems = self._problems.get(key)
+        first = problems is None
+
+        if first:
+            # the query may no longer be the query of the model
+            plan = event.model._explain(query, event.values)
+            problems = plan.problems(self.row_threshold)
+            with self._lock:
+                self._problems[key] = problems
+
+        if problems and (self.fail or first):
+            msg = 'query plan of {} has {}'.format(key, '; '.join(problems))
+            if self.fail:
+                raise QueryPlanError(msg)
+            warnings.warn(msg, QueryPlanWarning)
+
+    def report(self):
+        """
+        Returns a dict mapping the fingerprint of each query shape with
+        problems to the list of its problems.
+        """
+        with self._lock:
+            return dict((key, list(problems))
+                        for key, problems in self._problems.items()
+                        if problems)
+
+    def reset(self):
+        """
+        Forgets every query shape seen, so they are explained again.
+        """
+        with self._lock:
+            self._problems.clear()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the statement hooks used to instrument queries, along
+with a slow query log and per model latency histograms built on them.
+
+:license: MIT, see LICENSE for details.
+"""
+import bisect
+import logging
+import threading
+import time
+import weakref
+
+# the most precise clock available
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class StatementEvent(object):
+    """
+    Describes a statement executed by a ``Model`` object. The same event is
+    passed to every hook method called for the statement and is updated as
+    the statement is executed and its rows fetched.
+
+    :param obj model: The ``Model`` object executing the statement.
+    :param str query: The query string.
+    :param int parameters: The number of parameters of the statement.
+    :param bool read: ``True`` if the statement is a read statement.
+    :param values: The values bound to the statement, or a list of them if
+                   it is executed with ``executemany()``. Defaults to ``()``.
+    :param bool many: ``True`` if the statement is executed with
+                      ``executemany()``. Defaults to ``False``.
+    """
+
+    __slots__ = ('model', 'query', 'parameters', 'values', 'many',
+                 'checkout_wait', 'execute_time', 'fetch_time',
+                 'last_fetch_time', 'rowcount', 'rows_fetched',
+                 'last_fetch_rows', 'read', 'error', '__weakref__')
+
+    def __init__(self, model, query, parameters, read=False, values=(),
+                 many=False):
+        self.model = model
+        self.query = query
+        self.parameters = parameters
+        self.read = read
+        self.values = values
+        self.many = many
+        #: Seconds spent waiting for a connection from the pool.
+        self.checkout_wait = 0.0
+        #: Seconds spent executing the statement, excluding checkout_wait.
+        self.execute_time = 0.0
+        #: Seconds spent in fetch methods so far.
+        self.fetch_time = 0.0
+        #: Seconds spent in the most recent fetch method.
+        self.last_fetch_time = 0.0
+        #: The value returned by ``execute()``, usually a row count.
+        self.rowcount = None
+        #: The number of rows fetched so far.
+        self.rows_fetched = 0
+        #: The number of rows fetched by the most recent fetch method.
+        self.last_fetch_rows = 0
+        #: The exception raised by the statement, if any.
+        self.error = None
+
+    @property
+    def elapsed(self):
+        """
+        Returns the seconds spent on the statement so far.
+        """
+        return self.checkout_wait + self.execute_time + self.fetch_time
+
+
+class StatementHook(object):
+    """
+    The base class of statement hooks. Hooks are added to a database with
+    :func:`~cuttle.reef.Cuttle.add_hook` and called for every statement
+    executed by its models. Subclasses override the methods they need.
+
+    When no hooks are added, statements are not timed at all.
+    """
+
+    def before(self, event):
+        """
+        Called before a statement is executed.
+
+        :param obj event: A ``StatementEvent`` object.
+        """
+
+    def after(self, event):
+        """
+        Called after a statement is executed, even if it raised an error.
+
+        :param obj event: A ``StatementEvent`` object.
+        """
+
+    def after_fetch(self, event):
+        """
+        Called after rows of the statement are fetched with ``fetchone()``,
+        ``fetchmany()``, ``fetchall()`` or ``fetch_columns()``, by iterating
+        over the model, or after each batch fetched by ``stream()``. Rows of
+        queries split by ``where_in()`` are fetched without calling it, as are
+        the results of statements queued by a pipelined transaction, which
+        are sent by ``flush()``.
+
+        :param obj event: A ``StatementEvent`` object.
+        """
+
+
+class SlowQueryLog(StatementHook):
+    """
+    Logs statements which take at least ``threshold`` seconds, counting
+    fetches, with their timings. Each statement is logged at most once.
+
+    :param float threshold: The number of seconds a statement must take to be
+                            logged. Defaults to ``1.0``.
+    :param logger: The ``logging.Logger`` used. Defaults to the
+                   ``'cuttle.slow_query'`` logger.
+    :param int level: The logging level used. Defaults to
+                      ``logging.WARNING``.
+    """
+
+    def __init__(self, threshold=1.0, logger=None, level=logging.WARNING):
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger('cuttle.slow_query')
+        self.level = level
+        self._logged = weakref.WeakSet()
+
+    def after(self, event):
+        self._check(event)
+
+    def after_fetch(self, event):
+        self._check(event)
+
+    def _check(self, event):
+        if event.elapsed >= self.threshold and event not in self._logged:
+            self._logged.add(event)
+            self.logger.log(
+                self.level,
+                'slow query on %s (%.3fs: checkout %.3fs, execute %.3fs, '
+                'fetch %.3fs, %s parameters, %s rows): %s',
+                event.model.name, event.elapsed, event.checkout_wait,
+                event.execute_time, event.fetch_time, event.parameters,
+                event.rows_fetched or event.rowcount, event.query)
+
+
+class Histogram(object):
+    """
+    A latency histogram with fixed bucket bounds.
+
+    :param tuple bounds: The upper bounds of the buckets in seconds, in
+                         increasing order. Latencies above the last bound are
+                         counted in an overflow bucket. Defaults to
+                         ``Histogram.default_bounds``.
+    """
+
+    #: Bounds from 100 microseconds to 10 seconds.
+    default_bounds = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, bounds=None):
+        self.bounds = tuple(bounds or self.default_bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, latency):
+        """
+        Records a latency.
+
+        :param float latency: The latency in seconds.
+        """
+        idx = bisect.bisect_left(self.bounds, latency)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += latency
+
+    @property
+    def mean(self):
+        """
+        Returns the mean latency or ``0.0`` if none were recorded.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Returns the upper bound of the bucket holding the ``percent``
+        percentile, or ``float('inf')`` if it is in the overflow bucket.
+
+        :param float percent: A percentage between 0 and 100.
+        """
+        if not self.count:
+            return 0.0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        """
+        Returns a dict with the count, total, mean, 50th, 95th and 99th
+        percentiles and the bucket counts keyed by upper bound.
+        """
+        buckets = dict(zip(self.bounds, self.counts))
+        buckets[float('inf')] = self.counts[-1]
+        return dict(count=self.count, total=self.total, mean=self.mean,
+                    p50=self.percentile(50), p95=self.percentile(95),
+                    p99=self.percentile(99), buckets=buckets)
+
+
+class LatencyHistograms(StatementHook):
+    """
+    Keeps a ``Histogram`` of the execution time of statements and one of the
+    time taken by each fetch method call for each model, by table name.
+
+    :param tuple bounds: The bucket bounds of the histograms.
+    """
+
+    def __init__(self, bounds=None):
+        self.bounds = bounds
+        self._execute = {}
+        self._fetch = {}
+        self._lock = threading.Lock()
+
+    def after(self, event):
+        self._histogram(self._execute, event.model.name).add(
+            event.execute_time)
+
+    def after_fetch(self, event):
+        self._histogram(self._fetch, event.model.name).add(
+            event.last_fetch_time)
+
+    def histogram(self, name, fetch=False):
+        """
+        Returns the ``Histogram`` of the table ``name`` or ``None`` if no
+        statements were recorded for it.
+
+        :param str name: The name of the table.
+        :param bool fetch: Returns the fetch time histogram if ``True``.
+                           Defaults to ``False``.
+        """
+        return (self._fetch if fetch else self._execute).get(name)
+
+    def snapshot(self):
+        """
+        Returns a dict mapping each table name to a dict with the
+        ``'execute'`` and ``'fetch'`` histogram snapshots.
+        """
+        names = set(self._execute) | set(self._fetch)
+        return dict((name, dict(
+            execute=self._execute[name].snapshot()
+            if name in self._execute else None,
+            fetch=self._fetch[name].snapshot()
+            if name in self._fetch else None)) for name in names)
+
+    def _histogram(self, histograms, name):
+        try:
+            return histograms[name]
+        except KeyError:
+            with self._lock:
+                return histograms.setdefault(name, Histogram(self.bounds))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains helpers for writing rows in the tab separated format
+read by MySQL's ``LOAD DATA INFILE`` with its default FIELDS and LINES
+options.
+
+:license: MIT, see LICENSE for details.
+"""
+import datetime
+
+from cuttle.columns import (FIXED_POINT_TYPES, FLOATING_POINT_TYPES,
+                            INTEGER_TYPES)
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+#: Written in place of ``None``.
+NULL = b'\\N'
+
+_TEXT_ESCAPES = {
+    ord('\\'): u'\\\\',
+    ord('\t'): u'\\t',
+    ord('\n'): u'\\n',
+    ord('\r'): u'\\r',
+    ord('\0'): u'\\0'
+}
+
+_BINARY_ESCAPES = [
+    (b'\\', b'\\\\'),
+    (b'\t', b'\\t'),
+    (b'\n', b'\\n'),
+    (b'\r', b'\\r'),
+    (b'\0', b'\\0')
+]
+
+
+def _encode_integer(value):
+    return str(int(value)).encode('ascii')
+
+
+def _encode_fixed_point(value):
+    return str(value).encode('ascii')
+
+
+def _encode_floating_point(value):
+    return repr(float(value)).encode('ascii')
+
+
+def _encode_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value)
+        for char, escape in _BINARY_ESCAPES:
+            value = value.replace(char, escape)
+        return value
+    if isinstance(value, bool):
+        return b'1' if value else b'0'
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat(' ')
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    return text_type(value).translate(_TEXT_ESCAPES).encode('utf-8')
+
+
+def encoder(column_type):
+    """
+    Returns a function which encodes a value of a column of ``column_type``
+    as bytes ready to be written to the file.
+
+    :param str column_type: The data type of the column.
+    """
+    column_type = (column_type or '').upper()
+    if column_type in INTEGER_TYPES:
+        encode = _encode_integer
+    elif column_type in FIXED_POINT_TYPES:
+        encode = _encode_fixed_point
+    elif column_type in FLOATING_POINT_TYPES:
+        encode = _encode_floating_point
+    else:
+        encode = _encode_default
+
+    def encode_value(value):
+        if value is None:
+            return NULL
+        return encode(value)
+
+    return encode_value
+
+
+def write_rows(f, rows, encoders):
+    """
+    Writes ``rows`` to the binary file object ``f`` one line at a time and
+    returns the number of rows written.
+
+    :param f: A file object opened in binary mode.
+    :param rows: An iterable of sequences of values.
+    :param list encoders: The encoder of each column, in order.
+
+    :raises ValueError: If a row doesn't have a value for every column.
+    """
+    count = 0
+    width = len(encoders)
+    for row in rows:
+        if len(row) != width:
+            raise ValueError('row {} does not have a value for every '
+                             'column'.format(tuple(row)))
+        f.write(b'\t'.join([encode(value)
+                            for encode, value in zip(encoders, row)]))
+        f.write(b'\n')
+        count += 1
+    return count
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the helpers which split queries with large IN lists
+into several queries and stream their combined results.
+
+:license: MIT, see LICENSE for details.
+"""
+import threading
+
+
+def holders(count):
+    """
+    Returns a parenthesized list of ``count`` placeholders.
+    """
+    return '({})'.format(', '.join(['%s'] * count))
+
+
+def chunk_values(values, size):
+    """
+    Returns ``values`` split into lists of at most ``size`` values.
+    """
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+class InListSplit(object):
+    """
+    Describes the IN list of a query built by
+    :func:`~cuttle.model.Model.where_in` which is too large for one query.
+    The query holds the clause of the first chunk of values, which is swapped
+    for the clause of each chunk in turn.
+
+    :param int query_index: The position of the clause in the query.
+    :param int value_index: The position of the first value of the list in
+                            the values of the query.
+    :param str prefix: ``'WHERE'`` or the condition joining the clause.
+    :param str column: The column of the IN list.
+    :param list chunks: The values of the IN list split into chunks.
+    :param int parallel: The number of chunks queried at once.
+    """
+
+    def __init__(self, query_index, value_index, prefix, column, chunks,
+                 parallel=1):
+        self.query_index = query_index
+        self.value_index = value_index
+        self.prefix = prefix
+        self.column = column
+        self.chunks = chunks
+        self.parallel = parallel
+
+    def clause(self, count):
+        """
+        Returns the IN clause of a chunk of ``count`` values.
+        """
+        return '{} {} IN {}'.format(self.prefix, self.column, holders(count))
+
+    def statements(self, query, values):
+        """
+        Returns a list of ``(query, values)`` tuples, one per chunk.
+
+        :param list query: The query as a list of strings.
+        :param list values: The values of the query.
+        """
+        first = len(self.chunks[0])
+        before = values[:self.value_index]
+        after = values[self.value_index + first:]
+
+        statements = []
+        for chunk in self.chunks:
+            parts = list(query)
+            parts[self.query_index] = self.clause(len(chunk))
+            statements.append((' '.join(parts), before + chunk + after))
+        return statements
+
+
+    def joined(self, query, values):
+        """
+        Returns the query, as a list of strings, and values with every chunk
+        in one IN list.
+
+        :param list query: The query as a list of strings.
+        :param list values: The values of the query.
+        """
+        first = len(self.chunks[0])
+        merged = [value for chunk in self.chunks for value in chunk]
+        parts = list(query)
+        parts[self.query_index] = self.clause(len(merged))
+        return (parts, values[:self.value_index] + merged +
+                values[self.value_index + first:])
+
+
+def run_chunks(make_model, statements, parallel=1):
+    """
+    Executes ``statements`` and yields a tuple of the cursor description and
+    rows of each, in order. Up to ``parallel`` statements are executed at
+    once, each on its own model and connection.
+
+    :param make_model: A function returning a new ``Model`` object.
+    :param list statements: A list of ``(query, values)`` tuples.
+    :param int parallel: The number of statements executed at once.
+    """
+    def run(model, query, values):
+        model.append_query(query)
+        model.extend_values(values)
+        model.execute()
+        cursor = model._fetch_cursor
+        return cursor.description, cursor.fetchall()
+
+    if parallel <= 1:
+        with make_model() as model:
+            for query, values in statements:
+                yield run(model, query, values)
+        return
+
+    for start in range(0, len(statements), parallel):
+        window = statements[start:start + parallel]
+        results = [None] * len(window)
+        errors = []
+
+        def work(idx, query, values):
+            try:
+                with make_model() as model:
+                    results[idx] = run(model, query, values)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(idx, query, values))
+                   for idx, (query, values) in enumerate(window)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        for result in results:
+            yield result
+
+
+class ChunkedResult(object):
+    """
+    Serves the rows of several chunk queries through the fetch methods of a
+    cursor. Chunks are executed as rows are fetched, so only the rows of the
+    chunks in flight are held in memory.
+
+    :param chunks: An iterator of ``(description, rows)`` tuples, as returned
+                   by ``run_chunks()``.
+    """
+
+    arraysize = 1
+
+    def __init__(self, chunks):
+        self.description = None
+        self.rowcount = -1
+        self._chunks = chunks
+        self._rows = iter(())
+        # run the first chunk now so errors are raised by execute()
+        self._next_chunk()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _next_chunk(self):
+        for description, rows in self._chunks:
+            self.description = description
+            self._rows = iter(rows)
+            return True
+        return False
+
+    def fetchone(self):
+        while True:
+            row = next(self._rows, None)
+            if row is not None or not self._next_chunk():
+                return row
+
+    def fetchmany(self, size=None):
+        rows = []
+        for __ in range(size or self.arraysize):
+            row = self.fetchone()
+            if row is None:
+                break
+            rows.append(row)
+        return tuple(rows)
+
+    def fetchall(self):
+        return tuple(self)
+
+    def close(self):
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+        self._rows = iter(())
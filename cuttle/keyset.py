@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the KeysetIterator class which pages through a table by
+its primary key.
+
+:license: MIT, see LICENSE for details.
+"""
+
+
+class KeysetIterator(object):
+    """
+    Iterates over the rows of a table in primary key order. Each batch is
+    fetched with ``WHERE pk > last ORDER BY pk LIMIT batch_size`` so every
+    page costs the same no matter how deep into the table it is, unlike paging
+    with OFFSET.
+
+    ``KeysetIterator`` objects are made by
+    :func:`~cuttle.model.Model.iterate_by_key`.
+
+    :param obj model: The ``Model`` object used to run queries.
+    :param str primary_key: The name of the primary key column.
+    :param tuple columns: The columns to select, including the primary key.
+    :param int batch_size: The number of rows fetched per query.
+    :param start: Only rows with a primary key greater than ``start`` are
+                  returned.
+    :param end: Only rows with a primary key less than or equal to ``end``
+                are returned.
+    :param bool batches: Yields lists of rows instead of rows if ``True``.
+    """
+
+    def __init__(self, model, primary_key, columns, batch_size, start=None,
+                 end=None, batches=False):
+        self._model = model
+        self._primary_key = primary_key
+        self._columns = columns
+        self._batch_size = batch_size
+        self._end = end
+        self._batches = batches
+
+        if columns:
+            self._key_position = columns.index(primary_key)
+        else:
+            self._key_position = model._column_index.positions[primary_key]
+
+        self._token = start
+        self._rows = self._iterate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    next = __next__
+
+    @property
+    def token(self):
+        """
+        Returns the primary key of the last row returned. Passing it as
+        ``start`` to :func:`~cuttle.model.Model.iterate_by_key` resumes
+        iteration after that row.
+        """
+        return self._token
+
+    def _fetch(self):
+        """
+        Fetches the batch of rows after the current token.
+        """
+        model = self._model
+
+        # set aside any query being built on the model
+        pending = model._query, model._values, model._split
+        model.reset_query()
+        try:
+            model.select(*self._columns)
+            if self._token is not None:
+                model.where(comparison='>', **{self._primary_key: self._token})
+            if self._end is not None:
+                model.where(comparison='<=', **{self._primary_key: self._end})
+            model.append_query(
+                'ORDER BY {} LIMIT %s'.format(self._primary_key))
+            model.extend_values([self._batch_size])
+
+            model.execute()
+            return model.fetchall()
+        finally:
+            model._query, model._values, model._split = pending
+
+    def _iterate(self):
+        while True:
+            rows = self._fetch()
+            if not rows:
+                return
+
+            if self._batches:
+                self._token = rows[-1][self._key_position]
+                yield list(rows)
+            else:
+                for row in rows:
+                    self._token = row[self._key_position]
+                    yield row
+
+            if len(rows) < self._batch_size:
+                return
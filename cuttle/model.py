@@ -5,9 +5,30 @@ database.
 
 :license: MIT, see LICENSE for details.
 """
+from collections import namedtuple
+import contextlib
+import copy
+import functools
+import os
+import re
+import tempfile
+import threading
+import time
 import warnings
+import weakref
 
-from cuttlepool import CuttlePool
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from cuttlepool import CuttlePool, PoolConnection
+
+from cuttle import columnar, explain, infile, inlist, routing
+from cuttle.cache import CachedResult, ResultCache, StatementCache
+from cuttle.columns import ColumnIndex
+from cuttle.hooks import StatementEvent, _clock
+from cuttle.keyset import KeysetIterator
 
 
 LEGAL_COMPARISONS = [
@@ -29,8 +50,387 @@ LEGAL_CONDITIONS = [
     'XOR'
 ]
 
+VALIDATION_STRATEGIES = [
+    'always',
+    'checkout',
+    'idle',
+    'reconnect'
+]
+
+PREWARM_MODES = [
+    'sync',
+    'background'
+]
+
+READ_STATEMENTS = (
+    'SELECT',
+    'SHOW',
+    'DESCRIBE',
+    'EXPLAIN'
+)
+
+# conditions other than AND, which keep an IN list from being split
+OR_CONDITIONS = re.compile(r'\b(?:OR|XOR)\b|\|\|', re.IGNORECASE)
+
+#: The number of rows inserted and updated by :func:`Model.upsert`.
+UpsertResult = namedtuple('UpsertResult', ['inserted', 'updated'])
+
+
+class ValidatingPool(CuttlePool):
+    """
+    A ``CuttlePool`` which decides when connections are validated with a round
+    trip to the server. Subclasses implement ``validate()``.
+
+    :param str validation: The validation strategy. ``'always'`` validates on
+                           checkout and every time a ``Model`` uses its
+                           connection. ``'checkout'`` only validates when a
+                           connection is taken from the pool. ``'idle'`` only
+                           validates connections that have been idle longer
+                           than ``idle_timeout``. ``'reconnect'`` never
+                           validates, instead idempotent reads are retried
+                           on a new connection if the connection was lost.
+                           Defaults to ``'checkout'``.
+    :param float idle_timeout: Seconds a connection can be idle before it is
+                               validated by the ``'idle'`` strategy. Defaults
+                               to ``30``.
+    :param int min_connections: The number of connections opened when the
+                                pool is warmed up and kept open afterwards,
+                                at most ``capacity``. The pool is warmed up
+                                by ``warm_up()`` or ``start()``, or else on
+                                the first checkout. Defaults to ``0``.
+    :param str prewarm: Opens the ``min_connections`` in a background thread
+                        if ``'background'``, or before the connection is
+                        returned if ``'sync'``. Defaults to
+                        ``'background'``.
+    :param float maintain_interval: Seconds between the checks which
+                                    validate connections idle longer than
+                                    ``idle_timeout`` and replace closed ones
+                                    to keep ``min_connections`` open. Defaults
+                                    to ``30``.
+    :param \**kwargs: Arguments passed to ``CuttlePool``.
+
+    :raises ValueError: If improper validation, min_connections, prewarm or
+                        maintain_interval parameter.
+    """
+
+    def __init__(self, connect, validation='checkout', idle_timeout=30,
+                 min_connections=0, prewarm='background',
+                 maintain_interval=30, **kwargs):
+        validation = validation.lower()
+        if validation not in VALIDATION_STRATEGIES:
+            raise ValueError(
+                '{} is not a validation strategy'.format(validation))
+        prewarm = prewarm.lower()
+        if prewarm not in PREWARM_MODES:
+            raise ValueError('{} is not a prewarm mode'.format(prewarm))
+        if maintain_interval <= 0:
+            raise ValueError('maintain_interval must be positive')
+
+        super(ValidatingPool, self).__init__(connect, **kwargs)
+
+        if not 0 <= min_connections <= self._capacity:
+            raise ValueError('min_connections must be between 0 and the '
+                             'pool capacity')
+
+        self.validation = validation
+        self.idle_timeout = idle_timeout
+        self.min_connections = min_connections
+        self.prewarm = prewarm
+        self.maintain_interval = maintain_interval
+
+        #: Number of validations made with a round trip to the server.
+        self.pings = 0
+        #: Number of validations skipped because of the strategy.
+        self.pings_skipped = 0
+        #: Seconds taken to open the ``min_connections`` when the pool was
+        #: created, or ``None`` until they are open.
+        self.warm_up_time = None
+        #: Number of connections opened to keep ``min_connections`` open
+        #: after the pool was warmed up.
+        self.replaced = 0
+        #: The last error raised while warming up or maintaining the pool.
+        self.maintenance_error = None
+
+        self._idle_since = weakref.WeakKeyDictionary()
+        self._maintenance_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # connections aren't opened until the pool is used so the database
+        # can be created first
+        self._started = False
+        self._stop = None
+
+    def get_connection(self, block=True):
+        """
+        Returns a ``PoolConnection`` object.
+
+        :param bool block: Waits up to the ``timeout`` of the pool for a
+                           connection to be returned if the pool is depleted
+                           if ``True``. Defaults to ``True``.
+
+        :raises AttributeError: If the pool is depleted.
+        """
+        if self.min_connections and not self._started:
+            self.start()
+        if block:
+            return super(ValidatingPool, self).get_connection()
+
+        if self._pool.empty():
+            self._harvest_lost_connections()
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            if self._size >= self._maxsize:
+                raise AttributeError('could not get connection, the pool is '
+                                     'depleted')
+            connection = self._make_connection()
+
+        if not self.ping(connection):
+            self._reference_pool.remove(connection)
+            connection = self._make_connection()
+        self.normalize_connection(connection)
+        return PoolConnection(connection, self)
+
+    def _make_connection(self):
+        connection = super(ValidatingPool, self)._make_connection()
+        self._idle_since[connection] = time.time()
+        return connection
+
+    def put_connection(self, connection):
+        super(ValidatingPool, self).put_connection(connection)
+        self._idle_since[connection] = time.time()
+
+    def warm_up(self):
+        """
+        Opens connections until ``min_connections`` are open, records the
+        time taken in ``warm_up_time`` and starts the background thread
+        keeping them open.
+        """
+        with self._start_lock:
+            self._started = True
+
+        start = _clock()
+        self.maintain()
+        self.warm_up_time = _clock() - start
+
+        if self.min_connections and self._stop is None:
+            self._start_maintenance(False)
+
+    def start(self):
+        """
+        Warms up the pool, in a background thread if ``prewarm`` is
+        ``'background'``, unless it has been warmed up already. A background
+        warm up which fails, for instance because the database doesn't exist
+        yet, is retried every ``maintain_interval`` seconds.
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+
+        if self.prewarm == 'background':
+            self._start_maintenance(True)
+        else:
+            self.warm_up()
+
+    def maintain(self):
+        """
+        Validates the connections idle in the pool for longer than
+        ``idle_timeout``, discarding closed ones, then opens connections until
+        ``min_connections`` are open. Returns the number of connections
+        opened.
+        """
+        with self._maintenance_lock:
+            # take one connection at a time so the others stay available
+            for __ in range(self._pool.qsize()):
+                try:
+                    connection = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+
+                now = time.time()
+                if (now - self._idle_since.get(connection, now) >
+                        self.idle_timeout):
+                    if not self.validate(connection):
+                        self._discard(connection)
+                        continue
+                    self._idle_since[connection] = now
+                self._put_idle(connection)
+
+            opened = 0
+            while self._size < self.min_connections:
+                connection = self._make_connection()
+                self._put_idle(connection)
+                opened += 1
+
+        if self.warm_up_time is not None:
+            self.replaced += opened
+        return opened
+
+    def stop_maintenance(self):
+        """
+        Stops the background thread keeping ``min_connections`` open, if
+        any.
+        """
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    def _put_idle(self, connection):
+        """
+        Returns a connection to the pool without changing how long it has
+        been idle, discarding it if the pool was filled in the meantime.
+        """
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            self._discard(connection)
+
+    def _discard(self, connection):
+        """
+        Removes a connection from the pool and closes it.
+        """
+        try:
+            self._reference_pool.remove(connection)
+        except ValueError:
+            pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _start_maintenance(self, warm_up):
+        """
+        Starts the background thread which warms up the pool if ``warm_up``
+        is ``True`` and then maintains it every ``maintain_interval``
+        seconds. The thread only holds a weak reference to the pool so it
+        stops once the pool is garbage collected.
+        """
+        self._stop = threading.Event()
+
+        def run(ref, stop, interval):
+            first = warm_up
+            while first or not stop.wait(interval):
+                pool = ref()
+                if pool is None:
+                    return
+                try:
+                    if first:
+                        pool.warm_up()
+                    else:
+                        pool.maintain()
+                except Exception as e:
+                    pool.maintenance_error = e
+                first = False
+                del pool
+
+        thread = threading.Thread(target=run,
+                                  args=(weakref.ref(self), self._stop,
+                                        self.maintain_interval),
+                                  name='cuttle-pool-maintenance')
+        thread.daemon = True
+        thread.start()
+
+    def needs_validation(self, idle_since):
+        """
+        Returns ``True`` if a connection idle since ``idle_since`` should be
+        validated and counts the ping as made or skipped.
+
+        :param float idle_since: Time the connection was last used.
+        """
+        if (self.validation == 'always' or
+                (self.validation == 'idle' and
+                 time.time() - (idle_since or 0) > self.idle_timeout)):
+            self.pings += 1
+            return True
+
+        self.pings_skipped += 1
+        return False
+
+    def ping(self, connection):
+        """
+        Validates a connection on checkout according to the strategy.
+
+        :param obj connection: A ``Connection`` object.
+        """
+        if self.validation in ('always', 'checkout'):
+            self.pings += 1
+            return self.validate(connection)
 
-class Model(object):
+        if self.needs_validation(self._idle_since.get(connection)):
+            return self.validate(connection)
+        return connection.open
+
+    def validate(self, connection):
+        """
+        A user implemented function that ensures the ``Connection`` object is
+        open by contacting the server.
+
+        :param obj connection: A ``Connection`` object.
+
+        :return: A bool indicating if the connection is open.
+        """
+        return connection.open
+
+
+def _estimate_size(value):
+    """
+    Returns the estimated number of bytes ``value`` takes up as a literal in a
+    SQL statement.
+    """
+    if value is None:
+        return 4
+    if isinstance(value, (bytes, bytearray)):
+        # escaped binary strings can double in size
+        return 2 * len(value) + 10
+    try:
+        return len(value.encode('utf-8')) + 2
+    except AttributeError:
+        return len(str(value)) + 2
+
+
+class ModelMeta(type):
+    """
+    The metaclass of ``Model``. It builds the column index and statement cache
+    of each ``Model`` subclass when the class is defined and registers the
+    class with the ``Cuttle`` object it belongs to, if any.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(ModelMeta, cls).__init__(name, bases, attrs)
+
+        cls._index_columns()
+        type.__setattr__(cls, '_row_classes', {})
+        if cls._column_index.columns and hasattr(cls, 'row_class'):
+            cls.row_class()
+        type.__setattr__(cls, '_statements', StatementCache(
+            getattr(cls, 'statement_cache_size', 128)))
+
+        registry = getattr(cls, '_registry', None)
+        if registry is not None:
+            registry.append(cls)
+
+    def __setattr__(cls, attr, value):
+        super(ModelMeta, cls).__setattr__(attr, value)
+
+        # keep the index and cached statements in line with the columns
+        if attr == 'columns':
+            cls._index_columns()
+            cls._row_classes.clear()
+            cls._statements.clear()
+        elif attr == 'statement_cache_size':
+            type.__setattr__(cls, '_statements', StatementCache(value))
+
+    def _index_columns(cls):
+        type.__setattr__(cls, '_column_index',
+                         ColumnIndex(getattr(cls, 'columns', ())))
+
+
+# create the base class by calling the metaclass so the syntax works with both
+# Python 2 and 3
+_ModelBase = ModelMeta('_ModelBase', (object,), {})
+
+
+class Model(_ModelBase):
     """
     ``Model`` represents a table. It is used for querying the database. It is
     meant to be subclassed to create tables.
@@ -48,21 +448,77 @@ class Model(object):
                                            Defaults to ``True``. If
                                            validate_columns is false, no error
                                            will be raised.
+    :param bool use_replicas: Sends SELECT queries to the replicas of the
+                              database, if any, when the model isn't part of
+                              a transaction and hasn't written anything
+                              uncommitted. Defaults to ``True``.
 
     :raises TypeError: Error caused by instantiating Model.
     """
 
-    def __init__(self, transaction=None, validate_columns=True, raise_error_on_validation=True):
+    #: Maximum number of compiled statements cached per model class.
+    statement_cache_size = 128
+    #: Uses an unbuffered cursor which streams rows from the server as they
+    #: are fetched instead of buffering the whole result set.
+    streaming = False
+    #: Returns rows as named tuples generated from the columns of the model,
+    #: allowing attribute access by column name, instead of plain tuples.
+    named_rows = False
+    #: Caches the rows of read queries in the result cache of the database,
+    #: keyed by query and values, until the table is written to. Rows read
+    #: from a replica aren't cached.
+    cache_results = False
+    #: Number of seconds cached results stay valid, or ``None`` if they are
+    #: only removed when the table is written to or they are evicted.
+    result_cache_ttl = 60
+    #: The maximum number of values in one IN list. Larger lists passed to
+    #: ``where_in()`` split the query and larger lists passed to
+    #: ``where_not_in()`` are split into several NOT IN lists. Lowered to the
+    #: number of parameters a SQLite statement accepts, if smaller.
+    in_list_size = 1000
+    #: The ``Index`` objects of the secondary indexes of the table, created
+    #: along with the table.
+    indexes = []
+    #: The ``StatementHook`` objects called for every statement. Set by
+    #: :func:`~cuttle.reef.Cuttle.add_hook`.
+    _hooks = ()
+    #: The ``ReplicaRouter`` of the database, if it has replicas.
+    _router = None
+    #: The number of rows fetched at a time when iterating over a model
+    #: while hooks are added.
+    _iter_batch_size = 100
+
+    def __init__(self, transaction=None, validate_columns=True, raise_error_on_validation=True,
+                 use_replicas=True):
         #: Holds the connection to the database.
         self._connection = None
         #: Holds a cursor to the database.
         self._cursor = None
+        #: Holds the connection to a replica used by read queries.
+        self._replica_connection = None
+        #: Holds a cursor to the replica.
+        self._replica_cursor = None
+        #: ``True`` if the last query was routed to the replica.
+        self._on_replica = False
+        #: ``True`` if writes were made since the last commit or rollback.
+        self._dirty = False
+        #: Time the connection was last used.
+        self._last_used = None
         #: Holds query to be executed as a list of strings.
         self._query = []
         #: Holds values to be inserted into query when executed.
         self._values = []
+        #: Holds the IN list split by ``where_in()``, if any.
+        self._split = None
+        #: Holds the result of a query served from the result cache.
+        self._result = None
+        #: Holds the event of the last statement if hooks are added.
+        self._event = None
+        #: Seconds spent checking out connections for the current statement.
+        self._checkout_wait = 0.0
 
         self._transaction = transaction
+        self.use_replicas = use_replicas
         self.validate_columns = validate_columns
         self.raise_error_on_validation = raise_error_on_validation
 
@@ -76,7 +532,22 @@ class Model(object):
         self.close()
 
     def __iter__(self):
-        return self.cursor.__iter__()
+        if self._event is not None:
+            # fetch in batches so the hooks see the rows
+            return self._iterate_batches()
+        cursor = self._fetch_cursor
+        make_row = self._row_maker(cursor)
+        if make_row is None:
+            return cursor.__iter__()
+        return (make_row(row) for row in cursor)
+
+    def _iterate_batches(self):
+        while True:
+            rows = self.fetchmany(self._iter_batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row
 
     @property
     def name(self):
@@ -103,10 +574,19 @@ class Model(object):
                :func:`~cuttle.home.Model.close` is not necessary if using the
                ``Model`` object as a context manager.
         """
-        try:
-            self._connection.ping()
-        except:
-            self._connection = self._pool.get_connection()
+        if self._connection is None:
+            self._connection = self._checkout()
+        elif self._pool.needs_validation(self._last_used):
+            try:
+                self._connection.ping()
+            except Exception:
+                self._close_connection()
+                self._connection = self._checkout()
+        elif not self._connection.open:
+            self._close_connection()
+            self._connection = self._checkout()
+
+        self._last_used = time.time()
         return self._connection
 
     @property
@@ -121,10 +601,31 @@ class Model(object):
         if self._transaction is not None:
             return self._transaction._cursor
 
+        if self._on_replica:
+            if (self._replica_cursor is None or
+                    self._replica_cursor.connection is None):
+                self._replica_cursor = self._new_cursor(self._replica,
+                                                        self.streaming)
+            return self._replica_cursor
+
         if self._cursor is None or self._cursor.connection is None:
-            self._cursor = self.connection.cursor()
+            self._cursor = self._new_cursor(self.connection, self.streaming)
         return self._cursor
 
+    @property
+    def _replica(self):
+        """
+        Returns a connection to a replica. Gets a connection from the pool of
+        the replica chosen by the router if it doesn't already have one,
+        falling back to the next replica and then the primary if a replica
+        can't be reached.
+        """
+        if (self._replica_connection is None or
+                not self._replica_connection.open):
+            self._close_replica()
+            self._replica_connection = self._checkout_replica()
+        return self._replica_connection
+
     @property
     def query(self):
         """
@@ -147,61 +648,163 @@ class Model(object):
         return [tuple(v) for v in self._values]
 
     @classmethod
-    def _configure(cls, sql_type, **kwargs):
+    def _configure(cls, sql_type, replicas=None,
+                   routing_strategy='round_robin', read_your_writes=0,
+                   **kwargs):
         """
         Configures the Model class to connect to the database.
 
         :param str sql_type: The SQL implementation to use.
+        :param list replicas: A list of dicts of the connection arguments of
+                              each replica, overriding those of the primary.
+                              Defaults to ``None``.
+        :param str routing_strategy: The strategy of the ``ReplicaRouter``.
+                                     Defaults to ``'round_robin'``.
+        :param float read_your_writes: Seconds a thread reads from the primary
+                                       after it writes. The window is kept per
+                                       thread, so other threads may read stale
+                                       rows from a replica. Defaults to
+                                       ``0``.
         :param \**kwargs: Connection arguments to be used by the underlying
-                          connection object.
+                          connection object. Arguments accepted by
+                          ``ValidatingPool`` and ``CuttlePool`` are passed to
+                          the pool.
 
-        :raises ValueError: If improper sql_type parameter.
+        :raises ValueError: If improper sql_type or routing_strategy
+                            parameter.
         """
         cls._sql_type = sql_type.lower()
         if cls._sql_type == 'mysql':
             import pymysql
             connect = pymysql.connect
 
-            # add ping method to pool
-            class Pool(CuttlePool):
+            cls._disconnect_errors = (pymysql.err.OperationalError,
+                                      pymysql.err.InterfaceError)
+            # values are interpolated client side so only the packet size
+            # limits a statement
+            cls._max_parameters = None
+
+            cls._unbuffered_cursor = pymysql.cursors.SSCursor
+
+            # add validate method to pool
+            class Pool(ValidatingPool):
 
                 def normalize_connection(self, connection):
                     connection.cursorclass = pymysql.cursors.Cursor
 
-                def ping(self, connection):
+                def validate(self, connection):
                     try:
                         connection.ping()
                     except Exception:
                         pass
                     return connection.open
 
+        elif cls._sql_type == 'sqlite':
+            import sqlite3
+            from cuttle import sqlite
+            connect = sqlite.connect
+
+            cls._disconnect_errors = (sqlite3.ProgrammingError,)
+            # sqlite3 cursors already step through results as they're fetched
+            cls._unbuffered_cursor = None
+            # SQLITE_MAX_VARIABLE_NUMBER was raised in SQLite 3.32.0
+            if sqlite3.sqlite_version_info >= (3, 32, 0):
+                cls._max_parameters = 32766
+            else:
+                cls._max_parameters = 999
+
+            class Pool(ValidatingPool):
+
+                def __init__(self, connect, **kwargs):
+                    super(Pool, self).__init__(connect, **kwargs)
+                    arguments = self.connection_arguments
+                    #: Holds an in-memory database open while the pool has
+                    #: no connections open.
+                    self.keep_alive = None
+                    if sqlite.is_memory(arguments.get('db'),
+                                        arguments.get('memory', False)):
+                        self.keep_alive = connect(**arguments)
+
+                def normalize_connection(self, connection):
+                    # discard anything left uncommitted by the last user
+                    connection.rollback()
+
         else:
             msg = "Please choose a valid sql extension"
             raise ValueError(msg)
 
+        #: Holds every subclass of the configured model in definition order.
+        cls._registry = []
+        #: Holds the results cached by models with ``cache_results`` set.
+        cls._result_cache = ResultCache()
+
         cls._pool = Pool(connect, **kwargs)
 
+        if replicas:
+            cls._router = routing.ReplicaRouter(
+                [Pool(connect, **dict(kwargs, **replica))
+                 for replica in replicas],
+                strategy=routing_strategy,
+                read_your_writes=read_your_writes)
+        else:
+            cls._router = None
+
     def _create_table(self):
         """
-        Generates table schema.
+        Generates table schema. MySQL indexes in ``indexes`` are defined in
+        the schema, SQLite indexes are created by the statements returned by
+        ``_create_indexes()``.
 
         :raises AttributeError: If table has multiple primary keys.
+        :raises ValueError: If an index is on a column not in ``columns``.
         """
+        self._check_indexes()
+
         create_tbl = []
 
         create_tbl.append(
             'CREATE TABLE IF NOT EXISTS {} (\n'.format(self.name))
 
         for column in self.columns:
-            create_tbl.append(column._column_schema())
+            create_tbl.append(column._column_schema(self._sql_type))
 
-        create_tbl[-1] = create_tbl[-1].replace(',', '')
+        if self._sql_type != 'sqlite':
+            for index in self.indexes:
+                create_tbl.append('{},\n'.format(
+                    index._index_schema(self.name, self._sql_type)))
+
+        create_tbl[-1] = create_tbl[-1][:-2] + '\n'
 
         create_tbl.append(')')
 
         self.append_query(''.join(create_tbl))
         return self
 
+    def _create_indexes(self):
+        """
+        Returns a list of the statements creating the indexes in ``indexes``
+        which aren't defined in the table schema.
+
+        :raises ValueError: If an index is on a column not in ``columns``.
+        """
+        if self._sql_type != 'sqlite':
+            return []
+
+        self._check_indexes()
+        return [index._index_schema(self.name, self._sql_type)
+                for index in self.indexes]
+
+    def _check_indexes(self):
+        """
+        Raises a ``ValueError`` if an index is on a column not in
+        ``columns``.
+        """
+        for index in self.indexes:
+            for column in index.columns:
+                if column not in self._column_index:
+                    raise ValueError('Index {} is on unknown column {}'.format(
+                        index.index_name(self.name), column))
+
     def select(self, *args):
         """
         Adds a SELECT query on the table associated with the model. If no
@@ -210,16 +813,24 @@ class Model(object):
         :param \*args: Columns to select for as strings. If no columns
                        provided, all columns will be selected.
         """
-        if args:
-            args = self.columns_lower(*args)
-        if self.check_columns(*args):
+        key = ('SELECT', args)
+        statement = self._statement_cache.get(key)
+        if statement is None:
+            if args:
+                args = self.columns_lower(*args)
+            if not self.check_columns(*args):
+                return self
+
             q = ['SELECT']
             if args:
                 q.append(', '.join([c for c in args]))
             else:
                 q.append('*')
             q.append('FROM {}'.format(self.name))
-            self.append_query(' '.join(q))
+            statement = ' '.join(q)
+            self._cache_statement(key, statement)
+
+        self.append_query(statement)
         return self
 
     def insert(self, columns=[], values=[]):
@@ -232,9 +843,14 @@ class Model(object):
                             list of lists/tuples which would be used with
                             :func:`~cuttle.model.Model.executemany`.
         """
-        if columns:
-            columns = self.columns_lower(*tuple(columns))
-        if self.check_columns(*columns):
+        key = ('INSERT', tuple(columns))
+        statement = self._statement_cache.get(key)
+        if statement is None:
+            if columns:
+                columns = self.columns_lower(*tuple(columns))
+            if not self.check_columns(*columns):
+                return self
+
             q = ['INSERT INTO {}'.format(self.name)]
 
             c = '({})'.format(', '.join(columns))
@@ -244,10 +860,335 @@ class Model(object):
             holder = '({})'.format(
                 ', '.join(['%s' for __ in range(len(columns))]))
             q.append(holder)
-            self.append_query(' '.join(q))
-            self.extend_values(values)
+            statement = ' '.join(q)
+            self._cache_statement(key, statement)
+
+        self.append_query(statement)
+        self.extend_values(values)
         return self
 
+    def bulk_insert(self, columns, rows, chunk_size=1000, max_bytes=None,
+                    commit=False):
+        """
+        Inserts rows with multi-row INSERT statements and returns the number
+        of rows inserted. Unlike :func:`~cuttle.model.Model.insert`, the
+        statements are executed immediately. Rows are consumed lazily so any
+        iterable, including a generator, can be passed without being held in
+        memory. In a pipelined transaction the statements are queued and the
+        count is ``None``.
+
+        :param list columns: The columns to insert values into.
+        :param rows: An iterable of sequences of values in the same order as
+                     the columns.
+        :param int chunk_size: The maximum number of rows per statement.
+                               Defaults to ``1000``.
+        :param int max_bytes: The estimated maximum size of a statement in
+                              bytes. Defaults to 90% of the server's
+                              ``max_allowed_packet``.
+        :param bool commit: Will commit after the last statement if ``True``.
+                            Defaults to ``False``.
+
+        :raises ValueError: If no columns are passed in, chunk_size < 1 or a
+                            row doesn't have a value for every column.
+        """
+        if not columns:
+            raise ValueError('columns required to bulk insert')
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+
+        columns = self.columns_lower(*tuple(columns))
+        if not self.check_columns(*columns):
+            return 0
+
+        header = 'INSERT INTO {} ({}) VALUES '.format(
+            self.name, ', '.join(columns))
+        holder = '({})'.format(', '.join(['%s'] * len(columns)))
+
+        inserted = 0
+        for chunk in self._chunks(columns, rows, chunk_size, max_bytes,
+                                  len(header)):
+            affected = self._execute_bulk(header, holder, len(chunk),
+                                          [v for row in chunk for v in row],
+                                          cache=len(chunk) == chunk_size)
+            if affected is None or inserted is None:
+                inserted = None
+            else:
+                inserted += affected
+
+        if commit:
+            self.commit()
+
+        return inserted
+
+    def upsert(self, columns, rows, update_columns=None, keys=None,
+               chunk_size=1000, max_bytes=None, commit=False):
+        """
+        Inserts rows, updating the existing row instead when a row has the
+        same primary or unique key, with multi-row statements chunked like
+        :func:`~cuttle.model.Model.bulk_insert`. MySQL statements use
+        ``INSERT ... ON DUPLICATE KEY UPDATE col=VALUES(col)`` and SQLite
+        statements use ``INSERT ... ON CONFLICT (keys) DO UPDATE``.
+
+        MySQL derives the counts from the affected row count, which doesn't
+        include rows set to their current values, so they are only exact if
+        every existing row changes. SQLite counts the existing keys of each
+        chunk before writing it. In a pipelined transaction the statements are
+        queued and the counts are ``None``.
+
+        :param list columns: The columns to insert values into.
+        :param rows: An iterable of sequences of values in the same order as
+                     the columns.
+        :param list update_columns: The columns updated on existing rows.
+                                    Defaults to every column not in keys.
+        :param list keys: The columns identifying existing rows. Defaults to
+                          the primary key. SQLite requires them to be the
+                          columns of a primary or unique key.
+        :param int chunk_size: The maximum number of rows per statement.
+                               Defaults to ``1000``.
+        :param int max_bytes: The estimated maximum size of a statement in
+                              bytes. Defaults to 90% of the server's
+                              ``max_allowed_packet``.
+        :param bool commit: Will commit after the last statement if ``True``.
+                            Defaults to ``False``.
+
+        :returns: An ``UpsertResult`` tuple of the number of rows inserted and
+                  updated.
+
+        :raises ValueError: If no columns are passed in, there are no columns
+                            to update or no keys, chunk_size < 1 or a row
+                            doesn't have a value for every column.
+        """
+        if not columns:
+            raise ValueError('columns required to upsert')
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+
+        columns = self.columns_lower(*tuple(columns))
+        if keys is None:
+            primary_key = self._column_index.primary_key
+            keys = (primary_key.name,) if primary_key is not None else ()
+        else:
+            keys = self.columns_lower(*tuple(keys))
+        if update_columns is None:
+            update_columns = tuple(c for c in columns if c not in keys)
+        else:
+            update_columns = self.columns_lower(*tuple(update_columns))
+
+        if not self.check_columns(*(columns + keys + update_columns)):
+            return UpsertResult(0, 0)
+        if not update_columns:
+            raise ValueError('no columns to update')
+
+        if self._sql_type == 'mysql':
+            footer = ' ON DUPLICATE KEY UPDATE {}'.format(', '.join(
+                '{0}=VALUES({0})'.format(c) for c in update_columns))
+        else:
+            if not keys:
+                raise ValueError('keys required to upsert')
+            footer = ' ON CONFLICT ({}) DO UPDATE SET {}'.format(
+                ', '.join(keys), ', '.join(
+                    '{0}=excluded.{0}'.format(c) for c in update_columns))
+
+        header = 'INSERT INTO {} ({}) VALUES '.format(
+            self.name, ', '.join(columns))
+        holder = '({})'.format(', '.join(['%s'] * len(columns)))
+        positions = [columns.index(k) for k in keys if k in columns]
+        if len(positions) != len(keys):
+            positions = None
+
+        inserted = updated = 0
+        for chunk in self._chunks(columns, rows, chunk_size, max_bytes,
+                                  len(header) + len(footer)):
+            if self._sql_type != 'mysql':
+                new = self._count_new_keys(keys, positions, chunk)
+
+            affected = self._execute_bulk(header, holder, len(chunk),
+                                          [v for row in chunk for v in row],
+                                          footer,
+                                          cache=len(chunk) == chunk_size)
+            if affected is None:
+                inserted = updated = None
+            elif inserted is not None:
+                if self._sql_type == 'mysql':
+                    # a new row counts 1 and an updated row counts 2
+                    chunk_updated = max(affected - len(chunk), 0)
+                else:
+                    chunk_updated = len(chunk) - new
+                inserted += len(chunk) - chunk_updated
+                updated += chunk_updated
+
+        if commit:
+            self.commit()
+
+        return UpsertResult(inserted, updated)
+
+    def _count_new_keys(self, keys, positions, chunk):
+        """
+        Returns the number of distinct keys in ``chunk`` which are not in the
+        table yet.
+        """
+        if positions is None:
+            # rows without their keys can't match an existing row
+            return len(chunk)
+
+        distinct = list(set(tuple(row[p] for p in positions)
+                            for row in chunk))
+        condition = '({})'.format(' AND '.join(
+            '{}=%s'.format(k) for k in keys))
+        if self._pipelined():
+            # the count sees the rows queued before it
+            self._transaction.flush()
+        # counted on the connection the upsert writes to, as a replica or the
+        # result cache may not have the rows written before yet
+        self._on_replica = False
+        cursor = self.cursor
+
+        existing = 0
+        step = max((self._max_parameters or 999) // len(keys), 1)
+        for start in range(0, len(distinct), step):
+            part = distinct[start:start + step]
+            cursor.execute('SELECT COUNT(*) FROM {} WHERE {}'.format(
+                self.name, ' OR '.join([condition] * len(part))),
+                [v for key in part for v in key])
+            existing += cursor.fetchone()[0]
+
+        return len(distinct) - existing
+
+    def _chunks(self, columns, rows, chunk_size, max_bytes, overhead):
+        """
+        Yields lists of rows small enough for one multi-row statement of
+        ``overhead`` bytes plus the rows.
+
+        :raises ValueError: If a row doesn't have a value for every column.
+        """
+        if self._max_parameters is not None:
+            chunk_size = min(chunk_size,
+                             max(self._max_parameters // len(columns), 1))
+        if max_bytes is None:
+            max_bytes = self._max_statement_bytes()
+
+        holder_size = 4 * len(columns)
+        chunk, size = [], overhead
+        for row in rows:
+            if len(row) != len(columns):
+                raise ValueError('row {} does not have a value for every '
+                                 'column'.format(tuple(row)))
+
+            row_size = sum(_estimate_size(value) for value in row) + 2
+            if chunk and (len(chunk) >= chunk_size or
+                          (max_bytes and size + row_size > max_bytes)):
+                yield chunk
+                chunk, size = [], overhead
+
+            chunk.append(row)
+            size += row_size + holder_size
+
+        if chunk:
+            yield chunk
+
+    def _execute_bulk(self, header, holder, batch, values, footer='',
+                      cache=True):
+        """
+        Executes a multi-row statement built from ``header``, ``batch``
+        ``holder`` strings and ``footer`` and returns the number of affected
+        rows. Only statements of full chunks should be cached, as the size of
+        the last or a byte limited chunk varies and would evict other
+        statements from the cache.
+        """
+        key = ('BULK', header, batch, footer)
+        statement = self._statement_cache.get(key) if cache else None
+        if statement is None:
+            statement = header + ', '.join([holder] * batch) + footer
+            if cache:
+                self._cache_statement(key, statement)
+
+        self.append_query(statement)
+        self.extend_values(values)
+        return self.execute()
+
+    def _max_statement_bytes(self):
+        """
+        Returns the estimated maximum size in bytes of a statement the server
+        accepts, or ``None`` if there is no practical limit. The server is
+        queried once per model class.
+        """
+        cls = type(self)
+        if '_max_bytes' not in cls.__dict__:
+            max_bytes = None
+            if self._sql_type == 'mysql':
+                cursor = self.cursor
+                cursor.execute('SELECT @@max_allowed_packet')
+                # leave headroom for escaping the size estimate misses
+                max_bytes = int(cursor.fetchone()[0] * 0.9)
+            type.__setattr__(cls, '_max_bytes', max_bytes)
+        return cls._max_bytes
+
+    def load(self, columns, rows, commit=False):
+        """
+        Loads rows with ``LOAD DATA LOCAL INFILE``, the fastest way to insert
+        large amounts of data into MySQL. Rows are streamed from the iterable
+        into a temporary file, encoded according to the type of each column,
+        so memory use stays constant. The connection must be made with
+        ``local_infile=True``.
+
+        For SQLite, which has no ``LOAD DATA``, the rows are inserted with
+        :func:`~cuttle.model.Model.bulk_insert`.
+
+        :param list columns: The columns to load values into.
+        :param rows: An iterable of sequences of values in the same order as
+                     the columns.
+        :param bool commit: Will commit after loading if ``True``. Defaults to
+                            ``False``.
+
+        :returns: A tuple of the number of rows loaded and a list of the
+                  warnings raised by the server.
+
+        :raises ValueError: If no columns are passed in or a row doesn't have
+                            a value for every column.
+        """
+        if not columns:
+            raise ValueError('columns required to load data')
+
+        columns = self.columns_lower(*tuple(columns))
+        if not self.check_columns(*columns):
+            return 0, []
+
+        if self._sql_type != 'mysql':
+            return self.bulk_insert(columns, rows, commit=commit), []
+
+        types = self._column_index.types
+        encoders = [infile.encoder(types.get(column)) for column in columns]
+
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                infile.write_rows(f, rows, encoders)
+
+            self.append_query(
+                'LOAD DATA LOCAL INFILE %s INTO TABLE {} CHARACTER SET '
+                'utf8mb4 ({})'.format(self.name, ', '.join(columns)))
+            self.extend_values([path])
+            self._invalidate_results()
+            if self._pipelined():
+                self._transaction.flush()
+            if self._hooks:
+                loaded = self._instrument(self._execute, False, 1)
+            else:
+                loaded = self._execute()
+        finally:
+            os.remove(path)
+
+        cursor = self.cursor
+        load_warnings = []
+        if getattr(cursor, 'warning_count', None) != 0:
+            cursor.execute('SHOW WARNINGS')
+            load_warnings = list(cursor.fetchall())
+
+        if commit:
+            self.commit()
+
+        return loaded, load_warnings
+
     def update(self, **kwargs):
         """
         Adds an UPDATE query on the table associated with the model.
@@ -260,17 +1201,24 @@ class Model(object):
         if not kwargs:
             raise ValueError('column value pairs required to update table')
 
-        kwargs = self.columns_lower(**kwargs)
-        if self.check_columns(*tuple(key for key in kwargs.keys())):
-            columns, values = [], []
-            for key, value in kwargs.items():
-                columns.append(key)
-                values.append(value)
+        key = ('UPDATE', tuple(kwargs))
+        statement = self._statement_cache.get(key)
+        if statement is None:
+            lowered = self.columns_lower(**kwargs)
+            if not self.check_columns(*tuple(lowered)):
+                return self
 
             q = ['UPDATE {} SET'.format(self.name)]
-            q.append(', '.join(['{}=%s'.format(column) for column in columns]))
-            self.append_query(' '.join(q))
-            self.extend_values(values)
+            q.append(', '.join(['{}=%s'.format(column)
+                                for column in lowered]))
+            statement = ' '.join(q)
+            # columns differing only by case collapse when lowered
+            if len(lowered) == len(kwargs):
+                self._cache_statement(key, statement)
+            kwargs = lowered
+
+        self.append_query(statement)
+        self.extend_values(list(kwargs.values()))
         return self
 
     def delete(self):
@@ -297,30 +1245,134 @@ class Model(object):
         if not kwargs:
             raise ValueError('column value pairs required for WHERE clause')
 
-        condition = condition.upper()
-        comparison = comparison.upper()
-        if condition not in LEGAL_CONDITIONS or comparison not in LEGAL_COMPARISONS:
-            raise ValueError(
-                'The conditional or comparison operator is not legal.')
-
-        kwargs = self.columns_lower(**kwargs)
-        if self.check_columns(*tuple(key for key in kwargs.keys())):
-            columns, values = [], []
-            for key, value in kwargs.items():
-                columns.append(key)
-                values.append(value)
+        chained = any('WHERE' in q for q in self._query)
+        key = ('WHERE', condition, comparison, tuple(kwargs), chained)
+        statement = self._statement_cache.get(key)
+        if statement is None:
+            condition = condition.upper()
+            comparison = comparison.upper()
+            if (condition not in LEGAL_CONDITIONS or
+                    comparison not in LEGAL_COMPARISONS):
+                raise ValueError(
+                    'The conditional or comparison operator is not legal.')
+
+            lowered = self.columns_lower(**kwargs)
+            if not self.check_columns(*tuple(lowered)):
+                return self
 
             q = []
-            if 'WHERE' in self.query:
+            if chained:
                 q.append(condition)
             else:
                 q.append('WHERE')
 
-            q.append(' {} '.format(condition).join(['{}{}%s'.format(column, comparison)
-                                                    for column in columns]))
+            q.append(' {} '.format(condition).join(
+                ['{}{}%s'.format(column, comparison) for column in lowered]))
+            statement = ' '.join(q)
+            if len(lowered) == len(kwargs):
+                self._cache_statement(key, statement)
+            kwargs = lowered
 
-            self.append_query(' '.join(q))
+        self.append_query(statement)
+        self.extend_values(list(kwargs.values()))
+        return self
+
+    def where_in(self, column, values, condition='AND', parallel=1):
+        """
+        Adds a WHERE clause checking that ``column`` is one of ``values``.
+
+        If there are more than ``in_list_size`` values, the query is split
+        into one query per chunk of values when executed. The rows of read
+        queries are streamed back chunk by chunk, with ``parallel`` chunks
+        queried at once on their own pooled connections, so ordering and
+        limits apply per chunk. Chunks queried one at a time, as they are if
+        the model has uncommitted writes, run on the connection the model
+        holds, if any.
+        The affected rows of write queries are added up. Only one IN list
+        can be split per query, and only if every condition of the query is
+        AND, since each chunk would match the other conditions again.
+        Otherwise the values are kept in one IN list.
+
+        :param str column: The column to check.
+        :param values: An iterable of values.
+        :param str condition: The conditional operator joining the clause to
+                              previous WHERE clauses. Defaults to ``'AND'``.
+        :param int parallel: The number of chunks queried at once. Chunks of
+                             a model in a transaction are queried one at a
+                             time. Defaults to ``1``.
+
+        :raises ValueError: If condition is invalid, parallel < 1 or another
+                            IN list has already been split. If the query has
+                            a condition other than AND and more values than
+                            a SQLite statement accepts, when executed.
+        """
+        return self._where_in(column, values, condition, False, parallel)
+
+    def where_not_in(self, column, values, condition='AND'):
+        """
+        Adds a WHERE clause checking that ``column`` is none of ``values``.
+        Lists of more than ``in_list_size`` values are split into several
+        NOT IN lists joined by AND in the same query.
+
+        :param str column: The column to check.
+        :param values: An iterable of values.
+        :param str condition: The conditional operator joining the clause to
+                              previous WHERE clauses. Defaults to ``'AND'``.
+
+        :raises ValueError: If condition is invalid or the query would have
+                            more values than a SQLite statement accepts.
+        """
+        return self._where_in(column, values, condition, True)
+
+    def _where_in(self, column, values, condition, negate, parallel=1):
+        """
+        Adds the clause of :func:`~cuttle.model.Model.where_in` or
+        :func:`~cuttle.model.Model.where_not_in`.
+        """
+        condition = condition.upper()
+        if condition not in LEGAL_CONDITIONS:
+            raise ValueError('The conditional operator is not legal.')
+        if parallel < 1:
+            raise ValueError('parallel must be at least 1')
+
+        column = self.columns_lower(column)[0]
+        if not self.check_columns(column):
+            return self
+
+        if any('WHERE' in q for q in self._query):
+            prefix = condition
+        else:
+            prefix = 'WHERE'
+
+        values = list(values)
+        size = self.in_list_size
+        if self._max_parameters is not None:
+            # leave room for the values already in the query
+            size = max(min(size, self._max_parameters - len(self._values)), 1)
+            if (negate and
+                    len(self._values) + len(values) > self._max_parameters):
+                raise ValueError('too many values for one NOT IN query')
+
+        chunks = inlist.chunk_values(values, size)
+        if not chunks:
+            # nothing is in an empty list
+            self.append_query('{} {}'.format(prefix,
+                                             '1=1' if negate else '1=0'))
+        elif negate:
+            self.append_query('{} ({})'.format(prefix, ' AND '.join(
+                '{} NOT IN {}'.format(column, inlist.holders(len(chunk)))
+                for chunk in chunks)))
             self.extend_values(values)
+        else:
+            split = inlist.InListSplit(len(self._query), len(self._values),
+                                       prefix, column, chunks, parallel)
+            if len(chunks) > 1:
+                if self._split is not None:
+                    raise ValueError('only one IN list can be split per '
+                                     'query')
+                self._split = split
+            self.append_query(split.clause(len(chunks[0])))
+            self.extend_values(chunks[0])
         return self
 
     def execute(self, commit=False):
@@ -330,9 +1382,54 @@ class Model(object):
         :param bool commit: Will commit the executed statement if ``True``.
                             Defaults to ``False``.
 
-        :returns: The result of ``cursor.execute()``.
+        :returns: The result of ``cursor.execute()`` or ``None`` if the
+                  statement was queued by a pipelined transaction. Results
+                  served from the result cache return the number of rows.
+                  Reads split by ``where_in()`` return ``None`` as their rows
+                  are streamed.
         """
-        result = self.cursor.execute(self.query, self.values)
+        self._join_split()
+        if self._split is not None:
+            return self._execute_split(commit)
+        if self._hooks:
+            return self._instrument(self._dispatch, commit, len(self._values))
+        return self._dispatch(commit)
+
+    def _dispatch(self, commit=False):
+        """
+        Executes the query, queues it or serves it from the result cache.
+        """
+        self._result = None
+        if not self._is_read():
+            self._invalidate_results()
+        elif self._caching_results():
+            return self._execute_cached(commit)
+
+        if self._pipelined():
+            if not self._is_read():
+                self._transaction.queue(self.query, self.values)
+                self.reset_query()
+                return None
+            # reads see the writes queued before them
+            self._transaction.flush()
+
+        return self._execute(commit)
+
+    def _execute(self, commit=False):
+        """
+        Executes the query right away, even in a pipelined transaction.
+        """
+        self._on_replica = self._routes_to_replica()
+        try:
+            result = self.cursor.execute(self.query, self.values)
+        except self._disconnect_errors:
+            if not self._retryable():
+                raise
+            if self._on_replica:
+                self._close_replica()
+            else:
+                self._close_connection()
+            result = self.cursor.execute(self.query, self.values)
 
         self.reset_query()
 
@@ -341,6 +1438,122 @@ class Model(object):
 
         return result
 
+    def _join_split(self):
+        """
+        Puts the values of a split IN list back into one IN list if the query
+        has a condition other than AND, as each chunk would match the other
+        conditions again.
+
+        :raises ValueError: If the query would have more values than a SQLite
+                            statement accepts.
+        """
+        split = self._split
+        if split is None or not OR_CONDITIONS.search(self.query):
+            return
+        if (self._max_parameters is not None and
+                len(self._values) - len(split.chunks[0]) +
+                sum(len(chunk) for chunk in split.chunks) >
+                self._max_parameters):
+            raise ValueError('too many values for an IN list joined with '
+                             'a condition other than AND')
+
+        self._query, self._values = split.joined(self._query, self._values)
+        self._split = None
+
+    def _execute_split(self, commit=False):
+        """
+        Executes a query split by :func:`~cuttle.model.Model.where_in`, one
+        query per chunk of values.
+        """
+        split = self._split
+        statements = split.statements(self._query, self._values)
+        read = self._is_read()
+        self.reset_query()
+
+        if read:
+            parallel = split.parallel
+            if self._transaction is not None or self._dirty:
+                parallel = 1
+            # chunks queried one at a time run on the connection the model
+            # holds, which also lets them see its uncommitted writes
+            shared = (self._transaction is None and parallel == 1 and
+                      self._connection is not None)
+
+            def make_model():
+                return self._chunk_model(shared)
+
+            self._close_cursor()
+            self._result = inlist.ChunkedResult(
+                inlist.run_chunks(make_model, statements, parallel))
+            result = None
+        else:
+            result = 0
+            for query, values in statements:
+                self.append_query(query)
+                self.extend_values(values)
+                affected = self.execute()
+                if affected is None or result is None:
+                    result = None
+                else:
+                    result += affected
+
+        if commit:
+            self.commit()
+
+        return result
+
+    @contextlib.contextmanager
+    def _chunk_model(self, shared=False):
+        """
+        Returns a context manager giving a copy of the model to query a chunk
+        of a split IN list on, with the same settings and transaction. The
+        copy uses the connection of the model if ``shared``, otherwise a
+        connection of its own.
+        """
+        model = copy.copy(self)
+        Model.__init__(model, self._transaction, self.validate_columns,
+                       self.raise_error_on_validation, self.use_replicas)
+        if shared:
+            model._connection = self.connection
+            # keeps reads off the replicas if the model has written
+            model._dirty = self._dirty
+        try:
+            yield model
+        finally:
+            if shared:
+                model._connection = None
+                model._dirty = False
+            model.close()
+
+    def _execute_cached(self, commit=False):
+        """
+        Serves a read query from the result cache, executing and caching it on
+        a miss. Rows read from a replica aren't cached as they may predate
+        writes which already invalidated the cache.
+        """
+        cache = self._result_cache
+        key = (self.query, self.values)
+
+        cached = cache.get(key)
+        if cached is None:
+            generation = cache.generation(self.name)
+            self._execute()
+            cursor = self.cursor
+            description, rows = cursor.description, tuple(cursor.fetchall())
+            if not self._on_replica:
+                cache.put(key, self.name, description, rows,
+                          ttl=self.result_cache_ttl, generation=generation)
+        else:
+            description, rows = cached
+            self.reset_query()
+
+        self._result = CachedResult(description, rows)
+
+        if commit:
+            self.commit()
+
+        return len(rows)
+
     def executemany(self, commit=False):
         """
         Executes the query with multiple values and returns the results (if any).
@@ -348,8 +1561,29 @@ class Model(object):
         :param bool commit: Will commit the executed statement if ``True``.
                             Defaults to ``False``.
 
-        :returns: The result of ``cursor.execute()``.
+        :returns: The result of ``cursor.execute()`` or ``None`` if the
+                  statements were queued by a pipelined transaction.
         """
+        if self._hooks:
+            return self._instrument(self._dispatch_many, commit,
+                                    sum(len(v) for v in self._values),
+                                    many=True)
+        return self._dispatch_many(commit)
+
+    def _dispatch_many(self, commit=False):
+        """
+        Executes the query with multiple values or queues it.
+        """
+        self._result = None
+        if not self._is_read():
+            self._invalidate_results()
+            if self._pipelined():
+                for values in self.seq_of_values:
+                    self._transaction.queue(self.query, values)
+                self.reset_query()
+                return None
+
+        self._on_replica = False
         result = self.cursor.executemany(self.query, self.seq_of_values)
 
         self.reset_query()
@@ -359,11 +1593,182 @@ class Model(object):
 
         return result
 
+    def explain(self, analyze=False):
+        """
+        Explains the query without executing it or resetting it and returns
+        its :class:`~cuttle.explain.QueryPlan`, which lists the steps of the
+        plan and any full table scans, filesorts and temporary tables.
+
+        :param bool analyze: Also runs EXPLAIN ANALYZE, which executes the
+                             query and reports the actual time and rows of
+                             each step, if ``True``. Only supported by MySQL
+                             8.0.18+. Defaults to ``False``.
+
+        :raises ValueError: If analyze is ``True`` on SQLite or the query was
+                            split by ``where_in()``.
+        """
+        self._join_split()
+        if self._split is not None:
+            raise ValueError('queries split by where_in() can not be '
+                             'explained')
+        return self._explain(self.query, self.values, analyze)
+
+    def _explain(self, query, values, analyze=False):
+        """
+        Explains ``query`` with ``values`` on a cursor of its own, leaving the
+        query of the model alone.
+        """
+        if self._transaction is not None:
+            connection = self._transaction._connection
+        else:
+            connection = self.connection
+
+        cursor = self._new_cursor(connection)
+        try:
+            return explain.explain_query(cursor, self._sql_type, query,
+                                         values, analyze)
+        finally:
+            cursor.close()
+
+    def stream(self, batch_size=1000):
+        """
+        Executes the query with an unbuffered cursor and returns a generator
+        which yields rows as they arrive from the server. Rows are fetched
+        ``batch_size`` at a time so memory use stays bounded no matter how big
+        the result set is.
+
+        The cursor is closed when the generator is exhausted, closed or
+        garbage collected. Closing the cursor early reads and discards the rest
+        of the result set so the connection can be reused. The connection
+        can't run other statements while the generator is active.
+
+        Queries split by :func:`~cuttle.model.Model.where_in` are executed
+        chunk by chunk, holding the rows of one chunk in memory at a time.
+
+        :param int batch_size: The number of rows fetched at a time. Defaults
+                               to ``1000``.
+
+        :raises ValueError: If batch_size < 1.
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+
+        self._join_split()
+        if self._split is not None:
+            self._execute_split()
+            result, self._result = self._result, None
+            if result is None:
+                return iter(())
+            return self._stream(result, batch_size)
+
+        query, values = self.query, self.values
+        replica = self._routes_to_replica()
+        self.reset_query()
+
+        if self._pipelined():
+            # the stream sees the writes queued before it
+            self._transaction.flush()
+
+        if self._transaction is not None:
+            connection = self._transaction._connection
+        elif replica:
+            connection = self._replica
+        else:
+            connection = self.connection
+
+        return self._stream(self._new_cursor(connection, streaming=True),
+                            batch_size, query, values)
+
+    def _stream(self, cursor, batch_size, query=None, values=None):
+        """
+        Generator behind :func:`~cuttle.model.Model.stream`. Executes
+        ``query`` on ``cursor`` first if given.
+        """
+        event = None
+        try:
+            if query is not None:
+                if self._hooks:
+                    event = StatementEvent(self, query, len(values),
+                                           self._is_read(query), values)
+                    self._instrument(lambda commit: cursor.execute(query,
+                                                                   values),
+                                     False, len(values), event)
+                else:
+                    cursor.execute(query, values)
+            make_row = self._row_maker(cursor)
+            while True:
+                if event is not None:
+                    start = _clock()
+                rows = cursor.fetchmany(batch_size)
+                if event is not None:
+                    self._fetched(event, start, len(rows))
+                if not rows:
+                    break
+                if make_row is not None:
+                    rows = [make_row(row) for row in rows]
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+    def iterate_by_key(self, batch_size=1000, start=None, end=None,
+                       columns=None, batches=False):
+        """
+        Returns a :class:`~cuttle.keyset.KeysetIterator` which iterates over
+        the rows of the table in primary key order, fetching ``batch_size``
+        rows per query. The ``token`` of the iterator can be saved and passed
+        as ``start`` to resume where iteration stopped.
+
+        :param int batch_size: The number of rows fetched per query. Defaults
+                               to ``1000``.
+        :param start: Only rows with a primary key greater than ``start`` are
+                      returned. Defaults to ``None``.
+        :param end: Only rows with a primary key less than or equal to ``end``
+                    are returned. Defaults to ``None``.
+        :param list columns: The columns to select. The primary key is added
+                             if missing. Defaults to all columns.
+        :param bool batches: Yields lists of rows instead of rows if ``True``.
+                             Defaults to ``False``.
+
+        :returns: A ``KeysetIterator`` or, if the columns fail validation
+                  without raising an error, an empty iterator.
+
+        :raises ValueError: If the model has no primary key, batch_size < 1 or
+                            a column is not on the model.
+        """
+        primary_key = self._column_index.primary_key
+        if primary_key is None:
+            raise ValueError('{} has no primary key'.format(self.name))
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+
+        columns = self.columns_lower(*tuple(columns)) if columns else ()
+        if not self.check_columns(*columns):
+            return iter(())
+        if columns and primary_key.name not in columns:
+            columns += (primary_key.name,)
+
+        return KeysetIterator(self, primary_key.name, columns, batch_size,
+                              start=start, end=end, batches=batches)
+
     def fetchone(self):
         """
         Fetches the next row.
         """
-        return self.cursor.fetchone()
+        event = self._event
+        if event is not None:
+            start = _clock()
+
+        cursor = self._fetch_cursor
+        row = cursor.fetchone()
+        if row is not None:
+            make_row = self._row_maker(cursor)
+            if make_row is not None:
+                row = make_row(row)
+
+        if event is not None:
+            self._fetched(event, start, row is not None)
+        return row
 
     def fetchmany(self, size=None):
         """
@@ -371,25 +1776,90 @@ class Model(object):
 
         :param int size: The number of rows to fetch. Defaults to ``None``.
         """
-        return self.cursor.fetchmany(size)
+        event = self._event
+        if event is not None:
+            start = _clock()
+
+        cursor = self._fetch_cursor
+        rows = self._make_rows(cursor, cursor.fetchmany(size))
+
+        if event is not None:
+            self._fetched(event, start, len(rows))
+        return rows
 
     def fetchall(self):
         """
         Fetches all the rows in the cursor.
         """
-        return self.cursor.fetchall()
+        event = self._event
+        if event is not None:
+            start = _clock()
+
+        cursor = self._fetch_cursor
+        rows = self._make_rows(cursor, cursor.fetchall())
+
+        if event is not None:
+            self._fetched(event, start, len(rows))
+        return rows
+
+    def fetch_columns(self, batch_size=10000, use_numpy=None):
+        """
+        Fetches the remaining rows column by column, which suits analytics on
+        large result sets. Returns an ``OrderedDict`` mapping each column name
+        to a tuple of its values and a null mask.
+
+        Values of integer, fixed point and floating point columns of the model
+        are stored in ``array.array`` buffers (fixed point values as floats)
+        with nulls stored as ``0``. Other values are kept in lists. The null
+        mask is a ``bytearray`` where ``1`` marks a null. If NumPy is used,
+        values and masks are NumPy arrays sharing the memory of the buffers.
+
+        :param int batch_size: The number of rows fetched at a time. Defaults
+                               to ``10000``.
+        :param bool use_numpy: Returns NumPy arrays if ``True``. If ``None``,
+                               NumPy arrays are returned when NumPy is
+                               installed. Defaults to ``None``.
+
+        :raises ImportError: If use_numpy is ``True`` and NumPy isn't
+                             installed.
+        :raises ValueError: If batch_size < 1 or no query has been executed.
+        """
+        event = self._event
+        if event is not None:
+            start = _clock()
+
+        columns = columnar.fetch_columns(self._fetch_cursor,
+                                         self._column_index.types,
+                                         batch_size=batch_size,
+                                         use_numpy=use_numpy)
+
+        if event is not None:
+            rows = len(next(iter(columns.values()))[1]) if columns else 0
+            self._fetched(event, start, rows)
+        return columns
 
     def commit(self):
         """
         Commits changes.
         """
+        if self._replica_connection is not None:
+            # ends the read transaction so later reads see new data
+            self._replica_connection.commit()
+            if self._connection is None:
+                return
         self.connection.commit()
+        self._end_writes()
 
     def rollback(self):
         """
         Rolls back the current transaction.
         """
+        if self._replica_connection is not None:
+            self._replica_connection.rollback()
+            if self._connection is None:
+                return
         self.connection.rollback()
+        self._end_writes()
 
     def append_query(self, query):
         """
@@ -435,9 +1905,8 @@ class Model(object):
 
         :raises ValueError: If parameters are not columns on model.
         """
-        column_names = set(col._attributes['name'].lower()
-                           for col in self.columns)
-        failed_columns = set(arg.lower() for arg in args) - column_names
+        failed_columns = set(arg.lower() for arg in args).difference(
+            self._column_index.names)
 
         if self.validate_columns and failed_columns:
             msg = ('Columns {} were not found on the Model. Be wary of SQL '
@@ -449,12 +1918,254 @@ class Model(object):
                 return False
         return True
 
+    @property
+    def _statement_cache(self):
+        """
+        Returns the ``StatementCache`` of the model class.
+        """
+        return self._statements
+
+    def _cache_statement(self, key, statement):
+        """
+        Caches a compiled statement. Statements are only cached once their
+        columns have passed validation so a cache hit can skip validation.
+
+        :param tuple key: The shape of the query.
+        :param str statement: The compiled SQL statement.
+        """
+        if self.validate_columns:
+            self._statement_cache.put(key, statement)
+
+    @classmethod
+    def statement_cache_info(cls):
+        """
+        Returns a dict with the hits, misses, size and maxsize of the
+        statement cache of the model class.
+        """
+        return cls._statements.info()
+
+    @classmethod
+    def result_cache_info(cls):
+        """
+        Returns a dict with the hits, misses, hit rate, expirations,
+        invalidations, size and maxsize of the result cache of the database.
+        """
+        return cls._result_cache.info()
+
+    def _checkout(self, pool=None, block=True):
+        """
+        Returns a connection from ``pool``, or the pool of the primary,
+        adding the time spent waiting for it to the checkout wait of the
+        current statement.
+        """
+        start = _clock()
+        try:
+            return (pool or self._pool).get_connection(block)
+        finally:
+            self._checkout_wait += _clock() - start
+
+    def _checkout_replica(self):
+        """
+        Returns a connection from the first replica pool which gives one, or
+        from the pool of the primary if none do. Depleted replica pools are
+        skipped rather than waited on.
+        """
+        router = self._router
+        for idx in router.candidates():
+            try:
+                connection = self._checkout(router.pools[idx], block=False)
+            except self._disconnect_errors + (AttributeError,):
+                # the replica is down or its pool is depleted
+                continue
+            router.checkouts[idx] += 1
+            return connection
+        return self._checkout()
+
+    def _routes_to_replica(self):
+        """
+        Returns ``True`` if the query should run on a replica.
+        """
+        return (self._router is not None and self.use_replicas and
+                self._transaction is None and not self._dirty and
+                routing.is_replica_read(self.query) and
+                not self._router.pinned())
+
+    def _instrument(self, run, commit, parameters, event=None, many=False):
+        """
+        Calls ``run`` to execute the query, timing it and calling the hooks
+        before and after. ``event`` is passed for statements run on a cursor
+        of their own, which leave the query and event of the model alone.
+        ``many`` is ``True`` for queries executed with ``executemany()``.
+        """
+        own = event is None
+        if own:
+            values = self.seq_of_values if many else self.values
+            event = StatementEvent(self, self.query, parameters,
+                                   self._is_read(), values, many)
+        hooks = self._hooks
+        try:
+            for hook in hooks:
+                hook.before(event)
+        except Exception:
+            # a hook rejected the query, so it is dropped as if it had run
+            if own:
+                self.reset_query()
+            raise
+
+        self._checkout_wait = 0.0
+        start = _clock()
+        try:
+            event.rowcount = run(commit)
+            return event.rowcount
+        except Exception as e:
+            event.error = e
+            raise
+        finally:
+            event.checkout_wait = self._checkout_wait
+            event.execute_time = _clock() - start - event.checkout_wait
+            if own:
+                self._event = event
+            for hook in hooks:
+                hook.after(event)
+
+    def _fetched(self, event, start, rows):
+        """
+        Records a fetch method call on ``event`` and calls the hooks.
+        """
+        event.last_fetch_time = _clock() - start
+        event.fetch_time += event.last_fetch_time
+        event.last_fetch_rows = rows
+        event.rows_fetched += rows
+        for hook in self._hooks:
+            hook.after_fetch(event)
+
+    @property
+    def _fetch_cursor(self):
+        """
+        Returns the cached result of the last query, if it was served from the
+        result cache, or the cursor.
+        """
+        if self._result is not None:
+            return self._result
+        return self.cursor
+
+    def _caching_results(self):
+        """
+        Returns ``True`` if read queries are served from the result cache.
+        Queries made in a transaction or after uncommitted writes bypass the
+        cache as they may see uncommitted changes.
+        """
+        return (self.cache_results and
+                self._transaction is None and
+                not self._dirty and
+                self._result_cache.maxsize > 0)
+
+    def _invalidate_results(self):
+        """
+        Removes the cached results of the table of the model, again once the
+        transaction commits if the model is part of one. Reads are kept on
+        the primary until the write is committed and for the
+        ``read_your_writes`` window of the database.
+        """
+        self._result_cache.invalidate(self.name)
+        if self._transaction is not None:
+            self._transaction._written.add((self._result_cache, self.name))
+        else:
+            self._dirty = True
+        if self._router is not None:
+            self._router.pin()
+
+    def _end_writes(self):
+        """
+        Removes the cached results of the table of the model again once its
+        writes are committed or rolled back, as results read while they were
+        uncommitted may have been cached.
+        """
+        if self._dirty:
+            self._dirty = False
+            self._result_cache.invalidate(self.name)
+
+    @classmethod
+    def row_class(cls, names=None):
+        """
+        Returns the named tuple class rows with the columns ``names`` are
+        returned as when ``named_rows`` is ``True``. Classes are made once per
+        set of columns and cached on the model class.
+
+        :param tuple names: The column names of the row. Defaults to every
+                            column of the model.
+        """
+        if names is None:
+            names = tuple(column.name for column in cls._column_index.columns)
+        try:
+            return cls._row_classes[names]
+        except KeyError:
+            row_class = namedtuple('{}Row'.format(cls.__name__), names,
+                                   rename=True)
+            cls._row_classes[names] = row_class
+            return row_class
+
+    def _row_maker(self, cursor):
+        """
+        Returns a function which turns a row fetched from ``cursor`` into a
+        named tuple or ``None`` if rows are returned as tuples.
+        """
+        if not self.named_rows or cursor.description is None:
+            return None
+        row_class = self.row_class(tuple(d[0] for d in cursor.description))
+        return functools.partial(tuple.__new__, row_class)
+
+    def _make_rows(self, cursor, rows):
+        """
+        Turns the rows fetched from ``cursor`` into named tuples if
+        ``named_rows`` is ``True``.
+        """
+        make_row = self._row_maker(cursor)
+        if make_row is None or not rows:
+            return rows
+        return tuple(make_row(row) for row in rows)
+
+    def _new_cursor(self, connection, streaming=False):
+        """
+        Returns a new cursor on ``connection``, unbuffered if ``streaming`` is
+        ``True`` and the driver supports it.
+        """
+        if streaming and self._unbuffered_cursor is not None:
+            return connection.cursor(self._unbuffered_cursor)
+        return connection.cursor()
+
+    def _retryable(self):
+        """
+        Returns ``True`` if the query is an idempotent read that can be
+        retried on a new connection under the ``'reconnect'`` strategy.
+        """
+        return (self._pool.validation == 'reconnect' and
+                self._transaction is None and
+                self._is_read())
+
+    def _is_read(self, query=None):
+        """
+        Returns ``True`` if the query, or ``query`` if given, is a read
+        statement.
+        """
+        if query is None:
+            query = self.query
+        return query.lstrip().upper().startswith(READ_STATEMENTS)
+
+    def _pipelined(self):
+        """
+        Returns ``True`` if the model is part of a pipelined transaction.
+        """
+        return (self._transaction is not None and
+                self._transaction.pipelined)
+
     def reset_query(self):
         """
         Resets query and values property on model.
         """
         self._query = []
         self._values = []
+        self._split = None
 
     def close(self):
         """
@@ -464,17 +2175,22 @@ class Model(object):
                recommended to explicitly call ``close()``.
         """
         self._close_connection()
+        self._close_replica()
 
     def _close_cursor(self):
         """
         Close the cursor, if any.
         """
-        try:
-            self._cursor.close()
-        except Exception:
-            pass
-        finally:
-            self._cursor = None
+        if self._result is not None:
+            self._result.close()
+        self._result = None
+        self._event = None
+        for cursor in (self._cursor, self._replica_cursor):
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursor = self._replica_cursor = None
 
     def _close_connection(self):
         """
@@ -488,3 +2204,22 @@ class Model(object):
             pass
         finally:
             self._connection = None
+            # uncommitted writes are discarded with the connection
+            self._end_writes()
+
+    def _close_replica(self):
+        """
+        Close the replica connection and cursor, if any.
+        """
+        try:
+            self._replica_cursor.close()
+        except Exception:
+            pass
+        self._replica_cursor = None
+
+        try:
+            self._replica_connection.close()
+        except Exception:
+            pass
+        finally:
+            self._replica_connection = None
@@ -5,9 +5,14 @@ with Cuttle.
 
 :license: MIT, see LICENSE for details.
 """
-from cuttle.columns import Column
+import hashlib
+import warnings
+
+from cuttle import schema
+from cuttle.columns import Column, Index
 from cuttle.model import CuttlePool, Model
 from cuttle.transaction import Transaction
+from cuttle.writer import BufferedWriter
 
 
 class Cuttle(object):
@@ -15,15 +20,39 @@ class Cuttle(object):
     Cuttle represents the database. It is used to create the database and
     models.
 
-    :param str sql_type: Determines what sql implementation to use (MySQL,
-                         SQLite, etc).
+    :param str sql_type: Determines what sql implementation to use, either
+                         ``'mysql'`` or ``'sqlite'``.
     :param \**kwargs: Arguments to be passed to the connection object when
-                      connections are made.
+                      connections are made. Arguments accepted by
+                      ``ValidatingPool``, such as ``min_connections`` and
+                      ``prewarm``, and ``CuttlePool`` are passed to the pool.
+                      With ``min_connections`` and the default
+                      ``prewarm='background'``, the pool starts warming up
+                      in a background thread when Cuttle is initialized.
+    :param list replicas: A list of dicts of the connection arguments of each
+                          read replica, overriding those of the primary. SELECT
+                          queries are sent to the replicas. Defaults to
+                          ``None``.
+    :param str routing: How a replica is chosen for each connection, either
+                        ``'round_robin'`` or ``'least_loaded'``. Defaults to
+                        ``'round_robin'``.
+    :param float read_your_writes: Seconds a thread reads from the primary
+                                   after it writes, so it sees its own writes
+                                   despite replication lag. The window is kept
+                                   per thread, other threads may still read
+                                   stale rows from a replica. Defaults to
+                                   ``0``.
 
-    :raise ValueError: If no database name is provided.
+    :raise ValueError: If no database name is provided or improper routing
+                       parameter.
     """
 
-    def __init__(self, sql_type, **kwargs):
+    #: The name of the table holding the fingerprint of the schema of each
+    #: table created by ``create_db()``.
+    schema_table = '_cuttle_schema'
+
+    def __init__(self, sql_type, replicas=None, routing='round_robin',
+                 read_your_writes=0, **kwargs):
         #: Holds Model class.
         kwargs['db'] = kwargs.get('db', None) or kwargs.get('database', None)
         if kwargs['db'] is None:
@@ -37,7 +66,15 @@ class Cuttle(object):
         self._name = kwargs['db']
 
         self.Model = type(kwargs['db'], (Model,), {})
-        self.Model._configure(sql_type, **kwargs)
+        self.Model._configure(sql_type, replicas=replicas,
+                              routing_strategy=routing,
+                              read_your_writes=read_your_writes, **kwargs)
+
+        # a synchronous warm up waits for the first checkout, as the database
+        # may not have been created yet
+        pool = self.Model._pool
+        if pool.min_connections and pool.prewarm == 'background':
+            pool.start()
 
         self._Transaction = Transaction
 
@@ -45,21 +82,241 @@ class Cuttle(object):
     def name(self):
         return self._name
 
+    @property
+    def validation_stats(self):
+        """
+        Returns a dict with the number of connection validations made
+        (``pings``) and skipped (``pings_skipped``) by the connection pool.
+        """
+        return dict(pings=self.Model._pool.pings,
+                    pings_skipped=self.Model._pool.pings_skipped)
+
+    def warm_up(self):
+        """
+        Opens the ``min_connections`` of the connection pool now and waits
+        for them. The database must exist. With the default
+        ``prewarm='background'`` the pool already starts warming up when
+        Cuttle is initialized, which fails, and is retried every
+        ``maintain_interval`` seconds, if the database doesn't exist yet. With
+        ``prewarm='sync'`` the pool is otherwise warmed up on the first
+        checkout.
+        """
+        self.Model._pool.warm_up()
+
+    @property
+    def warm_up_stats(self):
+        """
+        Returns a dict with the ``min_connections`` kept open by the pool, the
+        number of open (``connections``) and ``idle`` connections, the
+        ``warm_up_time`` in seconds, or ``None`` if the pool hasn't been
+        warmed up, and the number of connections ``replaced`` since.
+        """
+        pool = self.Model._pool
+        return dict(min_connections=pool.min_connections,
+                    connections=pool._size,
+                    idle=pool._pool.qsize(),
+                    warm_up_time=pool.warm_up_time,
+                    replaced=pool.replaced)
+
+    @property
+    def replica_stats(self):
+        """
+        Returns a list with a dict for each replica holding the number of
+        connections ``checkouts`` made from it and the number of open
+        (``connections``) and ``idle`` connections, or an empty list if the
+        database has no replicas.
+        """
+        router = self.Model._router
+        if router is None:
+            return []
+        return [dict(checkouts=checkouts,
+                     connections=pool._size,
+                     idle=pool._pool.qsize())
+                for pool, checkouts in zip(router.pools, router.checkouts)]
+
+    @property
+    def result_cache(self):
+        """
+        Returns the ``ResultCache`` holding the results of models with
+        ``cache_results`` set. Its ``maxsize`` can be changed at any time.
+        """
+        return self.Model._result_cache
+
+    @property
+    def hooks(self):
+        """
+        Returns a list of the ``StatementHook`` objects added to the database.
+        """
+        return list(self.Model._hooks)
+
+    def add_hook(self, hook):
+        """
+        Adds a ``StatementHook`` object which is called for every statement
+        executed by the models of the database.
+
+        :param obj hook: A ``StatementHook`` object.
+        """
+        # replace rather than mutate so running statements aren't affected
+        self.Model._hooks = self.Model._hooks + (hook,)
+
+    def remove_hook(self, hook):
+        """
+        Removes a ``StatementHook`` object added with ``add_hook()``.
+
+        :param obj hook: A ``StatementHook`` object.
+
+        :raises ValueError: If the hook was not added.
+        """
+        hooks = list(self.Model._hooks)
+        hooks.remove(hook)
+        self.Model._hooks = tuple(hooks)
+
+    @property
+    def models(self):
+        """
+        Returns a list of every ``Model`` subclass of this database in the
+        order they were defined.
+        """
+        return list(self.Model._registry)
+
     def _create_tables(self):
         """
-        Creates tables.
+        Creates tables over a single connection. The fingerprint of the schema
+        of each table is stored in the ``schema_table`` and tables whose
+        schema hasn't changed since they were created are skipped, so only
+        new models issue DDL. Existing tables whose model changed are
+        compared with it and, if they differ, left alone with a warning until
+        ``migrate()`` alters them.
         """
-        for tbl in set(self._nested_subclasses(self.Model)):
-            if tbl.__dict__.get('columns', False):
-                with tbl() as tbl:
-                    tbl._create_table().execute()
+        schemas = []
+        for tbl in self._table_models():
+            with tbl() as tbl:
+                statements = [tbl._create_table().query]
+                statements.extend(tbl._create_indexes())
+                tbl.reset_query()
+            schemas.append((tbl, statements))
+
+        with self.Model(use_replicas=False) as model:
+            model.append_query(
+                'CREATE TABLE IF NOT EXISTS {} (\n'
+                'table_name VARCHAR(64) NOT NULL PRIMARY KEY,\n'
+                'fingerprint CHAR(40) NOT NULL\n'
+                ')'.format(self.schema_table))
+            model.execute()
 
-    def _nested_subclasses(self, cls):
+            tables = set(self._table_names(model))
+
+            model.append_query('SELECT table_name, fingerprint FROM {}'
+                               .format(self.schema_table))
+            model.execute()
+            fingerprints = dict(model.fetchall())
+
+            current = None
+            for tbl, statements in schemas:
+                name = tbl.name
+                fingerprint = hashlib.sha1(
+                    '\n'.join(statements).encode('utf-8')).hexdigest()
+                if name in tables:
+                    if fingerprints.get(name) == fingerprint:
+                        continue
+                    if current is None:
+                        current = schema.introspect(model)
+                    # CREATE TABLE IF NOT EXISTS won't change the table
+                    columns, indexes = current[name]
+                    if schema.diff_table(tbl, columns, indexes):
+                        warnings.warn('Table {} differs from its model, use '
+                                      'migrate() to alter it'.format(name))
+                        continue
+                else:
+                    for statement in statements:
+                        model.append_query(statement)
+                        model.execute()
+
+                model.append_query('REPLACE INTO {} (table_name, fingerprint) '
+                                   'VALUES (%s, %s)'.format(self.schema_table))
+                model.extend_values([name, fingerprint])
+                model.execute()
+
+            model.commit()
+
+    def _table_models(self):
+        """
+        Returns a list of the ``Model`` subclasses which define a table.
+        """
+        return [tbl for tbl in self.Model._registry
+                if tbl.__dict__.get('columns', False)]
+
+    def diff_schema(self, drop=False):
+        """
+        Compares the tables of the database with the columns and indexes of
+        their models and returns a list of ``TableDiff`` objects for the
+        tables which differ. Tables which don't exist yet aren't included.
+
+        :param bool drop: Includes columns and indexes which aren't in the
+                          models, to be dropped, if ``True``. Defaults to
+                          ``False``.
+        """
+        with self.Model(use_replicas=False) as model:
+            return self._diff_schema(model, drop)
+
+    def _diff_schema(self, model, drop):
+        tables = schema.introspect(model)
+
+        diffs = []
+        for tbl in self._table_models():
+            with tbl() as tbl:
+                if tbl.name not in tables:
+                    continue
+                columns, indexes = tables[tbl.name]
+                diff = schema.diff_table(tbl, columns, indexes, drop)
+            if diff:
+                diffs.append(diff)
+        return diffs
+
+    def migrate(self, dry_run=False, drop=False):
+        """
+        Alters the tables of the database to match their models and returns
+        the list of statements executed. The changes to each MySQL table are
+        combined into one ALTER TABLE statement, using ``ALGORITHM=INSTANT``
+        or ``ALGORITHM=INPLACE`` when the server supports it for every
+        change. Tables which don't exist yet are created.
+
+        :param bool dry_run: Returns the statements without executing them if
+                             ``True``. Defaults to ``False``.
+        :param bool drop: Drops columns and indexes which aren't in the models
+                          if ``True``. Defaults to ``False``.
+        """
+        with self.Model(use_replicas=False) as model:
+            version = schema.server_version(model)
+
+            statements = []
+            for diff in self._diff_schema(model, drop):
+                statements.extend(diff.statements(version))
+
+            if dry_run:
+                return statements
+
+            for statement in statements:
+                model.append_query(statement)
+                model.execute()
+            model.commit()
+
+        self._create_tables()
+        return statements
+
+    def _table_names(self, model):
         """
-        Creates a list of all nested subclasses.
+        Returns a list of the names of the tables in the database.
+
+        :param obj model: The ``Model`` object used to query the database.
         """
-        return cls.__subclasses__() + [s for sc in cls.__subclasses__()
-                                       for s in self._nested_subclasses(sc)]
+        if self.Model._sql_type == 'sqlite':
+            model.append_query("SELECT name FROM sqlite_master WHERE "
+                               "type='table' AND name NOT LIKE 'sqlite_%%'")
+        else:
+            model.append_query('SHOW TABLES')
+        model.execute()
+        return [row[0] for row in model.fetchall()]
 
     def create_db(self, drop_existing=False):
         """
@@ -71,11 +328,16 @@ class Cuttle(object):
         if drop_existing:
             self.drop_db()
 
+        # SQLite creates the database when it is first connected to
+        if self.Model._sql_type == 'sqlite':
+            self._create_tables()
+            return
+
         connection_arguments = self.Model().connection_arguments
         connection_arguments.pop('db')
         connect = self.Model._pool._connect
 
-        db_stmnt = 'CREATE DATABASE {}'.format(self.name)
+        db_stmnt = 'CREATE DATABASE IF NOT EXISTS {}'.format(self.name)
 
         tmp_pool = CuttlePool(connect, **connection_arguments)
 
@@ -91,13 +353,48 @@ class Cuttle(object):
         self._create_tables()
 
     def drop_db(self):
-        """Drops the database."""
-        with self.Model() as model:
+        """
+        Drops the database.
+
+        :note: SQLite databases can't be dropped, instead every table in the
+               database is dropped.
+        """
+        if self.Model._sql_type == 'sqlite':
+            self._drop_sqlite_tables()
+            return
+
+        with self.Model(use_replicas=False) as model:
             drop_db = 'DROP DATABASE IF EXISTS {}'.format(self.name)
 
             model.append_query(drop_db)
             model.execute()
 
-    def transaction(self):
-        """Returns a ``Transaction`` object."""
-        return self._Transaction(self.Model._pool.get_connection())
+    def _drop_sqlite_tables(self):
+        """
+        Drops all tables in a SQLite database.
+        """
+        with self.Model(use_replicas=False) as model:
+            for tbl in self._table_names(model):
+                model.append_query('DROP TABLE IF EXISTS {}'.format(tbl))
+                model.execute()
+            model.commit()
+
+    def transaction(self, pipeline=False):
+        """
+        Returns a ``Transaction`` object.
+
+        :param bool pipeline: Queues write statements and sends them in as few
+                              round trips as possible if ``True``. Defaults
+                              to ``False``.
+        """
+        return self._Transaction(self.Model._pool.get_connection(),
+                                 pipeline=pipeline)
+
+    def writer(self, **kwargs):
+        """
+        Returns a ``BufferedWriter`` object which writes rows to this database
+        in batches.
+
+        :param \**kwargs: Arguments passed to ``BufferedWriter``.
+        """
+        return BufferedWriter(self, **kwargs)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the ReplicaRouter which picks the replica pool read
+queries are sent to when a ``Cuttle`` object is created with replicas.
+
+:license: MIT, see LICENSE for details.
+"""
+import itertools
+import re
+import threading
+import time
+
+
+ROUTING_STRATEGIES = [
+    'round_robin',
+    'least_loaded'
+]
+
+# reads which lock rows must run on the primary
+_LOCKING_READ = re.compile(r'\bFOR\s+(?:UPDATE|SHARE)\b|'
+                           r'\bLOCK\s+IN\s+SHARE\s+MODE\b', re.IGNORECASE)
+
+
+def is_replica_read(query):
+    """
+    Returns ``True`` if ``query`` is a SELECT statement which can run on a
+    replica.
+
+    :param str query: The query string.
+    """
+    return (query.lstrip()[:6].upper() == 'SELECT' and
+            _LOCKING_READ.search(query) is None)
+
+
+class ReplicaRouter(object):
+    """
+    Routes read queries to the pools of the replicas of a database.
+
+    :param list pools: The connection pools of the replicas.
+    :param str strategy: ``'round_robin'`` sends reads to each replica in
+                         turn, ``'least_loaded'`` to the replica with the
+                         fewest connections checked out. Defaults to
+                         ``'round_robin'``.
+    :param float read_your_writes: Seconds a thread reads from the primary
+                                   after it writes, so it sees its own writes
+                                   despite replication lag. The window is kept
+                                   per thread, other threads may still read
+                                   stale rows from a replica. Defaults to
+                                   ``0``.
+
+    :raises ValueError: If no pools are given or improper strategy
+                        parameter.
+    """
+
+    def __init__(self, pools, strategy='round_robin', read_your_writes=0):
+        if not pools:
+            raise ValueError('a replica is required')
+        strategy = strategy.lower()
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError('{} is not a routing strategy'.format(strategy))
+
+        self.pools = list(pools)
+        self.strategy = strategy
+        self.read_your_writes = read_your_writes
+        #: The number of connections checked out from each replica.
+        self.checkouts = [0] * len(self.pools)
+
+        self._counter = itertools.count()
+        self._local = threading.local()
+
+    def candidates(self):
+        """
+        Returns the indexes of the replica pools in the order they should be
+        tried, the chosen replica first.
+        """
+        count = len(self.pools)
+        start = next(self._counter) % count
+        order = [(start + offset) % count for offset in range(count)]
+
+        if self.strategy == 'least_loaded':
+            # a stable sort keeps the round robin order between equals
+            order.sort(key=lambda idx: self._in_use(self.pools[idx]))
+        return order
+
+    def pin(self):
+        """
+        Pins the current thread to the primary for ``read_your_writes``
+        seconds.
+        """
+        if self.read_your_writes:
+            self._local.until = time.time() + self.read_your_writes
+
+    def pinned(self):
+        """
+        Returns ``True`` if the current thread is pinned to the primary.
+        """
+        return getattr(self._local, 'until', 0) > time.time()
+
+    def _in_use(self, pool):
+        """
+        Returns the number of connections of ``pool`` which are checked out.
+        """
+        return pool._size - pool._pool.qsize()
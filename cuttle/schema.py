@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the schema introspection and diff engine which compares
+the tables of a database with the ``Column`` and ``Index`` objects of their
+models and generates the ALTER TABLE statements bringing them in line.
+
+:license: MIT, see LICENSE for details.
+"""
+from collections import namedtuple
+import decimal
+import re
+import sqlite3
+import warnings
+
+from cuttle.columns import INTEGER_TYPES, Index
+
+#: The definition of a column as found in the database.
+ColumnInfo = namedtuple('ColumnInfo', ['name', 'column_type', 'required',
+                                       'default', 'auto_increment',
+                                       'update'])
+
+_DISPLAY_WIDTH = re.compile(r'^({})\(\d+\)'.format('|'.join(INTEGER_TYPES)))
+
+_TYPE_ALIASES = {
+    'INTEGER': 'INT',
+    'NUMERIC': 'DECIMAL',
+    'BOOLEAN': 'TINYINT',
+    'BOOL': 'TINYINT'
+}
+
+
+def normalize_type(column_type):
+    """
+    Returns ``column_type`` in a form which can be compared, in upper case
+    without whitespace, aliases or integer display widths, which MySQL 8.0
+    dropped.
+
+    :param str column_type: A data type such as ``'varchar(16)'``.
+    """
+    column_type = re.sub(r'\s+', '', column_type.upper())
+    column_type = _DISPLAY_WIDTH.sub(r'\1', column_type)
+    for alias, name in _TYPE_ALIASES.items():
+        if column_type == alias or column_type.startswith(alias + '('):
+            column_type = name + column_type[len(alias):]
+            break
+    if column_type == 'DECIMAL':
+        column_type = 'DECIMAL(10,0)'
+    return column_type
+
+
+def _same_default(expected, actual):
+    """
+    Returns ``True`` if the default of a column matches the default found in
+    the database.
+    """
+    if expected is None or actual is None:
+        return expected is None and actual is None
+
+    expected, actual = str(expected).strip("'"), str(actual).strip("'")
+    try:
+        return decimal.Decimal(expected) == decimal.Decimal(actual)
+    except decimal.InvalidOperation:
+        return expected.upper() == actual.upper()
+
+
+def column_info(column, sql_type='mysql'):
+    """
+    Returns the ``ColumnInfo`` a column is expected to have in the database.
+
+    :param obj column: A ``Column`` object.
+    :param str sql_type: ``'mysql'`` or ``'sqlite'``.
+    """
+    attributes = column._attributes
+    if sql_type == 'sqlite':
+        # SQLite doesn't make the primary key NOT NULL and has no ON UPDATE
+        return ColumnInfo(column.name, column._type_schema(sql_type),
+                          bool(attributes['required']), attributes['default'],
+                          False, False)
+
+    return ColumnInfo(column.name, column._type_schema(sql_type),
+                      bool(attributes['required'] or column.primary_key),
+                      attributes['default'],
+                      bool(attributes['auto_increment']),
+                      attributes['update'] is not None)
+
+
+def _same_column(expected, actual):
+    return (normalize_type(expected.column_type) ==
+            normalize_type(actual.column_type) and
+            expected.required == actual.required and
+            _same_default(expected.default, actual.default) and
+            expected.auto_increment == actual.auto_increment and
+            expected.update == actual.update)
+
+
+class TableDiff(object):
+    """
+    The differences between a table and its model.
+
+    :param str table: The name of the table.
+    :param str sql_type: ``'mysql'`` or ``'sqlite'``.
+    """
+
+    def __init__(self, table, sql_type='mysql'):
+        self.table = table
+        self.sql_type = sql_type
+        #: ``(Column, after)`` tuples of the columns missing from the table,
+        #: where ``after`` is the name of the column it follows, ``''`` if
+        #: it is the first column or ``None`` if it is appended.
+        self.add_columns = []
+        #: ``(Column, type_changed)`` tuples of the columns whose definition
+        #: differs from the table.
+        self.modify_columns = []
+        #: The names of the columns of the table which aren't in the model.
+        self.drop_columns = []
+        #: The ``Index`` objects missing from the table.
+        self.add_indexes = []
+        #: The names of the indexes of the table to drop.
+        self.drop_indexes = []
+
+    def __bool__(self):
+        return bool(self.add_columns or self.modify_columns or
+                    self.drop_columns or self.add_indexes or
+                    self.drop_indexes)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return ('<TableDiff {}: {} added, {} modified, {} dropped columns, '
+                '{} added, {} dropped indexes>').format(
+                    self.table, len(self.add_columns),
+                    len(self.modify_columns), len(self.drop_columns),
+                    len(self.add_indexes), len(self.drop_indexes))
+
+    def algorithm(self, version=()):
+        """
+        Returns the ``ALGORITHM`` the MySQL server can use for the changes,
+        ``'INSTANT'``, ``'INPLACE'`` or ``None`` if the table must be copied,
+        as it must when a type changes or an AUTO_INCREMENT column is added
+        or modified.
+
+        :param tuple version: The version of the server, as a tuple of ints.
+        """
+        if not version or version < (5, 6):
+            return None
+
+        mysql8 = version >= (8, 0, 12)
+        # any column position and dropping columns is instant from 8.0.29
+        instant_columns = version >= (8, 0, 29)
+
+        instant = mysql8 and not (self.modify_columns or self.add_indexes or
+                                  self.drop_indexes)
+        if self.drop_columns and not instant_columns:
+            instant = False
+        for column, after in self.add_columns:
+            attributes = column._attributes
+            if (attributes['unique'] or attributes['auto_increment'] or
+                    column.primary_key or
+                    (after is not None and not instant_columns)):
+                instant = False
+
+        if instant:
+            return 'INSTANT'
+        if any(type_changed for __, type_changed in self.modify_columns):
+            return None
+        if any(column._attributes['auto_increment']
+               for column, __ in self.add_columns + self.modify_columns):
+            return None
+        return 'INPLACE'
+
+    def statements(self, version=()):
+        """
+        Returns the list of statements applying the changes. MySQL changes
+        are combined into one ALTER TABLE statement so the table is rebuilt at
+        most once. SQLite can only make one change per statement and can't
+        modify columns, so modified columns are skipped with a warning. The
+        UNIQUE constraint of a column added to a SQLite table is made as a
+        unique index named after the column.
+
+        :param tuple version: The version of the MySQL server, as a tuple of
+                              ints, used to choose the ``ALGORITHM``.
+
+        :raises ValueError: If a primary key column, or a required column
+                            without a default, is added to a SQLite table.
+        """
+        if not self:
+            return []
+        if self.sql_type == 'sqlite':
+            return self._sqlite_statements()
+
+        clauses = ['DROP INDEX {}'.format(name)
+                   for name in self.drop_indexes]
+        for column, after in self.add_columns:
+            clause = 'ADD COLUMN ' + column._column_schema()[:-2]
+            if after == '':
+                clause += ' FIRST'
+            elif after is not None:
+                clause += ' AFTER {}'.format(after)
+            clauses.append(clause)
+        # constraints are left out so existing keys aren't added again
+        clauses.extend('MODIFY COLUMN ' +
+                       column._column_schema(constraints=False)[:-2]
+                       for column, __ in self.modify_columns)
+        clauses.extend('DROP COLUMN {}'.format(name)
+                       for name in self.drop_columns)
+        clauses.extend('ADD ' + index._index_schema(self.table)
+                       for index in self.add_indexes)
+
+        algorithm = self.algorithm(version)
+        if algorithm is not None:
+            clauses.append('ALGORITHM={}'.format(algorithm))
+
+        return ['ALTER TABLE {} {}'.format(self.table, ', '.join(clauses))]
+
+    def _sqlite_statements(self):
+        statements = ['DROP INDEX IF EXISTS {}'.format(name)
+                      for name in self.drop_indexes]
+        unique = []
+        for column, __ in self.add_columns:
+            attributes = column._attributes
+            if column.primary_key:
+                raise ValueError('SQLite can not add primary key column {} '
+                                 'to {}'.format(column.name, self.table))
+            if attributes['required'] and attributes['default'] is None:
+                raise ValueError('SQLite can not add required column {} to '
+                                 '{} without a default'.format(column.name,
+                                                               self.table))
+            # SQLite can't add a column with a UNIQUE constraint
+            statements.append('ALTER TABLE {} ADD COLUMN {}'.format(
+                self.table,
+                column._column_schema('sqlite', constraints=False)[:-2]))
+            if attributes['unique']:
+                unique.append(column.name)
+        for column, __ in self.modify_columns:
+            warnings.warn('SQLite can not modify column {} of {}, the table '
+                          'must be rebuilt'.format(column.name, self.table))
+        statements.extend('ALTER TABLE {} DROP COLUMN {}'.format(
+            self.table, name) for name in self.drop_columns)
+        statements.extend(index._index_schema(self.table, 'sqlite')
+                          for index in self.add_indexes)
+        statements.extend(
+            'CREATE UNIQUE INDEX IF NOT EXISTS {0} ON {1} ({0})'.format(
+                name, self.table) for name in unique)
+        return statements
+
+
+def diff_table(model, columns, indexes, drop=False):
+    """
+    Returns the ``TableDiff`` of a table and its model. Changes to the
+    ``unique`` and ``primary_key`` attributes of existing columns aren't
+    detected, as constraints are left out of modified columns.
+
+    :param obj model: A ``Model`` object of the table.
+    :param list columns: The ``ColumnInfo`` tuples of the table, in order.
+    :param dict indexes: Maps the name of each secondary index of the table
+                         to an ``Index`` object describing it.
+    :param bool drop: Drops columns and indexes which aren't in the model if
+                      ``True``. Defaults to ``False``.
+    """
+    model._check_indexes()
+
+    sql_type = model._sql_type
+    diff = TableDiff(model.name, sql_type)
+    existing = dict((info.name, info) for info in columns)
+
+    names = [column.name for column in model.columns]
+    for idx, column in enumerate(model.columns):
+        info = existing.get(column.name)
+        if info is None:
+            # columns after the last existing column are simply appended
+            if all(name not in existing for name in names[idx:]):
+                after = None
+            else:
+                after = names[idx - 1] if idx else ''
+            diff.add_columns.append((column, after))
+        else:
+            expected = column_info(column, sql_type)
+            if not _same_column(expected, info):
+                diff.modify_columns.append(
+                    (column, normalize_type(expected.column_type) !=
+                     normalize_type(info.column_type)))
+
+    if drop:
+        diff.drop_columns = [info.name for info in columns
+                             if info.name not in model._column_index]
+
+    # indexes made for UNIQUE columns aren't declared in indexes
+    unique_columns = set(column.name for column in model.columns
+                         if column._attributes['unique'])
+    declared = dict((index.index_name(model.name), index)
+                    for index in model.indexes)
+
+    for index in model.indexes:
+        name = index.index_name(model.name)
+        current = indexes.get(name)
+        if current is None:
+            diff.add_indexes.append(index)
+        elif (current._index_schema(model.name, sql_type) !=
+              index._index_schema(model.name, sql_type)):
+            diff.drop_indexes.append(name)
+            diff.add_indexes.append(index)
+
+    if drop:
+        diff.drop_indexes.extend(
+            name for name, index in indexes.items()
+            if name not in declared and
+            not (index.unique and index.columns == (name,) and
+                 name in unique_columns))
+
+    return diff
+
+
+def server_version(model):
+    """
+    Returns the version of the database server as a tuple of ints. MariaDB
+    servers are reported as ``()`` since their online DDL rules differ.
+
+    :param obj model: A ``Model`` object used to query the server.
+    """
+    if model._sql_type == 'sqlite':
+        return sqlite3.sqlite_version_info
+
+    model.append_query('SELECT VERSION()')
+    model.execute()
+    version = model.fetchone()[0]
+    if 'mariadb' in version.lower():
+        return ()
+    return tuple(int(part) for part in
+                 re.match(r'(\d+)\.(\d+)\.(\d+)', version).groups())
+
+
+def introspect(model):
+    """
+    Returns a dict mapping the name of each table of the database to a tuple
+    of its ``ColumnInfo`` list and a dict of its secondary indexes.
+
+    :param obj model: A ``Model`` object used to query the database.
+    """
+    if model._sql_type == 'sqlite':
+        return _introspect_sqlite(model)
+
+    tables = {}
+    model.append_query(
+        'SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, '
+        'COLUMN_DEFAULT, EXTRA FROM information_schema.COLUMNS WHERE '
+        'TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION')
+    model.execute()
+    for table, name, column_type, nullable, default, extra in \
+            model.fetchall():
+        extra = (extra or '').lower()
+        tables.setdefault(table.lower(), ([], {}))[0].append(ColumnInfo(
+            name.lower(), column_type, nullable == 'NO', default,
+            'auto_increment' in extra, 'on update' in extra))
+
+    model.append_query(
+        'SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME, SUB_PART, '
+        'INDEX_TYPE FROM information_schema.STATISTICS WHERE '
+        "TABLE_SCHEMA = DATABASE() AND INDEX_NAME != 'PRIMARY' "
+        'ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX')
+    model.execute()
+    parts = {}
+    for table, name, non_unique, column, sub_part, index_type in \
+            model.fetchall():
+        key = (table.lower(), name.lower())
+        parts.setdefault(key, (not int(non_unique),
+                               index_type == 'FULLTEXT', []))[2].append(
+            (column.lower(), sub_part) if sub_part else column.lower())
+
+    for (table, name), (unique, fulltext, columns) in parts.items():
+        if table in tables:
+            tables[table][1][name] = Index(columns, name=name, unique=unique,
+                                           fulltext=fulltext)
+    return tables
+
+
+def _introspect_sqlite(model):
+    model.append_query("SELECT name FROM sqlite_master WHERE type='table' "
+                       "AND name NOT LIKE 'sqlite_%%'")
+    model.execute()
+    names = [row[0] for row in model.fetchall()]
+
+    tables = {}
+    for table in names:
+        model.append_query('PRAGMA table_info({})'.format(table))
+        model.execute()
+        columns = [ColumnInfo(name.lower(), column_type, bool(notnull),
+                              default, False, False)
+                   for __, name, column_type, notnull, default, __ in
+                   model.fetchall()]
+
+        model.append_query('PRAGMA index_list({})'.format(table))
+        model.execute()
+        # only indexes made with CREATE INDEX, not constraints
+        found = [(row[1], bool(row[2])) for row in model.fetchall()
+                 if row[3] == 'c']
+
+        indexes = {}
+        for name, unique in found:
+            model.append_query('PRAGMA index_info({})'.format(name))
+            model.execute()
+            indexes[name.lower()] = Index(
+                [row[2].lower() for row in model.fetchall()], name=name,
+                unique=unique)
+
+        tables[table.lower()] = (columns, indexes)
+    return tables
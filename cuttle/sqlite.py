@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the embedded SQLite backend used when a ``Cuttle``
+object is created with ``sql_type='sqlite'``.
+
+The ``Connection`` and ``Cursor`` classes wrap their ``sqlite3`` counterparts
+so they behave like the PyMySQL objects the rest of Cuttle is written
+against, most notably accepting ``%s`` placeholders.
+
+:license: MIT, see LICENSE for details.
+"""
+import re
+import sqlite3
+
+
+JOURNAL_MODES = [
+    'DELETE',
+    'TRUNCATE',
+    'PERSIST',
+    'MEMORY',
+    'WAL',
+    'OFF'
+]
+
+SYNCHRONOUS_MODES = [
+    'OFF',
+    'NORMAL',
+    'FULL',
+    'EXTRA'
+]
+
+_PLACEHOLDER_RE = re.compile(r'%([s%])')
+
+
+def _placeholder(match):
+    return '?' if match.group(1) == 's' else '%'
+
+
+def translate_query(query):
+    """
+    Translates a query using the ``format`` paramstyle (``%s``) into one using
+    the ``qmark`` paramstyle (``?``) understood by ``sqlite3``. Escaped
+    percent signs (``%%``) are unescaped.
+
+    :param str query: A SQL query string.
+    """
+    if '%' not in query:
+        return query
+    return _PLACEHOLDER_RE.sub(_placeholder, query)
+
+
+def is_memory(db, memory=False):
+    """
+    Returns ``True`` if ``connect()`` opens an in-memory database with these
+    arguments.
+
+    :param str db: The ``db`` argument of ``connect()``.
+    :param bool memory: The ``memory`` argument of ``connect()``.
+    """
+    return memory or db == ':memory:'
+
+
+def connect(db, memory=False, journal_mode='WAL', synchronous='NORMAL',
+            timeout=5.0, **kwargs):
+    """
+    Returns a ``Connection`` to a SQLite database.
+
+    :param str db: Path to the database file or, if ``memory`` is ``True``,
+                   the name of the in-memory database.
+    :param bool memory: Uses a named, shared-cache in-memory database which
+                        every connection in the pool can see. The database
+                        is destroyed when its last connection is closed.
+                        Defaults to ``False``.
+    :param str journal_mode: Journal mode of file backed databases. Defaults
+                             to ``'WAL'`` so readers don't block the writer.
+    :param str synchronous: Synchronous setting of file backed databases.
+                            Defaults to ``'NORMAL'`` which is safe with WAL.
+    :param float timeout: Seconds to wait for a lock before raising. Defaults
+                          to ``5.0``.
+    :param \**kwargs: Additional arguments passed to ``sqlite3.connect()``.
+
+    :raises ValueError: If improper journal_mode or synchronous parameter.
+    """
+    journal_mode = journal_mode.upper()
+    synchronous = synchronous.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError('{} is not a valid journal mode'.format(journal_mode))
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError('{} is not a valid synchronous '
+                         'setting'.format(synchronous))
+
+    memory = is_memory(db, memory)
+    if memory:
+        database = 'file:{}?mode=memory&cache=shared'.format(db)
+        kwargs['uri'] = True
+    else:
+        database = db
+
+    # connections are handed between threads by the pool, but only ever used
+    # by one thread at a time
+    connection = sqlite3.connect(database, timeout=timeout,
+                                 check_same_thread=False, **kwargs)
+
+    if not memory:
+        connection.execute('PRAGMA journal_mode={}'.format(journal_mode))
+        connection.execute('PRAGMA synchronous={}'.format(synchronous))
+
+    return Connection(connection)
+
+
+class Connection(object):
+    """
+    A wrapper around a ``sqlite3.Connection`` object.
+
+    :param connection: A ``sqlite3.Connection`` object.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._open = True
+
+    @property
+    def open(self):
+        """
+        Returns ``True`` if the connection has not been closed.
+        """
+        return self._open
+
+    def cursor(self):
+        """
+        Returns a new ``Cursor``.
+        """
+        return Cursor(self)
+
+    def ping(self, reconnect=False):
+        """
+        Ensures the connection is open. SQLite runs in process so there is no
+        server to contact.
+
+        :raises ProgrammingError: If the connection is closed.
+        """
+        if not self._open:
+            raise sqlite3.ProgrammingError(
+                'Cannot operate on a closed database.')
+
+    def commit(self):
+        """
+        Commits changes.
+        """
+        self._connection.commit()
+
+    def rollback(self):
+        """
+        Rolls back the current transaction.
+        """
+        self._connection.rollback()
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self._open = False
+        self._connection.close()
+
+
+class Cursor(object):
+    """
+    A wrapper around a ``sqlite3.Cursor`` object which accepts ``%s``
+    placeholders and returns rows as tuples.
+
+    :param obj connection: A ``Connection`` object.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._connection.cursor()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    def execute(self, query, args=None):
+        """
+        Executes a query and returns the number of affected rows.
+
+        :param str query: A SQL query string using ``%s`` placeholders.
+        :param args: A sequence of values for the placeholders.
+        """
+        self._cursor.execute(translate_query(query), args or ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        """
+        Executes a query against each sequence of values and returns the
+        number of affected rows.
+
+        :param str query: A SQL query string using ``%s`` placeholders.
+        :param args: A sequence of sequences of values.
+        """
+        self._cursor.executemany(translate_query(query), args)
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        """
+        Fetches the next row.
+        """
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        """
+        Fetches ``size`` number of rows or ``arraysize`` rows if ``size`` is
+        ``None``.
+        """
+        if size is None:
+            size = self._cursor.arraysize
+        return tuple(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        """
+        Fetches all the rows in the cursor.
+        """
+        return tuple(self._cursor.fetchall())
+
+    def close(self):
+        """
+        Closes the cursor.
+        """
+        try:
+            self._cursor.close()
+        finally:
+            self.connection = None
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the QueryStats hook which aggregates statement
+statistics by query fingerprint.
+
+:license: MIT, see LICENSE for details.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+
+from cuttle.cache import StatementCache
+from cuttle.hooks import Histogram, StatementHook
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_ROW = r'\(\s*\?(?:\s*,\s*\?)*\s*\)'
+_IN_LIST = re.compile(r'\bIN\s*' + _ROW, re.IGNORECASE)
+_ROWS = re.compile(r'({0})(?:\s*,\s*{0})+'.format(_ROW))
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(query):
+    """
+    Returns the fingerprint of ``query``, its shape with literals and
+    placeholders replaced by ``?``, IN lists collapsed to ``IN (...)``, the
+    rows of multi-row VALUES collapsed to the first row and whitespace
+    collapsed.
+
+    :param str query: The query string.
+    """
+    query = _STRING.sub('?', query)
+    query = _NUMBER.sub('?', query)
+    query = _PLACEHOLDER.sub('?', query)
+    query = _IN_LIST.sub('IN (...)', query)
+    query = _ROWS.sub(r'\1, ...', query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class _Stats(object):
+    """
+    The statistics of one fingerprint.
+    """
+
+    __slots__ = ('calls', 'errors', 'execute_time', 'fetch_time',
+                 'rows_returned', 'rows_affected', 'histogram')
+
+    def __init__(self, bounds):
+        self.calls = 0
+        self.errors = 0
+        self.execute_time = 0.0
+        self.fetch_time = 0.0
+        self.rows_returned = 0
+        self.rows_affected = 0
+        self.histogram = Histogram(bounds)
+
+
+class QueryStats(StatementHook):
+    """
+    Aggregates statement statistics by query fingerprint, a client side
+    counterpart of ``pg_stat_statements``::
+
+      stats = QueryStats()
+      db.add_hook(stats)
+      ...
+      for entry in stats.snapshot()[:10]:
+          print(entry['fingerprint'], entry['total_time'])
+
+    Latencies are the execution time of statements, excluding connection
+    checkout and fetches, which are totalled separately as ``fetch_time``.
+    The 99th percentile is the upper bound of the latency histogram bucket it
+    falls in.
+
+    :param tuple bounds: The bucket bounds of the latency histograms.
+                         Defaults to ``Histogram.default_bounds``.
+    :param int cache_size: The number of query strings whose fingerprint is
+                           cached. Defaults to ``1024``.
+    """
+
+    def __init__(self, bounds=None, cache_size=1024):
+        self.bounds = bounds
+        self._stats = {}
+        self._fingerprints = StatementCache(cache_size)
+        self._lock = threading.Lock()
+        self._dumper = None
+        self._stop = None
+
+    def after(self, event):
+        stats = self._entry(event.query)
+        with self._lock:
+            stats.calls += 1
+            stats.execute_time += event.execute_time
+            if event.error is not None:
+                stats.errors += 1
+            elif not event.read and event.rowcount is not None:
+                stats.rows_affected += max(event.rowcount, 0)
+        stats.histogram.add(event.execute_time)
+
+    def after_fetch(self, event):
+        stats = self._entry(event.query)
+        with self._lock:
+            stats.fetch_time += event.last_fetch_time
+            stats.rows_returned += event.last_fetch_rows
+
+    def snapshot(self):
+        """
+        Returns a list of dicts with the ``fingerprint``, ``calls``,
+        ``errors``, ``total_time``, ``mean_time``, ``p99_time``,
+        ``fetch_time``, ``rows_returned`` and ``rows_affected`` of every
+        fingerprint, ordered by total time, slowest first.
+        """
+        with self._lock:
+            items = list(self._stats.items())
+
+        entries = []
+        for query, stats in items:
+            entries.append(dict(
+                fingerprint=query,
+                calls=stats.calls,
+                errors=stats.errors,
+                total_time=stats.execute_time,
+                mean_time=stats.execute_time / stats.calls
+                if stats.calls else 0.0,
+                p99_time=stats.histogram.percentile(99),
+                fetch_time=stats.fetch_time,
+                rows_returned=stats.rows_returned,
+                rows_affected=stats.rows_affected))
+        entries.sort(key=lambda entry: entry['total_time'], reverse=True)
+        return entries
+
+    def reset(self):
+        """
+        Removes the statistics of every fingerprint.
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self, path):
+        """
+        Writes the snapshot to ``path`` as JSON. The file is replaced
+        atomically so readers never see a partial dump.
+
+        :param str path: The path of the file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                # inf is not valid JSON
+                json.dump([dict(entry, p99_time=None)
+                           if entry['p99_time'] == float('inf') else entry
+                           for entry in self.snapshot()], f, indent=2)
+            if hasattr(os, 'replace'):
+                os.replace(tmp, path)
+            else:
+                os.rename(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def start_dumping(self, path, interval=60):
+        """
+        Starts a background thread which dumps the snapshot to ``path`` every
+        ``interval`` seconds, and once more when ``stop_dumping()`` is
+        called.
+
+        :param str path: The path of the file.
+        :param float interval: The number of seconds between dumps. Defaults
+                               to ``60``.
+
+        :raises ValueError: If interval is not positive or dumping has
+                            already started.
+        """
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        if self._dumper is not None:
+            raise ValueError('already dumping')
+
+        self._stop = threading.Event()
+
+        def run(stop):
+            while not stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self._dumper = threading.Thread(target=run, args=(self._stop,),
+                                        name='cuttle-query-stats')
+        self._dumper.daemon = True
+        self._dumper.start()
+
+    def stop_dumping(self):
+        """
+        Stops the background thread started by ``start_dumping()``, if any.
+        """
+        if self._dumper is not None:
+            self._stop.set()
+            self._dumper.join()
+            self._dumper = self._stop = None
+
+    def _entry(self, query):
+        """
+        Returns the statistics of the fingerprint of ``query``.
+        """
+        key = self._fingerprints.get(query)
+        if key is None:
+            key = fingerprint(query)
+            self._fingerprints.put(query, key)
+
+        try:
+            return self._stats[key]
+        except KeyError:
+            with self._lock:
+                return self._stats.setdefault(key, _Stats(self.bounds))
@@ -5,6 +5,14 @@ single transaction.
 
 :license: MIT, see LICENSE for details.
 """
+from collections import namedtuple
+
+#: The result of a statement executed by a pipelined transaction.
+StatementResult = namedtuple('StatementResult',
+                             ['query', 'rowcount', 'lastrowid'])
+
+# CLIENT_MULTI_STATEMENTS capability flag of the MySQL protocol
+_MULTI_STATEMENTS = 1 << 16
 
 
 class Transaction(object):
@@ -13,12 +21,30 @@ class Transaction(object):
     across multiple tables into one transaction. A single ``Transaction``
     object can be passed to multiple ``Model`` objects.
 
+    A pipelined transaction queues the write statements executed by its
+    models instead of running them one round trip at a time. Queued
+    statements are sent when the transaction is flushed or committed, or
+    before a read statement is executed so reads see earlier writes. If the
+    connection was made with the ``CLIENT.MULTI_STATEMENTS`` flag, queued
+    statements are sent as multi-statement packets of up to
+    ``pipeline_max_bytes``, otherwise they are executed one after another.
+
     :param obj connection: A connection to the database.
+    :param bool pipeline: Queues write statements if ``True``. Defaults to
+                          ``False``.
     """
 
-    def __init__(self, connection):
+    #: The maximum size in bytes of a multi-statement packet.
+    pipeline_max_bytes = 1024 * 1024
+
+    def __init__(self, connection, pipeline=False):
         self._connection = connection
         self._cur = None
+        self._pipeline = pipeline
+        self._pending = []
+        self._results = []
+        # (result cache, table) pairs invalidated again on commit
+        self._written = set()
 
     def __enter__(self):
         return self
@@ -37,19 +63,120 @@ class Transaction(object):
             self._cur = self._connection.cursor()
         return self._cur
 
+    @property
+    def pipelined(self):
+        """
+        Returns ``True`` if write statements are queued.
+        """
+        return self._pipeline
+
+    @property
+    def pending(self):
+        """
+        Returns the number of queued statements.
+        """
+        return len(self._pending)
+
+    @property
+    def results(self):
+        """
+        Returns a list of ``StatementResult`` tuples for the statements sent
+        since the transaction was last committed or rolled back.
+        """
+        return list(self._results)
+
     def _close(self):
         """Closes the connection to the database."""
         self._connection.close()
         self._connection = None
 
+    def queue(self, query, values=()):
+        """
+        Queues a statement to be sent on the next flush.
+
+        :param str query: The query string.
+        :param values: The values of the query.
+        """
+        self._pending.append((query, tuple(values)))
+
+    def flush(self):
+        """
+        Sends the queued statements and returns a list of ``StatementResult``
+        tuples, one per statement in the order they were queued.
+        """
+        if not self._pending:
+            return []
+
+        pending, self._pending = self._pending, []
+        cursor = self._cursor
+
+        if getattr(self._connection, 'client_flag', 0) & _MULTI_STATEMENTS:
+            results = []
+            for batch in self._packets(cursor, pending):
+                results.extend(self._execute_packet(cursor, batch))
+        else:
+            results = []
+            for query, values in pending:
+                cursor.execute(query, values)
+                results.append(StatementResult(query, cursor.rowcount,
+                                               cursor.lastrowid))
+
+        self._results.extend(results)
+        return results
+
+    def _packets(self, cursor, pending):
+        """
+        Yields lists of ``(query, statement)`` tuples where each list fits in
+        one multi-statement packet.
+        """
+        batch, size = [], 0
+        for query, values in pending:
+            statement = cursor.mogrify(query, values)
+            if batch and size + len(statement) > self.pipeline_max_bytes:
+                yield batch
+                batch, size = [], 0
+            batch.append((query, statement))
+            size += len(statement) + 1
+        if batch:
+            yield batch
+
+    def _execute_packet(self, cursor, batch):
+        """
+        Executes a multi-statement packet and returns the result of each
+        statement.
+        """
+        cursor.execute(';'.join(statement for __, statement in batch))
+
+        results = []
+        for query, __ in batch:
+            if results and not cursor.nextset():
+                break
+            results.append(StatementResult(query, cursor.rowcount,
+                                           cursor.lastrowid))
+        return results
+
     def commit(self):
-        """Commits the transaction."""
+        """
+        Commits the transaction, sending any queued statements first, and
+        returns the results of the statements sent since the last commit.
+        """
+        self.flush()
         self._connection.commit()
 
+        written, self._written = self._written, set()
+        for cache, table in written:
+            cache.invalidate(table)
+
+        results, self._results = self._results, []
+        return results
+
     def end(self):
         """Ends the transaction."""
         self._close()
 
     def rollback(self):
-        """Rolls back the transaction."""
+        """Rolls back the transaction, discarding any queued statements."""
+        self._pending = []
+        self._results = []
+        self._written = set()
         self._connection.rollback()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the BufferedWriter class which buffers inserts from many
+threads and writes them in batches.
+
+:license: MIT, see LICENSE for details.
+"""
+import atexit
+from collections import OrderedDict
+import threading
+import time
+
+from cuttle.model import _estimate_size
+
+
+class BufferedWriter(object):
+    """
+    Buffers rows inserted from any number of threads and writes them behind
+    the callers' backs. Rows are grouped by model and columns and written with
+    :func:`~cuttle.model.Model.bulk_insert`, all in one transaction committed
+    once per flush. A flush happens when ``max_rows`` rows or ``max_bytes``
+    bytes are buffered or the oldest buffered row has waited ``max_latency``
+    seconds::
+
+      with db.writer(max_rows=5000) as writer:
+          for event in events:
+              writer.insert(Events, ['name', 'payload'], event)
+
+    Inserting blocks while ``max_buffered`` rows are waiting to be written.
+    Buffered rows are flushed when the writer is closed, which also happens
+    when the interpreter exits.
+
+    If a background flush fails, the transaction is rolled back, its rows are
+    discarded and the error is raised by the next call to ``insert()``,
+    ``flush()`` or ``close()``.
+
+    :param obj db: The ``Cuttle`` object rows are written to.
+    :param int max_rows: The number of buffered rows that triggers a flush.
+                         Defaults to ``1000``.
+    :param int max_bytes: The estimated size in bytes of buffered rows that
+                          triggers a flush. Defaults to ``1048576``.
+    :param float max_latency: The number of seconds a row is buffered before
+                              a flush is triggered. Defaults to ``1.0``.
+    :param int max_buffered: The number of buffered and in flight rows at
+                             which inserting blocks. Defaults to
+                             ``10 * max_rows``.
+
+    :raises ValueError: If a threshold is not positive or max_buffered is less
+                        than max_rows.
+    """
+
+    def __init__(self, db, max_rows=1000, max_bytes=1024 * 1024,
+                 max_latency=1.0, max_buffered=None):
+        if max_buffered is None:
+            max_buffered = 10 * max_rows
+        if min(max_rows, max_bytes, max_latency) <= 0:
+            raise ValueError('flush thresholds must be positive')
+        if max_buffered < max_rows:
+            raise ValueError('max_buffered must be at least max_rows')
+
+        self._db = db
+        self._max_rows = max_rows
+        self._max_bytes = max_bytes
+        self._max_latency = max_latency
+        self._max_buffered = max_buffered
+
+        self._buffers = OrderedDict()
+        self._rows = 0
+        self._bytes = 0
+        self._in_flight = 0
+        self._first = None
+
+        self._rows_written = 0
+        self._flushes = 0
+        self._error = None
+        self._closed = False
+
+        # guards the buffers, wakes the flusher and blocked writers
+        self._lock = threading.Condition()
+        # keeps flushes, and so rows of a table, in order
+        self._flush_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='cuttle-buffered-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def buffered(self):
+        """
+        Returns the number of rows waiting to be written.
+        """
+        return self._rows
+
+    @property
+    def rows_written(self):
+        """
+        Returns the number of rows written.
+        """
+        return self._rows_written
+
+    @property
+    def flushes(self):
+        """
+        Returns the number of flushes that wrote rows.
+        """
+        return self._flushes
+
+    @property
+    def closed(self):
+        """
+        Returns ``True`` if the writer is closed.
+        """
+        return self._closed
+
+    def insert(self, model, columns, values):
+        """
+        Buffers a row to be inserted into the table of ``model``.
+
+        :param model: A ``Model`` subclass.
+        :param list columns: The columns to insert values into.
+        :param list values: The values in the same order as the columns.
+
+        :raises ValueError: If the writer is closed or values doesn't have a
+                            value for every column.
+        """
+        columns, values = tuple(columns), tuple(values)
+        if len(columns) != len(values):
+            raise ValueError('row {} does not have a value for every '
+                             'column'.format(values))
+        size = sum(_estimate_size(value) for value in values)
+
+        with self._lock:
+            self._raise_error()
+            while (self._rows + self._in_flight >= self._max_buffered and
+                   not self._closed):
+                self._lock.wait()
+            if self._closed:
+                raise ValueError('writer is closed')
+
+            self._buffers.setdefault((model, columns), []).append(values)
+            self._rows += 1
+            self._bytes += size
+            if self._first is None:
+                self._first = time.time()
+                self._lock.notify_all()
+            elif (self._rows >= self._max_rows or
+                  self._bytes >= self._max_bytes):
+                self._lock.notify_all()
+
+    def flush(self):
+        """
+        Writes the buffered rows in the calling thread and returns the number
+        of rows written.
+        """
+        written = self._flush()
+        with self._lock:
+            self._raise_error()
+        return written
+
+    def close(self):
+        """
+        Stops the background thread after flushing the buffered rows. Closing
+        a closed writer does nothing.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._lock.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+        unregister = getattr(atexit, 'unregister', None)
+        if unregister is not None:
+            unregister(self.close)
+
+        with self._lock:
+            self._raise_error()
+
+    def _due(self):
+        """
+        Returns ``True`` if a flush threshold has been reached.
+        """
+        return (self._rows >= self._max_rows or
+                self._bytes >= self._max_bytes or
+                (self._first is not None and
+                 time.time() - self._first >= self._max_latency))
+
+    def _run(self):
+        """
+        Flushes rows in the background until the writer is closed.
+        """
+        while True:
+            with self._lock:
+                while not (self._closed or self._due()):
+                    timeout = None
+                    if self._first is not None:
+                        timeout = max(self._first + self._max_latency -
+                                      time.time(), 0)
+                    self._lock.wait(timeout)
+                closed = self._closed
+
+            try:
+                self._flush()
+            except Exception as e:
+                with self._lock:
+                    self._error = e
+
+            if closed:
+                return
+
+    def _flush(self):
+        """
+        Writes the buffered rows in one transaction and returns the number of
+        rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, OrderedDict()
+                rows = self._rows
+                self._in_flight += rows
+                self._rows = self._bytes = 0
+                self._first = None
+
+            try:
+                if buffers:
+                    self._write(buffers)
+            finally:
+                with self._lock:
+                    self._in_flight -= rows
+                    self._lock.notify_all()
+
+            self._rows_written += rows
+            if rows:
+                self._flushes += 1
+            return rows
+
+    def _write(self, buffers):
+        """
+        Inserts the rows of each table and commits.
+        """
+        with self._db.transaction() as transaction:
+            for (model, columns), rows in buffers.items():
+                with model(transaction=transaction) as m:
+                    m.bulk_insert(columns, rows)
+
+    def _raise_error(self):
+        """
+        Raises the error of a failed background flush, if any.
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -33,8 +33,10 @@ setup(name='cuttle',
           'Programming Language :: Python :: 3.4',
           'Programming Language :: Python :: 3.5',
           'Programming Language :: Python :: 3.6',
+          # the optional cuttle.aio module requires Python 3.7+
+          'Programming Language :: Python :: 3.7',
       ],
-      keywords='sql mysql orm',
+      keywords='sql mysql sqlite orm',
       packages=find_packages(),
       include_package_data=True,
       install_requires=['cuttlepool>=0.4.1'],
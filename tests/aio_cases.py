@@ -0,0 +1,202 @@
+# -*- coding: utf-8
+"""
+Tests related to the asyncio classes. They are imported by test_aio on
+Python 3.7+ only, as this module can't be compiled by older versions.
+"""
+import asyncio
+import unittest
+
+from cuttle.aio import AsyncCuttle, AsyncPool
+from cuttle.reef import Column, Cuttle
+
+
+class AsyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        self.db = Cuttle('sqlite', db='_cuttle_aio', memory=True)
+
+        class Heros(self.db.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+        self.testtable1 = Heros
+
+        self.db.create_db()
+        self.addCleanup(self.db.drop_db)
+
+        self.adb = AsyncCuttle(self.db, size=2)
+        self.addCleanup(self.adb.close)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+class AsyncModelTestCase(AsyncTestCase):
+
+    def test_execute_and_fetch(self):
+        async def go():
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.insert(['hero_name'], ['Goku'])\
+                           .execute(commit=True)
+                await heros.select('hero_name').where(hero_id=1).execute()
+                return await heros.fetchall()
+
+        self.assertEqual(self.run_async(go()), (('Goku',),))
+
+    def test_async_iteration(self):
+        async def go():
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.bulk_insert(['hero_name'],
+                                        [('Goku',), ('Gohan',)], commit=True)
+                await heros.select('hero_name').execute()
+                return [row async for row in heros]
+
+        self.assertEqual(self.run_async(go()), [('Goku',), ('Gohan',)])
+
+    def test_connection_released(self):
+        async def go():
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.select().execute()
+                self.assertEqual(self.adb.pool.in_use, 1)
+
+        self.run_async(go())
+        self.assertEqual(self.adb.pool.in_use, 0)
+
+    def test_concurrent_models_share_bounded_pool(self):
+        peak = []
+
+        async def query(i):
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.insert(['hero_name'], ['Hero{}'.format(i)])\
+                           .execute(commit=True)
+                peak.append(self.adb.pool.in_use)
+
+        async def go():
+            await asyncio.gather(*[query(i) for i in range(10)])
+
+        self.run_async(go())
+        self.assertTrue(max(peak) <= 2)
+
+        async def count():
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.select().execute()
+                return len(await heros.fetchall())
+
+        self.assertEqual(self.run_async(count()), 10)
+
+    def test_split_where_in_bounded(self):
+        self.testtable1.in_list_size = 2
+        self.addCleanup(delattr, self.testtable1, 'in_list_size')
+
+        async def go():
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.bulk_insert(['hero_name'],
+                                        [('Hero{}'.format(i),)
+                                         for i in range(5)], commit=True)
+
+            pool = self.db.Model._pool
+            checkouts = []
+            get_connection = pool.get_connection
+
+            def counted():
+                checkouts.append(1)
+                return get_connection()
+
+            pool.get_connection = counted
+            try:
+                async with self.adb.model(self.testtable1) as heros:
+                    await heros.select('hero_name')\
+                               .where_in('hero_id', [1, 2, 3, 4, 5],
+                                         parallel=3)\
+                               .execute()
+                    rows = await heros.fetchall()
+            finally:
+                del pool.get_connection
+            return rows, len(checkouts)
+
+        rows, checkouts = self.run_async(go())
+        self.assertEqual(len(rows), 5)
+        # the chunks ran on the connection acquired by the async model
+        self.assertEqual(checkouts, 1)
+
+    def test_explain(self):
+        async def go():
+            async with self.adb.model(self.testtable1) as heros:
+                return await heros.select().where(hero_id=1).explain()
+
+        self.assertTrue(self.run_async(go()))
+
+    def test_blocking_methods_unsupported(self):
+        heros = self.adb.model(self.testtable1)
+        with self.assertRaises(AttributeError):
+            heros.stream()
+        with self.assertRaises(AttributeError):
+            heros.cursor
+
+
+class AsyncTransactionTestCase(AsyncTestCase):
+
+    def test_commit(self):
+        async def go():
+            async with self.adb.transaction() as t:
+                heros = self.adb.model(self.testtable1, t)
+                await heros.insert(['hero_name'], ['Goku']).execute()
+
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.select('hero_name').execute()
+                return await heros.fetchall()
+
+        self.assertEqual(self.run_async(go()), (('Goku',),))
+        self.assertEqual(self.adb.pool.in_use, 0)
+
+    def test_rollback_on_error(self):
+        async def go():
+            try:
+                async with self.adb.transaction() as t:
+                    heros = self.adb.model(self.testtable1, t)
+                    await heros.insert(['hero_name'], ['Goku']).execute()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            async with self.adb.model(self.testtable1) as heros:
+                await heros.select('hero_name').execute()
+                return await heros.fetchall()
+
+        self.assertEqual(self.run_async(go()), ())
+
+    def test_model_requires_entered_transaction(self):
+        with self.assertRaises(ValueError):
+            self.adb.model(self.testtable1, self.adb.transaction())
+
+
+class AsyncPoolTestCase(AsyncTestCase):
+
+    def test_fair_queuing(self):
+        pool = AsyncPool(self.db.Model._pool, size=1)
+        self.addCleanup(pool.close)
+        order = []
+
+        async def worker(i):
+            connection = await pool.acquire()
+            order.append(i)
+            await asyncio.sleep(0)
+            pool.release(connection)
+
+        async def go():
+            first = await pool.acquire()
+            tasks = [self.loop.create_task(worker(i)) for i in range(3)]
+            await asyncio.sleep(0)
+            pool.release(first)
+            await asyncio.gather(*tasks)
+
+        self.run_async(go())
+        self.assertEqual(order, [0, 1, 2])
+
+    def test_improper_size(self):
+        with self.assertRaises(ValueError):
+            AsyncPool(self.db.Model._pool, size=0)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8
+"""
+Runs the tests of the asyncio classes, which require Python 3.7+.
+"""
+import sys
+
+if sys.version_info >= (3, 7):
+    from aio_cases import (AsyncModelTestCase, AsyncPoolTestCase,
+                           AsyncTransactionTestCase)
@@ -5,7 +5,8 @@ Tests related to the Column class.
 import decimal
 import unittest
 
-from cuttle.reef import Column
+from cuttle.columns import ColumnIndex
+from cuttle.reef import Column, Index
 
 
 class ColumnNamePropertyTestCase(unittest.TestCase):
@@ -21,6 +22,51 @@ class ColumnNamePropertyTestCase(unittest.TestCase):
         self.assertEqual(column.name, name.lower())
 
 
+class ColumnSlotsTestCase(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        column = Column('test', 'INT')
+        self.assertFalse(hasattr(column, '__dict__'))
+
+    def test_attributes_property(self):
+        column = Column('test', 'int', primary_key=True)
+        self.assertEqual(column._attributes['column_type'], 'INT')
+        self.assertTrue(column._attributes['primary_key'])
+        self.assertEqual(column.column_type, 'INT')
+        self.assertTrue(column.primary_key)
+
+
+class ColumnIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = [
+            Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+            Column('Hero_Name', 'VARCHAR', maximum=16)
+        ]
+        self.index = ColumnIndex(self.columns)
+
+    def test_names(self):
+        self.assertEqual(self.index.names, frozenset(['hero_id', 'hero_name']))
+        self.assertIn('hero_name', self.index)
+        self.assertNotIn('villain_name', self.index)
+
+    def test_lookups(self):
+        self.assertIs(self.index.by_name['hero_name'], self.columns[1])
+        self.assertEqual(self.index.positions, dict(hero_id=0, hero_name=1))
+        self.assertEqual(self.index.types,
+                         dict(hero_id='INT', hero_name='VARCHAR'))
+
+    def test_lookups_read_only(self):
+        with self.assertRaises(TypeError):
+            self.index.by_name['villain_name'] = self.columns[0]
+        with self.assertRaises(TypeError):
+            self.index.positions['hero_id'] = 1
+
+    def test_primary_key(self):
+        self.assertIs(self.index.primary_key, self.columns[0])
+        self.assertIsNone(ColumnIndex().primary_key)
+
+
 class ColumnSchemaTestCase(unittest.TestCase):
 
     def test_column_basic(self):
@@ -87,3 +133,61 @@ class ColumnSchemaTestCase(unittest.TestCase):
         column = Column('test', 'INT', update=6)
         column_schema = 'test INT ON UPDATE 6,\n'
         self.assertEqual(column._column_schema(), column_schema)
+
+
+class ColumnSqliteSchemaTestCase(unittest.TestCase):
+
+    def test_column_auto_increment(self):
+        column = Column('test', 'INT', auto_increment=True, primary_key=True)
+        column_schema = 'test INTEGER PRIMARY KEY AUTOINCREMENT,\n'
+        self.assertEqual(column._column_schema('sqlite'), column_schema)
+
+    def test_column_auto_increment_not_primary_key(self):
+        column = Column('test', 'INT', auto_increment=True)
+        with self.assertRaises(ValueError):
+            column._column_schema('sqlite')
+
+    def test_column_update(self):
+        column = Column('test', 'INT', update=6)
+        column_schema = 'test INT,\n'
+        self.assertEqual(column._column_schema('sqlite'), column_schema)
+
+
+class IndexSchemaTestCase(unittest.TestCase):
+
+    def test_single_column(self):
+        index = Index('Hero_Name')
+        self.assertEqual(index.columns, ('hero_name',))
+        self.assertEqual(index._index_schema('heros'),
+                         'INDEX ix_heros_hero_name (hero_name)')
+
+    def test_composite(self):
+        index = Index(['hero_name', 'age'], name='by_name_age')
+        self.assertEqual(index._index_schema('heros'),
+                         'INDEX by_name_age (hero_name, age)')
+
+    def test_prefix(self):
+        index = Index([('hero_name', 4), 'age'])
+        self.assertEqual(index._index_schema('heros'),
+                         'INDEX ix_heros_hero_name_age (hero_name(4), age)')
+        self.assertEqual(Index(('hero_name', 4)).columns, ('hero_name',))
+
+    def test_unique_and_fulltext(self):
+        self.assertEqual(
+            Index('hero_name', unique=True)._index_schema('heros'),
+            'UNIQUE INDEX ix_heros_hero_name (hero_name)')
+        self.assertEqual(Index('bio', fulltext=True)._index_schema('heros'),
+                         'FULLTEXT INDEX ix_heros_bio (bio)')
+        self.assertRaises(ValueError, Index, 'bio', unique=True,
+                          fulltext=True)
+        self.assertRaises(ValueError, Index, [])
+
+    def test_sqlite(self):
+        index = Index([('hero_name', 4), 'age'], unique=True)
+        self.assertEqual(
+            index._index_schema('heros', 'sqlite'),
+            'CREATE UNIQUE INDEX IF NOT EXISTS ix_heros_hero_name_age ON '
+            'heros (hero_name, age)')
+        self.assertRaises(ValueError,
+                          Index('bio', fulltext=True)._index_schema, 'heros',
+                          'sqlite')
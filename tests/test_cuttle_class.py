@@ -16,6 +16,11 @@ DB = '_cuttle_test_db'
 DB2 = '_cuttle_test_db2'
 HOST = 'localhost'
 
+# tests that inspect the server with MySQL specific statements
+mysql_only = unittest.skipIf(
+    os.environ.get('TEST_CUTTLE', '').lower() == 'sqlite',
+    'test uses MySQL specific statements')
+
 
 class BaseDbTestCase(unittest.TestCase):
 
@@ -36,6 +41,14 @@ class BaseDbTestCase(unittest.TestCase):
 
             self.credentials.update(dict(user=USER, passwd=PASSWD))
 
+        elif self.sql_type == 'sqlite':
+            from cuttle import sqlite
+
+            self.Cursor = sqlite.Cursor
+            self.connect = sqlite.connect
+
+            self.credentials = {}
+
         self.db = Cuttle(self.sql_type, db=DB, **self.credentials)
 
         class Heros(self.db.Model):
@@ -113,7 +126,29 @@ class CuttleInstanceTestCase(unittest.TestCase):
         db = Cuttle('mysql', db=db_name)
         self.assertEqual(db.name, db_name)
 
+    def test_models_property(self):
+        db = Cuttle('mysql', db='db')
+
+        class Heros(db.Model):
+            columns = [Column('hero_id', 'INT')]
+
+        class Villains(Heros):
+            pass
+
+        self.assertEqual(db.models, [Heros, Villains])
+        self.assertEqual(Cuttle('mysql', db='db2').models, [])
+
+    def test_column_index_rebuilt(self):
+        db = Cuttle('mysql', db='db')
+
+        class Heros(db.Model):
+            columns = [Column('hero_id', 'INT')]
+
+        Heros.columns = [Column('hero_name', 'VARCHAR')]
+        self.assertEqual(Heros._column_index.names, frozenset(['hero_name']))
+
 
+@mysql_only
 class CuttleCreateDbTestCase(BaseDbTestCase):
 
     def test_create_db(self):
@@ -140,7 +175,8 @@ class CuttleCreateDbTestCase(BaseDbTestCase):
         cur.execute('SHOW TABLES')
         tbls = cur.fetchall()
 
-        self.assertEqual(((self.testtable1().name,),), tbls)
+        self.assertEqual(sorted(tbls), [(self.db.schema_table,),
+                                        (self.testtable1().name,)])
 
         # get table schema
         cur.execute('DESCRIBE {}'.format(self.testtable1().name))
@@ -149,6 +185,7 @@ class CuttleCreateDbTestCase(BaseDbTestCase):
         self.assertEqual(self.heros_schema, tblschma)
 
 
+@mysql_only
 class CuttleCreateMultiDbTestCase(TwoDbTestCase):
 
     def test_create_two_dbs(self):
@@ -183,6 +220,7 @@ class CuttleCreateMultiDbTestCase(TwoDbTestCase):
         self.assertNotIn((self.testtable1().name,), tbls2)
 
 
+@mysql_only
 class CuttleCreateDbNestedModelsTestCase(DbNestedModelTestCase):
 
     def test_correct_tables_made(self):
@@ -201,6 +239,7 @@ class CuttleCreateDbNestedModelsTestCase(DbNestedModelTestCase):
         self.assertNotIn((self.uselesstable().name,), tbls)
 
 
+@mysql_only
 class CuttleDropDbTestCase(BaseDbTestCase):
 
     def setUp(self):
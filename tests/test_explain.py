@@ -0,0 +1,153 @@
+# -*- coding: utf-8
+"""
+Tests related to query plans and the PlanChecker hook.
+"""
+import unittest
+import warnings
+
+from cuttle.explain import (PlanChecker, QueryPlanError, QueryPlanWarning,
+                            _mysql_step, _sqlite_step)
+
+from test_model_class import MemoryDbTestCase
+
+
+class PlanStepTestCase(unittest.TestCase):
+
+    def test_mysql_step(self):
+        step = _mysql_step({'table': 'heros', 'type': 'ALL', 'key': None,
+                            'rows': 5000,
+                            'Extra': 'Using where; Using filesort'})
+        self.assertTrue(step.full_scan)
+        self.assertTrue(step.filesort)
+        self.assertFalse(step.temporary)
+        self.assertEqual(step.rows, 5000)
+
+        step = _mysql_step({'table': 'heros', 'type': 'ref',
+                            'key': 'ix_heros_hero_name', 'rows': 1,
+                            'Extra': None})
+        self.assertFalse(step.full_scan)
+        self.assertEqual(step.key, 'ix_heros_hero_name')
+
+    def test_sqlite_step(self):
+        self.assertTrue(_sqlite_step('SCAN heros').full_scan)
+        self.assertTrue(_sqlite_step('SCAN TABLE heros').full_scan)
+        self.assertFalse(
+            _sqlite_step('SCAN heros USING COVERING INDEX ix').full_scan)
+
+        step = _sqlite_step('SEARCH heros USING INTEGER PRIMARY KEY (rowid=?)')
+        self.assertEqual((step.table, step.access, step.key),
+                         ('heros', 'SEARCH', 'INTEGER PRIMARY KEY'))
+        self.assertFalse(step.full_scan)
+
+        self.assertTrue(_sqlite_step('USE TEMP B-TREE FOR ORDER BY').filesort)
+        self.assertTrue(
+            _sqlite_step('USE TEMP B-TREE FOR GROUP BY').temporary)
+
+
+class ModelExplainTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+
+    def test_explain_search(self):
+        with self.testtable1() as heros:
+            heros.select('hero_name').where(hero_id=1)
+            plan = heros.explain()
+
+            self.assertEqual(plan.full_scans, [])
+            self.assertEqual(plan.problems(), [])
+            self.assertEqual(plan.steps[0].table, 'heros')
+
+            # the query is kept so it can still be executed
+            self.assertEqual(heros.values, (1,))
+            heros.execute()
+            self.assertEqual(heros.fetchall(), ())
+
+    def test_explain_full_scan(self):
+        with self.testtable1() as heros:
+            plan = heros.select().where(hero_name='Goku').explain()
+
+        self.assertEqual(len(plan.full_scans), 1)
+        self.assertEqual(len(plan.problems(row_threshold=1000)), 1)
+
+    def test_analyze_unsupported(self):
+        with self.testtable1() as heros:
+            heros.select()
+            self.assertRaises(ValueError, heros.explain, analyze=True)
+
+
+class PlanCheckerTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+
+    def addHook(self, hook):
+        # remove the hook before the tables are dropped
+        self.db.add_hook(hook)
+        self.addCleanup(self.db.remove_hook, hook)
+
+    def test_warns_once_per_shape(self):
+        checker = PlanChecker()
+        self.addHook(checker)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with self.testtable1() as heros:
+                for name in ['Goku', 'Vegeta']:
+                    heros.select().where(hero_name=name).execute()
+                heros.select().where(hero_id=1).execute()
+
+        self.assertEqual(len(caught), 1)
+        self.assertIs(caught[0].category, QueryPlanWarning)
+        self.assertEqual(list(checker.report()),
+                         ['SELECT * FROM heros WHERE hero_name=?'])
+
+    def test_fail(self):
+        self.addHook(PlanChecker(fail=True))
+
+        with self.testtable1() as heros:
+            heros.select().where(hero_id=1).execute()
+            for __ in range(2):
+                heros.select().where(hero_name='Goku')
+                self.assertRaises(QueryPlanError, heros.execute)
+                # the rejected query doesn't leak into the next one
+                self.assertEqual(heros.query, '')
+                self.assertEqual(heros.values, ())
+
+    def test_stream(self):
+        checker = PlanChecker()
+        self.addHook(checker)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with self.testtable1() as heros:
+                heros.insert(['hero_name'], ['Goku']).execute()
+                rows = list(heros.select('hero_name')
+                            .where(hero_name='Goku').stream())
+
+        self.assertEqual(rows, [('Goku',)])
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(list(checker.report()),
+                         ['SELECT hero_name FROM heros WHERE hero_name=?'])
+
+    def test_executemany_not_explained(self):
+        checker = PlanChecker(fail=True)
+        self.addHook(checker)
+
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], [['Goku'], ['Gohan']]).executemany()
+            heros.append_query('UPDATE heros SET hero_name=%s '
+                               'WHERE hero_name=%s')
+            heros.extend_values([['Kakarot', 'Goku'], ['Son', 'Gohan']])
+            heros.executemany()
+
+        self.assertEqual(checker.report(), {})
+
+    def test_writes_not_explained(self):
+        checker = PlanChecker(fail=True)
+        self.addHook(checker)
+
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute()
+
+        self.assertEqual(checker.report(), {})
@@ -0,0 +1,154 @@
+# -*- coding: utf-8
+"""
+Tests related to statement hooks.
+"""
+import logging
+import unittest
+
+from cuttle.hooks import (Histogram, LatencyHistograms, SlowQueryLog,
+                          StatementHook)
+
+from test_model_class import MemoryDbTestCase
+
+
+class RecordingHook(StatementHook):
+
+    def __init__(self):
+        self.calls = []
+
+    def before(self, event):
+        self.calls.append(('before', event.query, event.parameters))
+
+    def after(self, event):
+        self.calls.append(('after', event.rowcount, event.error))
+
+    def after_fetch(self, event):
+        self.calls.append(('after_fetch', event.rows_fetched))
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class StatementHookTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+
+    def test_hooks_called(self):
+        hook = RecordingHook()
+        self.db.add_hook(hook)
+
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute()
+            heros.select('hero_name').where(hero_id=1).execute()
+            heros.fetchall()
+
+        self.assertEqual(hook.calls, [
+            ('before', 'INSERT INTO heros (hero_name) VALUES (%s)', 1),
+            ('after', 1, None),
+            ('before', 'SELECT hero_name FROM heros WHERE hero_id=%s', 1),
+            ('after', -1, None),
+            ('after_fetch', 1)
+        ])
+
+    def test_iteration_and_stream_fetches(self):
+        hook = RecordingHook()
+
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'], [('Goku',), ('Vegeta',)],
+                              commit=True)
+            self.db.add_hook(hook)
+
+            heros.select('hero_name').execute()
+            self.assertEqual(len(list(heros)), 2)
+            self.assertEqual(hook.calls[-2:], [('after_fetch', 2),
+                                               ('after_fetch', 2)])
+
+            del hook.calls[:]
+            rows = list(heros.select('hero_name').stream(batch_size=1))
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(hook.calls, [
+                ('before', 'SELECT hero_name FROM heros', 0),
+                ('after', -1, None),
+                ('after_fetch', 1),
+                ('after_fetch', 2),
+                ('after_fetch', 2)
+            ])
+        self.db.remove_hook(hook)
+
+    def test_error_reported(self):
+        hook = RecordingHook()
+        self.db.add_hook(hook)
+
+        with self.testtable1() as heros:
+            heros.append_query('SELECT * FROM villains')
+            with self.assertRaises(Exception):
+                heros.execute()
+
+        self.assertIsNotNone(hook.calls[-1][2])
+
+    def test_remove_hook(self):
+        hook = RecordingHook()
+        self.db.add_hook(hook)
+        self.assertEqual(self.db.hooks, [hook])
+        self.db.remove_hook(hook)
+
+        with self.testtable1() as heros:
+            heros.select().execute()
+            heros.fetchall()
+
+        self.assertEqual(hook.calls, [])
+        self.assertIsNone(heros._event)
+
+    def test_slow_query_log(self):
+        handler = ListHandler()
+        logger = logging.getLogger('cuttle.test_slow_query')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.db.add_hook(SlowQueryLog(threshold=0, logger=logger))
+
+        with self.testtable1() as heros:
+            heros.select().execute()
+            heros.fetchall()
+
+        self.assertEqual(len(handler.records), 1)
+        self.assertIn('SELECT * FROM heros', handler.records[0].getMessage())
+
+    def test_latency_histograms(self):
+        histograms = LatencyHistograms()
+        self.db.add_hook(histograms)
+
+        with self.testtable1() as heros:
+            for __ in range(3):
+                heros.select().execute()
+                heros.fetchall()
+
+        self.assertEqual(histograms.histogram('heros').count, 3)
+        self.assertEqual(histograms.histogram('heros', fetch=True).count, 3)
+        self.assertEqual(list(histograms.snapshot()), ['heros'])
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram(bounds=(0.1, 1.0))
+        for latency in (0.05, 0.05, 0.5, 5.0):
+            histogram.add(latency)
+
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.percentile(50), 0.1)
+        self.assertEqual(histogram.percentile(75), 1.0)
+        self.assertEqual(histogram.percentile(99), float('inf'))
+        self.assertEqual(histogram.snapshot()['buckets'],
+                         {0.1: 2, 1.0: 1, float('inf'): 1})
+
+    def test_empty(self):
+        self.assertEqual(Histogram().mean, 0.0)
+        self.assertEqual(Histogram().percentile(50), 0.0)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8
+"""
+Tests related to writing LOAD DATA INFILE files.
+"""
+import datetime
+import decimal
+import io
+import unittest
+
+from cuttle import infile
+
+
+class EncoderTestCase(unittest.TestCase):
+
+    def test_null(self):
+        for column_type in ('INT', 'DECIMAL', 'FLOAT', 'VARCHAR'):
+            self.assertEqual(infile.encoder(column_type)(None), b'\\N')
+
+    def test_integer(self):
+        self.assertEqual(infile.encoder('INT')(True), b'1')
+        self.assertEqual(infile.encoder('BIGINT')(-42), b'-42')
+
+    def test_fixed_point(self):
+        self.assertEqual(infile.encoder('DECIMAL')(decimal.Decimal('6.01')),
+                         b'6.01')
+
+    def test_floating_point(self):
+        self.assertEqual(infile.encoder('DOUBLE')(0.5), b'0.5')
+
+    def test_text_escaping(self):
+        self.assertEqual(infile.encoder('VARCHAR')(u'a\tb\nc\\d\re\0'),
+                         b'a\\tb\\nc\\\\d\\re\\0')
+
+    def test_text_unicode(self):
+        self.assertEqual(infile.encoder('TEXT')(u'caf\xe9'),
+                         u'caf\xe9'.encode('utf-8'))
+
+    def test_binary_escaping(self):
+        self.assertEqual(infile.encoder('BLOB')(b'\x01\t\\'), b'\x01\\t\\\\')
+
+    def test_datetime(self):
+        value = datetime.datetime(2017, 5, 16, 12, 30)
+        self.assertEqual(infile.encoder('DATETIME')(value),
+                         b'2017-05-16 12:30:00')
+        self.assertEqual(infile.encoder('DATE')(value.date()), b'2017-05-16')
+
+
+class WriteRowsTestCase(unittest.TestCase):
+
+    def test_write_rows(self):
+        f = io.BytesIO()
+        encoders = [infile.encoder('INT'), infile.encoder('VARCHAR')]
+        rows = ((i, 'hero {}'.format(i)) for i in range(2))
+
+        self.assertEqual(infile.write_rows(f, rows, encoders), 2)
+        self.assertEqual(f.getvalue(), b'0\thero 0\n1\thero 1\n')
+
+    def test_wrong_row_length(self):
+        with self.assertRaises(ValueError):
+            infile.write_rows(io.BytesIO(), [(1, 2)], [infile.encoder('INT')])
@@ -2,11 +2,14 @@
 """
 Tests related to the Model class.
 """
+import array
 import sys
+import time
 import unittest
 import warnings
 
-from cuttle.reef import Model
+from cuttle import routing
+from cuttle.reef import Column, Cuttle, Index, Model
 
 from test_cuttle_class import BaseDbTestCase, DB
 
@@ -63,6 +66,901 @@ class ModelConnectionTestCase(ModelTestCase):
                 self.assertEqual(heros.connection_arguments[k], test_outp[k])
 
 
+class MemoryDbTestCase(unittest.TestCase):
+    """
+    Runs against an in-memory SQLite database so no server is required.
+    """
+
+    def createModel(self, **kwargs):
+        db = Cuttle('sqlite', db='_cuttle_memory', memory=True, **kwargs)
+
+        class Heros(db.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+        db.create_db()
+        self.addCleanup(db.drop_db)
+
+        return db, Heros
+
+
+class ModelConnectionValidationTestCase(MemoryDbTestCase):
+
+    def test_improper_strategy(self):
+        with self.assertRaises(ValueError):
+            Cuttle('sqlite', db='_cuttle_validation', memory=True,
+                   validation='wrong')
+
+    def test_always(self):
+        db, Heros = self.createModel(validation='always')
+        pings = db.validation_stats['pings']
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+            heros.insert(['hero_name'], ['Gohan']).execute(commit=True)
+        self.assertEqual(db.validation_stats['pings'], pings + 3)
+
+    def test_checkout(self):
+        db, Heros = self.createModel(validation='checkout')
+        stats = db.validation_stats
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+            heros.insert(['hero_name'], ['Gohan']).execute(commit=True)
+        self.assertEqual(db.validation_stats['pings'], stats['pings'] + 1)
+        self.assertEqual(db.validation_stats['pings_skipped'],
+                         stats['pings_skipped'] + 2)
+
+    def test_idle(self):
+        db, Heros = self.createModel(validation='idle', idle_timeout=0)
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute()
+            pings = db.validation_stats['pings']
+            time.sleep(0.01)
+            heros.commit()
+        self.assertEqual(db.validation_stats['pings'], pings + 1)
+
+        db.Model._pool.idle_timeout = 60
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Gohan']).execute()
+            pings = db.validation_stats['pings']
+            heros.commit()
+        self.assertEqual(db.validation_stats['pings'], pings)
+
+    def test_reconnect_retries_read(self):
+        db, Heros = self.createModel(validation='reconnect')
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+            heros.cursor
+            heros._connection._connection.close()
+
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+
+    def test_reconnect_does_not_retry_write(self):
+        db, Heros = self.createModel(validation='reconnect')
+        with Heros() as heros:
+            heros.cursor
+            heros._connection._connection.close()
+
+            with self.assertRaises(Exception):
+                heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+
+
+class PoolWarmUpTestCase(MemoryDbTestCase):
+
+    def createModel(self, **kwargs):
+        db, Heros = super(PoolWarmUpTestCase, self).createModel(**kwargs)
+        self.addCleanup(db.Model._pool.stop_maintenance)
+        return db, Heros
+
+    def test_improper_arguments(self):
+        with self.assertRaises(ValueError):
+            Cuttle('sqlite', db='_cuttle_warm_up', memory=True,
+                   min_connections=1, prewarm='wrong')
+        with self.assertRaises(ValueError):
+            Cuttle('sqlite', db='_cuttle_warm_up', memory=True, capacity=2,
+                   min_connections=3)
+
+    def test_deferred(self):
+        db = Cuttle('sqlite', db='_cuttle_warm_up', memory=True,
+                    min_connections=2, prewarm='sync')
+        self.addCleanup(db.Model._pool.stop_maintenance)
+        stats = db.warm_up_stats
+        self.assertEqual(stats['connections'], 0)
+        self.assertIsNone(stats['warm_up_time'])
+
+        db.warm_up()
+        self.assertEqual(db.warm_up_stats['connections'], 2)
+
+    def test_sync(self):
+        # warmed up by the first checkout, made by create_db()
+        db, Heros = self.createModel(min_connections=2, prewarm='sync')
+        stats = db.warm_up_stats
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['idle'], 2)
+        self.assertGreaterEqual(stats['warm_up_time'], 0)
+        self.assertEqual(stats['replaced'], 0)
+
+    def test_background(self):
+        # warmed up when initialized, without any checkout
+        db = Cuttle('sqlite', db='_cuttle_warm_up', memory=True,
+                    min_connections=2)
+        self.addCleanup(db.Model._pool.stop_maintenance)
+        for __ in range(200):
+            if db.warm_up_stats['warm_up_time'] is not None:
+                break
+            time.sleep(0.01)
+        self.assertEqual(db.warm_up_stats['connections'], 2)
+
+    def test_maintain_replaces_closed_connections(self):
+        db, Heros = self.createModel(min_connections=2, prewarm='sync',
+                                     idle_timeout=0)
+        pool = db.Model._pool
+        pool._pool.queue[0].close()
+        time.sleep(0.01)
+
+        self.assertEqual(pool.maintain(), 1)
+        stats = db.warm_up_stats
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['replaced'], 1)
+
+        with Heros() as heros:
+            heros.select().execute()
+            self.assertEqual(heros.fetchall(), ())
+
+    def test_maintain_full_pool(self):
+        db, Heros = self.createModel(min_connections=2, prewarm='sync',
+                                     idle_timeout=60, capacity=2)
+        pool = db.Model._pool
+        connection = pool._pool.get_nowait()
+        # the pool was filled while the connection was checked
+        pool._pool.put_nowait(pool._make_connection())
+
+        pool._put_idle(connection)
+        self.assertFalse(connection.open)
+        self.assertEqual(db.warm_up_stats['connections'], 2)
+
+
+class ReplicaRoutingTestCase(MemoryDbTestCase):
+    """
+    The replicas are in-memory databases of their own, so a row can only be
+    read from where it was written.
+    """
+
+    def createReplica(self, suffix=''):
+        name = '{}_replica{}'.format(self.id(), suffix)
+        replica = Cuttle('sqlite', db=name, memory=True)
+
+        class Heros(replica.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+        replica.create_db()
+        self.addCleanup(replica.drop_db)
+
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Replica' + suffix]).execute(
+                commit=True)
+
+        return dict(db=name)
+
+    def test_improper_routing(self):
+        with self.assertRaises(ValueError):
+            Cuttle('sqlite', db='_cuttle_routing', memory=True,
+                   replicas=[dict(db='_cuttle_routing_replica')],
+                   routing='wrong')
+
+    def test_is_replica_read(self):
+        self.assertTrue(routing.is_replica_read(' select * FROM heros'))
+        self.assertFalse(routing.is_replica_read('INSERT INTO heros'))
+        self.assertFalse(
+            routing.is_replica_read('SELECT * FROM heros FOR UPDATE'))
+        self.assertFalse(routing.is_replica_read(
+            'SELECT * FROM heros LOCK IN SHARE MODE'))
+
+    def test_reads_go_to_replica(self):
+        db, Heros = self.createModel(replicas=[self.createReplica()])
+        with Heros() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Replica',),))
+
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Replica',),))
+
+        with Heros(use_replicas=False) as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+
+        self.assertEqual(db.replica_stats[0]['checkouts'], 1)
+
+    def test_uncommitted_writes_read_primary(self):
+        db, Heros = self.createModel(replicas=[self.createReplica()])
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute()
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+
+            heros.commit()
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Replica',),))
+
+    def test_transaction_reads_primary(self):
+        db, Heros = self.createModel(replicas=[self.createReplica()])
+        with db.transaction() as t:
+            heros = Heros(t)
+            heros.insert(['hero_name'], ['Goku']).execute()
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+
+    def test_read_your_writes(self):
+        db, Heros = self.createModel(replicas=[self.createReplica()],
+                                     read_your_writes=60)
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+
+        with Heros() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+
+        db.Model._router._local.until = 0
+        with Heros() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Replica',),))
+
+    def test_round_robin(self):
+        db, Heros = self.createModel(
+            replicas=[self.createReplica('1'), self.createReplica('2')])
+        names = []
+        for __ in range(4):
+            with Heros() as heros:
+                heros.select('hero_name').execute()
+                names.append(heros.fetchone()[0])
+        self.assertEqual(names, ['Replica1', 'Replica2'] * 2)
+        self.assertEqual([stats['checkouts'] for stats in db.replica_stats],
+                         [2, 2])
+
+    def test_least_loaded(self):
+        db, Heros = self.createModel(
+            replicas=[self.createReplica('1'), self.createReplica('2')],
+            routing='least_loaded')
+        with Heros() as busy:
+            busy.select('hero_name').execute()
+            self.assertEqual(busy.fetchone(), ('Replica1',))
+
+            # round robin would choose the busy replica the second time
+            for __ in range(2):
+                with Heros() as heros:
+                    heros.select('hero_name').execute()
+                    self.assertEqual(heros.fetchone(), ('Replica2',))
+
+    def test_falls_back_to_primary(self):
+        db, Heros = self.createModel(
+            replicas=[dict(self.createReplica(), capacity=1, overflow=0,
+                           timeout=0)])
+        with Heros() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+
+        with Heros() as first, Heros() as second:
+            first.select('hero_name').execute()
+            second.select('hero_name').execute()
+            self.assertEqual(first.fetchall(), (('Replica',),))
+            self.assertEqual(second.fetchall(), (('Goku',),))
+
+    def test_depleted_replica_not_waited_on(self):
+        # the replica pool would wait forever without a timeout
+        db, Heros = self.createModel(
+            replicas=[dict(self.createReplica(), capacity=1, overflow=0)])
+        with Heros() as first, Heros() as second:
+            first.select('hero_name').execute()
+            second.select('hero_name').execute()
+            self.assertEqual(second.fetchall(), ())
+
+    def test_upsert_counts_on_primary(self):
+        # the replica already has a row with the key
+        db, Heros = self.createModel(replicas=[self.createReplica()])
+        with Heros() as heros:
+            self.assertEqual(heros.upsert(['hero_id', 'hero_name'],
+                                          [(1, 'Goku')], commit=True),
+                             (1, 0))
+        self.assertEqual(db.replica_stats[0]['checkouts'], 0)
+
+    def test_replica_reads_not_cached(self):
+        db, Heros = self.createModel(replicas=[self.createReplica()])
+        Heros.cache_results = True
+        with Heros() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Replica',),))
+        self.assertEqual(Heros.result_cache_info()['size'], 0)
+
+        with Heros(use_replicas=False) as heros:
+            heros.select('hero_name').execute()
+        self.assertEqual(Heros.result_cache_info()['size'], 1)
+
+
+class ModelBulkInsertTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, Heros = self.createModel()
+        self.statements = []
+
+        statements = self.statements
+
+        class CountingHeros(Heros):
+
+            @property
+            def name(self):
+                return 'heros'
+
+            def execute(self, commit=False):
+                statements.append(self.query)
+                return super(CountingHeros, self).execute(commit)
+
+        self.testtable1 = CountingHeros
+
+    def rows(self, count):
+        return (('Hero{}'.format(i),) for i in range(count))
+
+    def test_bulk_insert_generator(self):
+        with self.testtable1() as heros:
+            rv = heros.bulk_insert(['hero_name'], self.rows(25),
+                                   chunk_size=10, commit=True)
+            self.assertEqual(rv, 25)
+            self.assertEqual(len(self.statements), 3)
+            self.assertTrue(self.statements[0].startswith(
+                'INSERT INTO heros (hero_name) VALUES (%s), (%s)'))
+
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), tuple(self.rows(25)))
+
+    def test_bulk_insert_caches_full_chunks(self):
+        header = 'INSERT INTO heros (hero_name) VALUES '
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'], self.rows(25), chunk_size=10)
+            self.assertIsNotNone(
+                heros._statement_cache.get(('BULK', header, 10, '')))
+            self.assertIsNone(
+                heros._statement_cache.get(('BULK', header, 5, '')))
+
+    def test_bulk_insert_max_bytes(self):
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'], self.rows(10), max_bytes=80)
+            self.assertTrue(len(self.statements) > 1)
+            self.assertTrue(all(s.count('%s') < 10 for s in self.statements))
+
+    def test_bulk_insert_parameter_limit(self):
+        with self.testtable1() as heros:
+            heros._max_parameters = 4
+            heros.bulk_insert(['hero_id', 'hero_name'],
+                              ((i, 'Hero') for i in range(1, 6)))
+            self.assertEqual([s.count('%s') for s in self.statements],
+                             [4, 4, 2])
+
+    def test_bulk_insert_wrong_row_length(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.bulk_insert(['hero_name'], [('Goku', 'Vegeta')])
+
+    def test_bulk_insert_failure(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.bulk_insert(['wrong'], [('Goku',)])
+
+
+class ModelUpsertTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_id', 'hero_name'],
+                              [(1, 'Goku'), (2, 'Vegeta')], commit=True)
+
+    def select_all(self, heros):
+        heros.select().execute()
+        return heros.fetchall()
+
+    def test_upsert(self):
+        with self.testtable1() as heros:
+            rv = heros.upsert(['hero_id', 'hero_name'],
+                              [(2, 'Trunks'), (3, 'Gohan'), (4, 'Goten')],
+                              commit=True)
+            self.assertEqual(rv, (2, 1))
+            self.assertEqual(rv.updated, 1)
+            self.assertEqual(self.select_all(heros),
+                             ((1, 'Goku'), (2, 'Trunks'), (3, 'Gohan'),
+                              (4, 'Goten')))
+
+    def test_upsert_chunked(self):
+        rows = ((i, 'Hero{}'.format(i)) for i in range(1, 11))
+        with self.testtable1() as heros:
+            self.assertEqual(heros.upsert(['hero_id', 'hero_name'], rows,
+                                          chunk_size=3),
+                             (8, 2))
+            self.assertEqual(len(self.select_all(heros)), 10)
+
+    def test_upsert_duplicate_keys_in_chunk(self):
+        with self.testtable1() as heros:
+            self.assertEqual(heros.upsert(['hero_id', 'hero_name'],
+                                          [(5, 'Bulma'), (5, 'Chi-Chi')]),
+                             (1, 1))
+
+    def test_upsert_statement(self):
+        with self.testtable1() as heros:
+            heros.upsert(['hero_id', 'hero_name'], [(1, 'Kakarot')],
+                         chunk_size=1)
+            key = ('BULK', 'INSERT INTO heros (hero_id, hero_name) VALUES ',
+                   1, ' ON CONFLICT (hero_id) DO UPDATE SET '
+                   'hero_name=excluded.hero_name')
+            self.assertIsNotNone(heros._statement_cache.get(key))
+
+    def test_upsert_mysql_statement(self):
+        statements = []
+
+        class MysqlHeros(self.testtable1):
+            _sql_type = 'mysql'
+            _max_bytes = None
+
+            @property
+            def name(self):
+                return 'heros'
+
+            def execute(self, commit=False):
+                statements.append(self.query)
+                self.reset_query()
+                return 3
+
+        with MysqlHeros() as heros:
+            rv = heros.upsert(['hero_id', 'hero_name'],
+                              [(1, 'Kakarot'), (6, 'Krillin')])
+
+        self.assertEqual(statements, [
+            'INSERT INTO heros (hero_id, hero_name) VALUES (%s, %s), '
+            '(%s, %s) ON DUPLICATE KEY UPDATE hero_name=VALUES(hero_name)'])
+        self.assertEqual(rv, (1, 1))
+
+    def test_upsert_no_update_columns(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.upsert(['hero_id'], [(1,)])
+
+    def test_upsert_failure(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.upsert(['hero_id', 'wrong'], [(1, 'Goku')])
+
+
+class ModelWhereInTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        self.testtable1.in_list_size = 3
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'],
+                              [('Hero{}'.format(i),) for i in range(10)],
+                              commit=True)
+
+    def test_where_in(self):
+        with self.testtable1() as heros:
+            heros.select('hero_id').where_in('hero_id', [2, 4])
+            self.assertEqual(heros.query,
+                             'SELECT hero_id FROM heros WHERE hero_id IN '
+                             '(%s, %s)')
+            heros.execute()
+            self.assertEqual(heros.fetchall(), ((2,), (4,)))
+
+    def test_where_in_chained(self):
+        with self.testtable1() as heros:
+            heros.select('hero_id').where(hero_name='Hero1')\
+                 .where_in('hero_id', [2, 4], condition='OR').execute()
+            self.assertEqual(heros.fetchall(), ((2,), (4,)))
+
+    def test_where_in_split(self):
+        with self.testtable1() as heros:
+            rv = heros.select('hero_id').where_in('hero_id', range(1, 9))\
+                      .where(comparison='<>', hero_id=5).execute()
+            self.assertIsNone(rv)
+            self.assertEqual(heros.fetchone(), (1,))
+            self.assertEqual(heros.fetchmany(3), ((2,), (3,), (4,)))
+            self.assertEqual(heros.fetchall(), ((6,), (7,), (8,)))
+
+    def test_where_in_split_parallel(self):
+        with self.testtable1() as heros:
+            heros.select('hero_id').where_in('hero_id', range(1, 11),
+                                             parallel=2).execute()
+            self.assertEqual([row[0] for row in heros], list(range(1, 11)))
+
+    def test_where_in_split_stream(self):
+        with self.testtable1() as heros:
+            rows = heros.select('hero_id').where_in('hero_id', range(1, 9))\
+                        .stream(batch_size=2)
+            self.assertEqual([row[0] for row in rows], list(range(1, 9)))
+            self.assertEqual(heros.query, '')
+
+    def test_where_in_split_explain(self):
+        with self.testtable1() as heros:
+            heros.select().where_in('hero_id', range(1, 9))
+            self.assertRaises(ValueError, heros.explain)
+
+    def test_where_in_split_sees_uncommitted_writes(self):
+        with self.testtable1() as heros:
+            heros.delete().where(hero_id=1).execute()
+            heros.select('hero_id').where_in('hero_id', range(1, 9),
+                                             parallel=2).execute()
+            self.assertEqual([row[0] for row in heros], list(range(2, 9)))
+
+    def test_where_in_parameter_limit(self):
+        self.testtable1._max_parameters = 4
+        with self.testtable1() as heros:
+            heros.select('hero_id').where(comparison='<>', hero_name='Hero')\
+                 .where_in('hero_id', range(1, 9))
+            self.assertEqual(heros.query.count('%s'), 4)
+            heros.execute()
+            self.assertEqual([row[0] for row in heros], list(range(1, 9)))
+
+            self.assertRaises(ValueError, heros.select().where_not_in,
+                              'hero_id', range(1, 6))
+
+    def test_where_in_split_or(self):
+        with self.testtable1() as heros:
+            heros.select('hero_id').where(hero_name='Hero9')\
+                 .where_in('hero_id', range(1, 6), condition='OR').execute()
+            self.assertEqual([row[0] for row in heros], [1, 2, 3, 4, 5, 10])
+
+            heros.select('hero_id').where_in('hero_id', range(1, 6))\
+                 .where(condition='OR', hero_name='Hero9').execute()
+            self.assertEqual([row[0] for row in heros], [1, 2, 3, 4, 5, 10])
+
+            rv = heros.delete().where_in('hero_id', range(1, 6))\
+                      .where(condition='OR', hero_name='Hero9').execute()
+            self.assertEqual(rv, 6)
+
+    def test_where_in_split_write(self):
+        with self.testtable1() as heros:
+            rv = heros.delete().where_in('hero_id', range(1, 9))\
+                      .execute(commit=True)
+            self.assertEqual(rv, 8)
+            heros.select('hero_id').execute()
+            self.assertEqual(heros.fetchall(), ((9,), (10,)))
+
+    def test_where_in_empty(self):
+        with self.testtable1() as heros:
+            heros.select().where_in('hero_id', []).execute()
+            self.assertEqual(heros.fetchall(), ())
+
+    def test_where_not_in(self):
+        with self.testtable1() as heros:
+            heros.select('hero_id').where_not_in('hero_id', range(1, 9))
+            self.assertEqual(heros.query.count('NOT IN'), 3)
+            heros.execute()
+            self.assertEqual(heros.fetchall(), ((9,), (10,)))
+
+    def test_where_in_failure(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.select().where_in('wrong', [1])
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.select().where_in('hero_id', [1], condition='wrong')
+
+    def test_one_split_per_query(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.select().where_in('hero_id', range(5))\
+                     .where_in('hero_name', range(5))
+
+
+class ModelLoadTestCase(MemoryDbTestCase):
+
+    def test_load_falls_back_to_bulk_insert(self):
+        db, Heros = self.createModel()
+        with Heros() as heros:
+            rows = (('Hero{}'.format(i),) for i in range(3))
+            self.assertEqual(heros.load(['hero_name'], rows, commit=True),
+                             (3, []))
+
+            heros.select('hero_name').execute()
+            self.assertEqual(len(heros.fetchall()), 3)
+
+    def test_load_failure(self):
+        db, Heros = self.createModel()
+        with self.assertRaises(ValueError):
+            with Heros() as heros:
+                heros.load(['wrong'], [('Goku',)])
+
+
+class ModelStreamTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'],
+                              (('Hero{}'.format(i),) for i in range(10)),
+                              commit=True)
+
+    def test_stream(self):
+        with self.testtable1() as heros:
+            rows = heros.select('hero_name').stream(batch_size=3)
+            self.assertEqual(heros.query, '')
+            self.assertEqual(list(rows),
+                             [('Hero{}'.format(i),) for i in range(10)])
+
+    def test_stream_closed_early(self):
+        with self.testtable1() as heros:
+            rows = heros.select('hero_name').stream(batch_size=3)
+            self.assertEqual(next(rows), ('Hero0',))
+            rows.close()
+
+            heros.select('hero_name').where(hero_name='Hero9').execute()
+            self.assertEqual(heros.fetchone(), ('Hero9',))
+
+    def test_stream_batch_size(self):
+        with self.assertRaises(ValueError):
+            with self.testtable1() as heros:
+                heros.select().stream(batch_size=0)
+
+    def test_streaming_model(self):
+        class StreamingHeros(self.testtable1):
+            streaming = True
+
+            @property
+            def name(self):
+                return 'heros'
+
+        with StreamingHeros() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(len(list(heros)), 10)
+
+
+class ModelIterateByKeyTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'],
+                              (('Hero{}'.format(i),) for i in range(1, 11)),
+                              commit=True)
+
+    def test_iterate(self):
+        with self.testtable1() as heros:
+            rows = list(heros.iterate_by_key(batch_size=3))
+            self.assertEqual(rows, [(i, 'Hero{}'.format(i))
+                                    for i in range(1, 11)])
+
+    def test_batches(self):
+        with self.testtable1() as heros:
+            batches = list(heros.iterate_by_key(batch_size=4, batches=True))
+            self.assertEqual([len(b) for b in batches], [4, 4, 2])
+
+    def test_start_and_end(self):
+        with self.testtable1() as heros:
+            rows = heros.iterate_by_key(batch_size=2, start=3, end=6,
+                                        columns=['hero_name'])
+            self.assertEqual(list(rows), [('Hero{}'.format(i), i)
+                                          for i in range(4, 7)])
+
+    def test_resume_from_token(self):
+        with self.testtable1() as heros:
+            rows = heros.iterate_by_key(batch_size=3)
+            for __ in range(4):
+                next(rows)
+            self.assertEqual(rows.token, 4)
+
+            resumed = heros.iterate_by_key(batch_size=3, start=rows.token)
+            self.assertEqual(next(resumed), (5, 'Hero5'))
+
+    def test_pending_query_untouched(self):
+        with self.testtable1() as heros:
+            heros.select('hero_name')
+            list(heros.iterate_by_key(batch_size=3))
+            self.assertEqual(heros.query, 'SELECT hero_name FROM heros')
+
+    def test_no_primary_key(self):
+        class Villains(Model):
+            columns = [Column('villain_name', 'VARCHAR', maximum=16)]
+
+        with self.assertRaises(ValueError):
+            with Villains() as villains:
+                villains.iterate_by_key()
+
+
+class ModelNamedRowsTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.Heros = self.createModel()
+
+        class NamedHeros(self.Heros):
+            named_rows = True
+
+            @property
+            def name(self):
+                return 'heros'
+
+        self.testtable1 = NamedHeros
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'], [('Goku',), ('Gohan',)],
+                              commit=True)
+
+    def test_row_class(self):
+        row_class = self.testtable1.row_class()
+        self.assertEqual(row_class._fields, ('hero_id', 'hero_name'))
+        self.assertIs(self.testtable1.row_class(('hero_id', 'hero_name')),
+                      row_class)
+
+    def test_fetchone(self):
+        with self.testtable1() as heros:
+            heros.select().execute()
+            row = heros.fetchone()
+            self.assertEqual(row, (1, 'Goku'))
+            self.assertEqual(row.hero_id, 1)
+            self.assertEqual(row.hero_name, 'Goku')
+            self.assertIsInstance(row, self.testtable1.row_class())
+
+    def test_fetchall_partial_columns(self):
+        with self.testtable1() as heros:
+            heros.select('hero_name').execute()
+            rows = heros.fetchall()
+            self.assertEqual([row.hero_name for row in rows],
+                             ['Goku', 'Gohan'])
+            self.assertEqual(rows[0]._fields, ('hero_name',))
+
+    def test_fetchmany_iter_and_stream(self):
+        with self.testtable1() as heros:
+            heros.select().execute()
+            self.assertEqual(heros.fetchmany(1)[0].hero_name, 'Goku')
+            self.assertEqual([row.hero_name for row in heros], ['Gohan'])
+
+            rows = heros.select().stream()
+            self.assertEqual([row.hero_id for row in rows], [1, 2])
+
+    def test_tuples_by_default(self):
+        with self.Heros() as heros:
+            heros.select().execute()
+            self.assertIs(type(heros.fetchone()), tuple)
+
+
+class ModelResultCacheTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, Heros = self.createModel()
+
+        class CachedHeros(Heros):
+            cache_results = True
+
+            @property
+            def name(self):
+                return 'heros'
+        self.testtable1 = CachedHeros
+
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+
+    def select_names(self, heros):
+        heros.select('hero_name').execute()
+        return heros.fetchall()
+
+    def test_cache_hit(self):
+        with self.testtable1() as heros:
+            self.assertEqual(self.select_names(heros), (('Goku',),))
+            self.assertEqual(self.select_names(heros), (('Goku',),))
+
+        info = self.testtable1.result_cache_info()
+        self.assertEqual((info['hits'], info['misses']), (1, 1))
+
+    def test_invalidated_on_write(self):
+        with self.testtable1() as heros:
+            self.select_names(heros)
+            heros.insert(['hero_name'], ['Gohan']).execute(commit=True)
+            self.assertEqual(self.select_names(heros),
+                             (('Goku',), ('Gohan',)))
+
+    def test_invalidated_on_transaction_commit(self):
+        with self.testtable1() as heros:
+            self.select_names(heros)
+
+            with self.db.transaction() as t:
+                self.testtable1(transaction=t).update(hero_name='Gohan')\
+                                              .execute()
+                # reads inside the transaction bypass the cache
+                self.assertEqual(
+                    self.select_names(self.testtable1(transaction=t)),
+                    (('Gohan',),))
+
+            self.assertEqual(self.select_names(heros), (('Gohan',),))
+
+    def test_uncommitted_writes_not_cached(self):
+        with self.testtable1() as heros:
+            heros.delete().execute(commit=True)
+            heros.insert(['hero_name'], ['Phantom']).execute()
+            self.assertEqual(self.select_names(heros), (('Phantom',),))
+            heros.rollback()
+
+        with self.testtable1() as heros:
+            self.assertEqual(self.select_names(heros), ())
+
+    def test_uncached_model(self):
+        Heros = self.testtable1.__bases__[0]
+        with Heros() as heros:
+            heros.select().execute()
+            heros.fetchall()
+
+        self.assertEqual(self.db.result_cache.info()['misses'], 0)
+
+    def test_named_rows_from_cache(self):
+        self.testtable1.named_rows = True
+        with self.testtable1() as heros:
+            self.select_names(heros)
+            self.assertEqual(self.select_names(heros)[0].hero_name, 'Goku')
+
+
+class ModelFetchColumnsTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        db = Cuttle('sqlite', db=self.id(), memory=True)
+
+        class Stats(db.Model):
+            columns = [
+                Column('stat_id', 'INT', primary_key=True),
+                Column('power', 'FLOAT'),
+                Column('price', 'DECIMAL', precision=(8, 2)),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+        db.create_db()
+        self.addCleanup(db.drop_db)
+        self.testtable = Stats
+
+        with self.testtable() as stats:
+            stats.bulk_insert(['stat_id', 'power', 'price', 'hero_name'],
+                              [(1, 9000.5, 1.25, 'Goku'),
+                               (2, None, 2.5, None),
+                               (3, 1.0, None, 'Gohan')], commit=True)
+
+    def test_fetch_columns(self):
+        with self.testtable() as stats:
+            stats.select().execute()
+            columns = stats.fetch_columns(batch_size=2, use_numpy=False)
+
+        self.assertEqual(list(columns),
+                         ['stat_id', 'power', 'price', 'hero_name'])
+
+        values, mask = columns['stat_id']
+        self.assertEqual(values, array.array('q', [1, 2, 3]))
+        self.assertEqual(mask, bytearray([0, 0, 0]))
+
+        values, mask = columns['power']
+        self.assertEqual(values, array.array('d', [9000.5, 0, 1.0]))
+        self.assertEqual(mask, bytearray([0, 1, 0]))
+
+        values, mask = columns['price']
+        self.assertEqual(values.typecode, 'd')
+        self.assertEqual(mask, bytearray([0, 0, 1]))
+
+        values, mask = columns['hero_name']
+        self.assertEqual(values, ['Goku', None, 'Gohan'])
+        self.assertEqual(mask, bytearray([0, 1, 0]))
+
+    def test_fetch_columns_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+
+        with self.testtable() as stats:
+            stats.select('stat_id', 'hero_name').execute()
+            columns = stats.fetch_columns(use_numpy=True)
+
+        values, mask = columns['stat_id']
+        self.assertEqual(values.dtype, numpy.int64)
+        self.assertEqual(values.tolist(), [1, 2, 3])
+        self.assertEqual(columns['hero_name'][1].tolist(),
+                         [False, True, False])
+
+    def test_fetch_columns_no_query(self):
+        with self.assertRaises(ValueError):
+            with self.testtable() as stats:
+                stats.fetch_columns()
+
+
 class ModelQueryValuesTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -319,6 +1217,112 @@ class ModelTransactionTestCase(ModelTestCase):
         self.assertIn((hero2,), rv)
 
 
+class ModelCreateTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Cuttle('mysql', db='db')
+
+        class Heros(self.db.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16),
+                Column('bio', 'TEXT')
+            ]
+            indexes = [
+                Index(('hero_name', 8), unique=True),
+                Index(['hero_name', 'hero_id'], name='by_name'),
+                Index('bio', fulltext=True)
+            ]
+        self.Model = Heros
+
+    def test_indexes_in_schema(self):
+        with self.Model() as heros:
+            heros._create_table()
+            self.assertEqual(
+                heros.query,
+                'CREATE TABLE IF NOT EXISTS heros (\n'
+                'hero_id INT AUTO_INCREMENT PRIMARY KEY,\n'
+                'hero_name VARCHAR(16),\n'
+                'bio TEXT,\n'
+                'UNIQUE INDEX ix_heros_hero_name (hero_name(8)),\n'
+                'INDEX by_name (hero_name, hero_id),\n'
+                'FULLTEXT INDEX ix_heros_bio (bio)\n'
+                ')')
+            self.assertEqual(heros._create_indexes(), [])
+
+    def test_unknown_column(self):
+        self.Model.indexes = [Index('villain_name')]
+        with self.Model() as heros:
+            self.assertRaises(ValueError, heros._create_table)
+
+
+class ModelStatementCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        class Heros(Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+        self.Model = Heros
+
+    def test_repeated_query_hits_cache(self):
+        for __ in range(2):
+            with self.Model() as heros:
+                heros.select('hero_name').where(hero_id=1)
+                self.assertEqual(
+                    heros.query,
+                    'SELECT hero_name FROM heros WHERE hero_id=%s')
+                self.assertEqual(heros.values, (1,))
+
+        info = self.Model.statement_cache_info()
+        self.assertEqual(info['hits'], 2)
+        self.assertEqual(info['misses'], 2)
+
+    def test_chained_where(self):
+        with self.Model() as heros:
+            heros.select().where(hero_id=1).where(condition='or',
+                                                  hero_name='Goku')
+            self.assertEqual(heros.query, 'SELECT * FROM heros WHERE '
+                             'hero_id=%s OR hero_name=%s')
+
+        with self.Model() as heros:
+            heros.update(hero_name='Goku').where(condition='or', hero_id=1)
+            self.assertEqual(heros.query,
+                             'UPDATE heros SET hero_name=%s WHERE hero_id=%s')
+            self.assertEqual(heros.values, ('Goku', 1))
+
+    def test_cache_is_per_model(self):
+        class Villains(Model):
+            columns = [Column('villain_name', 'VARCHAR', maximum=16)]
+
+        with self.Model() as heros:
+            heros.select()
+        self.assertEqual(Villains.statement_cache_info()['size'], 0)
+
+    def test_failed_validation_not_cached(self):
+        warnings.filterwarnings('ignore')
+        with self.Model(raise_error_on_validation=False) as heros:
+            heros.select('villain_name')
+            self.assertEqual(heros.query, '')
+
+        with self.Model(validate_columns=False) as heros:
+            heros.select('villain_name')
+
+        self.assertEqual(self.Model.statement_cache_info()['size'], 0)
+
+        with self.assertRaises(ValueError):
+            with self.Model() as heros:
+                heros.select('villain_name')
+
+    def test_bounded_size(self):
+        self.Model.statement_cache_size = 1
+        with self.Model() as heros:
+            heros.select('hero_id')
+            heros.select('hero_name')
+        self.assertEqual(self.Model.statement_cache_info()['size'], 1)
+
+
 class ModelLowercaseColumnsTestCase(unittest.TestCase):
 
     def test_columns_lower_arg(self):
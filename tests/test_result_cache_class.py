@@ -0,0 +1,72 @@
+# -*- coding: utf-8
+"""
+Tests related to the ResultCache class.
+"""
+import time
+import unittest
+
+from cuttle.cache import CachedResult, ResultCache
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', 'heros', (), ((1,),))
+        self.assertEqual(cache.get('key'), ((), ((1,),)))
+
+        info = cache.info()
+        self.assertEqual((info['hits'], info['misses'], info['hit_rate']),
+                         (1, 1, 0.5))
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(2)
+        cache.put('a', 'heros', (), ())
+        cache.put('b', 'heros', (), ())
+        cache.get('a')
+        cache.put('c', 'villains', (), ())
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+
+    def test_ttl(self):
+        cache = ResultCache()
+        cache.put('key', 'heros', (), (), ttl=0.01)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.info()['expirations'], 1)
+
+    def test_invalidate_table(self):
+        cache = ResultCache()
+        cache.put('a', 'heros', (), ())
+        cache.put('b', 'heros', (), ())
+        cache.put('c', 'villains', (), ())
+        cache.invalidate('heros')
+
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.info()['invalidations'], 2)
+
+    def test_stale_generation_not_stored(self):
+        cache = ResultCache()
+        generation = cache.generation('heros')
+        cache.invalidate('heros')
+        cache.put('a', 'heros', (), (), generation=generation)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_improper_maxsize(self):
+        with self.assertRaises(ValueError):
+            ResultCache(-1)
+
+
+class CachedResultTestCase(unittest.TestCase):
+
+    def test_fetch(self):
+        result = CachedResult((), ((1,), (2,), (3,)))
+        self.assertEqual(result.fetchone(), (1,))
+        self.assertEqual(result.fetchmany(1), ((2,),))
+        self.assertEqual(result.fetchall(), ((3,),))
+        self.assertIsNone(result.fetchone())
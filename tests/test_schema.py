@@ -0,0 +1,182 @@
+# -*- coding: utf-8
+"""
+Tests related to schema introspection, diffing and migration.
+"""
+import unittest
+
+from cuttle.reef import Column, Cuttle, Index
+from cuttle.schema import ColumnInfo, diff_table, normalize_type
+
+from test_model_class import MemoryDbTestCase
+
+
+class NormalizeTypeTestCase(unittest.TestCase):
+
+    def test_normalize_type(self):
+        self.assertEqual(normalize_type('int(11)'), 'INT')
+        self.assertEqual(normalize_type('INTEGER'), 'INT')
+        self.assertEqual(normalize_type('varchar(16)'), 'VARCHAR(16)')
+        self.assertEqual(normalize_type('DECIMAL(8, 2)'), 'DECIMAL(8,2)')
+        self.assertEqual(normalize_type('decimal'), 'DECIMAL(10,0)')
+
+
+class DiffTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        db = Cuttle('mysql', db='db')
+
+        class Heros(db.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=32, required=True),
+                Column('age', 'INT'),
+                Column('planet', 'VARCHAR', maximum=16)
+            ]
+            indexes = [Index('hero_name'), Index('age', name='by_age')]
+        self.Model = Heros
+
+        self.columns = [
+            ColumnInfo('hero_id', 'int(11)', True, None, True, False),
+            ColumnInfo('hero_name', 'varchar(16)', False, None, False,
+                       False),
+            ColumnInfo('power', 'int(11)', False, '0', False, False)
+        ]
+        self.indexes = {
+            'by_age': Index('hero_name', name='by_age'),
+            'by_power': Index('power', name='by_power')
+        }
+
+    def diff(self, **kwargs):
+        with self.Model() as heros:
+            return diff_table(heros, self.columns, self.indexes, **kwargs)
+
+    def test_diff(self):
+        diff = self.diff()
+
+        self.assertEqual([(column.name, after)
+                          for column, after in diff.add_columns],
+                         [('age', None), ('planet', None)])
+        self.assertEqual([(column.name, type_changed)
+                          for column, type_changed in diff.modify_columns],
+                         [('hero_name', True)])
+        self.assertEqual(diff.drop_columns, [])
+        self.assertEqual([index.index_name('heros')
+                          for index in diff.add_indexes],
+                         ['ix_heros_hero_name', 'by_age'])
+        self.assertEqual(diff.drop_indexes, ['by_age'])
+
+    def test_drop(self):
+        diff = self.diff(drop=True)
+        self.assertEqual(diff.drop_columns, ['power'])
+        self.assertEqual(sorted(diff.drop_indexes), ['by_age', 'by_power'])
+
+    def test_column_position(self):
+        self.columns.append(ColumnInfo('planet', 'varchar(16)', False, None,
+                                       False, False))
+        diff = self.diff()
+        self.assertEqual([(column.name, after)
+                          for column, after in diff.add_columns],
+                         [('age', 'hero_name')])
+
+    def test_unchanged(self):
+        self.columns[1] = ColumnInfo('hero_name', 'varchar(32)', True, None,
+                                     False, False)
+        self.columns[2:] = [
+            ColumnInfo('age', 'int', False, None, False, False),
+            ColumnInfo('planet', 'varchar(16)', False, None, False, False)
+        ]
+        self.indexes = dict((index.index_name('heros'), index)
+                            for index in self.Model.indexes)
+        self.assertFalse(self.diff())
+
+    def test_statement(self):
+        diff = self.diff()
+        self.assertEqual(diff.statements(), [
+            'ALTER TABLE heros DROP INDEX by_age, '
+            'ADD COLUMN age INT, '
+            'ADD COLUMN planet VARCHAR(16), '
+            'MODIFY COLUMN hero_name VARCHAR(32) NOT NULL, '
+            'ADD INDEX ix_heros_hero_name (hero_name), '
+            'ADD INDEX by_age (age)'
+        ])
+
+    def test_algorithm(self):
+        diff = self.diff()
+        # changing the type of a column copies the table
+        self.assertIsNone(diff.algorithm((8, 0, 30)))
+
+        diff.modify_columns = []
+        self.assertEqual(diff.algorithm((8, 0, 30)), 'INPLACE')
+        self.assertIsNone(diff.algorithm(()))
+
+        diff.add_indexes = diff.drop_indexes = []
+        self.assertEqual(diff.algorithm((8, 0, 30)), 'INSTANT')
+        self.assertEqual(diff.algorithm((8, 0, 12)), 'INSTANT')
+        self.assertEqual(diff.algorithm((5, 7, 40)), 'INPLACE')
+        self.assertTrue(diff.statements((8, 0, 30))[0].endswith(
+            ', ALGORITHM=INSTANT'))
+
+        diff.add_columns[0] = (diff.add_columns[0][0], 'hero_name')
+        self.assertEqual(diff.algorithm((8, 0, 12)), 'INPLACE')
+        self.assertEqual(diff.algorithm((8, 0, 29)), 'INSTANT')
+
+    def test_algorithm_auto_increment(self):
+        # AUTO_INCREMENT columns can only be added by copying the table
+        self.columns = self.columns[1:]
+        diff = self.diff()
+        diff.modify_columns = diff.add_indexes = diff.drop_indexes = []
+        self.assertEqual(diff.add_columns[0][0].name, 'hero_id')
+        self.assertIsNone(diff.algorithm((8, 0, 30)))
+        self.assertIsNone(diff.algorithm((5, 7, 40)))
+        self.assertFalse(diff.statements((8, 0, 30))[0].endswith(
+            'ALGORITHM=INPLACE'))
+
+
+class MigrateTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        self.testtable1.columns = self.testtable1.columns + [
+            Column('age', 'INT', default=20)
+        ]
+        self.testtable1.indexes = [Index('hero_name')]
+
+    def test_dry_run(self):
+        statements = self.db.migrate(dry_run=True)
+        self.assertEqual(statements, [
+            'ALTER TABLE heros ADD COLUMN age INT DEFAULT 20',
+            'CREATE INDEX IF NOT EXISTS ix_heros_hero_name ON heros '
+            '(hero_name)'
+        ])
+        self.assertEqual(len(self.db.diff_schema()), 1)
+
+    def test_sqlite_add_column_constraints(self):
+        self.testtable1.columns = self.testtable1.columns + [
+            Column('code', 'VARCHAR', maximum=8, unique=True)
+        ]
+        self.assertEqual(self.db.migrate(dry_run=True)[1:], [
+            'ALTER TABLE heros ADD COLUMN code VARCHAR(8)',
+            'CREATE INDEX IF NOT EXISTS ix_heros_hero_name ON heros '
+            '(hero_name)',
+            'CREATE UNIQUE INDEX IF NOT EXISTS code ON heros (code)'
+        ])
+        self.db.migrate()
+        self.assertEqual(self.db.diff_schema(), [])
+
+        self.testtable1.columns = self.testtable1.columns + [
+            Column('rank', 'INT', required=True)
+        ]
+        with self.assertRaises(ValueError):
+            self.db.migrate(dry_run=True)
+
+    def test_migrate(self):
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+
+        self.assertEqual(len(self.db.migrate()), 2)
+        self.assertEqual(self.db.diff_schema(), [])
+        self.assertEqual(self.db.migrate(), [])
+
+        with self.testtable1() as heros:
+            heros.select('hero_name', 'age').execute()
+            self.assertEqual(heros.fetchall(), (('Goku', 20),))
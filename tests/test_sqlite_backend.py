@@ -0,0 +1,201 @@
+# -*- coding: utf-8
+"""
+Tests related to the SQLite backend.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import warnings
+
+from cuttle import sqlite
+from cuttle.hooks import StatementHook
+from cuttle.reef import Cuttle, Column, Index
+
+
+class RecordingHook(StatementHook):
+
+    def __init__(self):
+        self.queries = []
+
+    def before(self, event):
+        self.queries.append(event.query)
+
+
+class TranslateQueryTestCase(unittest.TestCase):
+
+    def test_placeholders(self):
+        self.assertEqual(sqlite.translate_query('SELECT * FROM t WHERE a=%s '
+                                                'AND b=%s'),
+                         'SELECT * FROM t WHERE a=? AND b=?')
+
+    def test_escaped_percent(self):
+        self.assertEqual(sqlite.translate_query("SELECT '100%%' FROM t"),
+                         "SELECT '100%' FROM t")
+
+    def test_no_placeholders(self):
+        query = 'SELECT * FROM t'
+        self.assertIs(sqlite.translate_query(query), query)
+
+
+class ConnectTestCase(unittest.TestCase):
+
+    def test_improper_journal_mode(self):
+        with self.assertRaises(ValueError):
+            sqlite.connect('db', memory=True, journal_mode='wrong')
+
+    def test_shared_memory_database(self):
+        con1 = sqlite.connect('_cuttle_shared', memory=True)
+        con2 = sqlite.connect('_cuttle_shared', memory=True)
+
+        cur1 = con1.cursor()
+        cur1.execute('CREATE TABLE t (a INT)')
+        cur1.execute('INSERT INTO t (a) VALUES (%s)', (1,))
+        con1.commit()
+
+        cur2 = con2.cursor()
+        cur2.execute('SELECT a FROM t')
+        self.assertEqual(cur2.fetchall(), ((1,),))
+
+        con1.close()
+        con2.close()
+
+    def test_wal_file_database(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            con = sqlite.connect(os.path.join(tmp, 'db'))
+            cur = con.cursor()
+            cur.execute('PRAGMA journal_mode')
+            self.assertEqual(cur.fetchone(), ('wal',))
+            con.close()
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_ping_closed_connection(self):
+        con = sqlite.connect('_cuttle_ping', memory=True)
+        con.ping()
+        con.close()
+
+        self.assertFalse(con.open)
+        with self.assertRaises(Exception):
+            con.ping()
+
+    def test_memory_database_kept_alive(self):
+        db = Cuttle('sqlite', db='_cuttle_keep_alive', memory=True)
+
+        class Heros(db.Model):
+            columns = [Column('hero_id', 'INT', primary_key=True)]
+        db.create_db()
+
+        # close every pooled connection
+        pool = db.Model._pool
+        while not pool._pool.empty():
+            pool._discard(pool._pool.get_nowait())
+
+        with Heros() as heros:
+            heros.select().execute()
+            self.assertEqual(heros.fetchall(), ())
+
+    def test_cursor_close(self):
+        con = sqlite.connect('_cuttle_cursor', memory=True)
+        cur = con.cursor()
+        cur.close()
+
+        self.assertIsNone(cur.connection)
+        con.close()
+
+
+class SqliteCuttleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Cuttle('sqlite', db='_cuttle_sqlite_test', memory=True)
+
+        class Heros(self.db.Model):
+            columns = [
+                Column('hero_id', 'INT', auto_increment=True, primary_key=True),
+                Column('hero_name', 'VARCHAR', maximum=16)
+            ]
+            indexes = [Index('hero_name', unique=True)]
+        self.testtable1 = Heros
+
+        self.db.create_db()
+
+    def tearDown(self):
+        self.db.drop_db()
+
+    def tables(self):
+        with self.db.Model() as model:
+            model.append_query("SELECT name FROM sqlite_master WHERE "
+                               "type='table' AND name NOT LIKE 'sqlite_%%'")
+            model.execute()
+            return [row[0] for row in model.fetchall()]
+
+    def test_create_db(self):
+        self.assertEqual(sorted(self.tables()), [self.db.schema_table,
+                                                 self.testtable1().name])
+
+    def test_create_db_skips_unchanged_tables(self):
+        hook = RecordingHook()
+        self.db.add_hook(hook)
+        self.addCleanup(self.db.remove_hook, hook)
+
+        self.db.create_db()
+        self.assertFalse([query for query in hook.queries
+                          if query.startswith('CREATE TABLE IF NOT EXISTS '
+                                              'heros')])
+
+        # changed tables are left to migrate()
+        self.testtable1.indexes = [Index('hero_name')]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.db.create_db()
+        self.assertEqual(len(caught), 1)
+
+        self.db.migrate()
+        self.assertIn('CREATE INDEX IF NOT EXISTS ix_heros_hero_name ON '
+                      'heros (hero_name)', hook.queries)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.db.create_db()
+        self.assertEqual(caught, [])
+
+        # missing tables are created again
+        with self.db.Model() as model:
+            model.append_query('DROP TABLE heros')
+            model.execute(commit=True)
+        self.db.create_db()
+        self.assertEqual(sorted(self.tables()), [self.db.schema_table,
+                                                 self.testtable1().name])
+
+    def test_create_indexes(self):
+        with self.db.Model() as model:
+            model.append_query("SELECT name FROM sqlite_master WHERE "
+                               "type='index' AND tbl_name=%s")
+            model.extend_values([self.testtable1().name])
+            model.execute()
+            self.assertEqual(model.fetchall(), (('ix_heros_hero_name',),))
+
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], ['Goku']).execute(commit=True)
+            heros.insert(['hero_name'], ['Goku'])
+            self.assertRaises(sqlite3.IntegrityError, heros.execute)
+
+    def test_drop_db(self):
+        self.db.drop_db()
+        self.assertEqual(self.tables(), [])
+
+    def test_auto_increment(self):
+        with self.testtable1() as heros:
+            heros.insert(['hero_name'], [['Goku'], ['Vegeta']])\
+                 .executemany(commit=True)
+            heros.select('hero_id').execute()
+            self.assertEqual(heros.fetchall(), ((1,), (2,)))
+
+    def test_transaction(self):
+        with self.db.transaction() as t:
+            self.testtable1(t).insert(['hero_name'], ['Goku']).execute()
+
+        with self.testtable1() as heros:
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchone(), ('Goku',))
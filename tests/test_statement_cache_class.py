@@ -0,0 +1,47 @@
+# -*- coding: utf-8
+"""
+Tests related to the StatementCache class.
+"""
+import unittest
+
+from cuttle.cache import StatementCache
+
+
+class StatementCacheTestCase(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = StatementCache()
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', 'SELECT * FROM t')
+        self.assertEqual(cache.get('key'), 'SELECT * FROM t')
+        self.assertEqual(cache.info(),
+                         dict(hits=1, misses=1, size=1, maxsize=128))
+
+    def test_evicts_least_recently_used(self):
+        cache = StatementCache(2)
+        cache.put('a', 'a')
+        cache.put('b', 'b')
+        cache.get('a')
+        cache.put('c', 'c')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertEqual(cache.get('c'), 'c')
+
+    def test_zero_maxsize(self):
+        cache = StatementCache(0)
+        cache.put('a', 'a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_negative_maxsize(self):
+        with self.assertRaises(ValueError):
+            StatementCache(-1)
+
+    def test_clear(self):
+        cache = StatementCache()
+        cache.put('a', 'a')
+        cache.get('a')
+        cache.clear()
+        self.assertEqual(cache.info(),
+                         dict(hits=0, misses=0, size=0, maxsize=128))
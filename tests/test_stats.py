@@ -0,0 +1,90 @@
+# -*- coding: utf-8
+"""
+Tests related to the QueryStats hook.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cuttle.stats import QueryStats, fingerprint
+
+from test_model_class import MemoryDbTestCase
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM heros WHERE hero_name = 'Go''ku' "
+                        "AND power > 9000.5 AND hero_id = %s"),
+            'SELECT * FROM heros WHERE hero_name = ? AND power > ? '
+            'AND hero_id = ?')
+
+    def test_identifiers_kept(self):
+        self.assertEqual(fingerprint('SELECT t1.a2 FROM t1'),
+                         'SELECT t1.a2 FROM t1')
+
+    def test_in_list(self):
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE a IN (1, 2, 3)'),
+                         'SELECT * FROM t WHERE a IN (...)')
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE a IN (%s)'),
+                         'SELECT * FROM t WHERE a IN (...)')
+
+    def test_values_rows(self):
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (?, ?), ...')
+
+    def test_whitespace(self):
+        self.assertEqual(fingerprint('SELECT *\n  FROM t '), 'SELECT * FROM t')
+
+
+class QueryStatsTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+        self.stats = QueryStats()
+        self.db.add_hook(self.stats)
+
+    def test_snapshot(self):
+        with self.testtable1() as heros:
+            heros.bulk_insert(['hero_name'], [('Goku',), ('Gohan',)],
+                              commit=True)
+            for hero_id in (1, 2):
+                heros.select('hero_name').where(hero_id=hero_id).execute()
+                heros.fetchall()
+
+        snapshot = dict((entry['fingerprint'], entry)
+                        for entry in self.stats.snapshot())
+
+        select = snapshot['SELECT hero_name FROM heros WHERE hero_id=?']
+        self.assertEqual(select['calls'], 2)
+        self.assertEqual(select['rows_returned'], 2)
+        self.assertEqual(select['errors'], 0)
+        self.assertTrue(select['p99_time'] >= select['mean_time'])
+
+        insert = snapshot['INSERT INTO heros (hero_name) VALUES (?), ...']
+        self.assertEqual(insert['rows_affected'], 2)
+
+    def test_dump(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'stats.json')
+
+        with self.testtable1() as heros:
+            heros.select().execute()
+
+        self.stats.start_dumping(path, interval=60)
+        self.stats.stop_dumping()
+
+        with open(path) as f:
+            dumped = json.load(f)
+        self.assertEqual(dumped[0]['fingerprint'], 'SELECT * FROM heros')
+
+    def test_reset(self):
+        with self.testtable1() as heros:
+            heros.select().execute()
+        self.stats.reset()
+        self.assertEqual(self.stats.snapshot(), [])
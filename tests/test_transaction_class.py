@@ -2,9 +2,11 @@
 """
 Tests related to the Transaction class.
 """
-from cuttle.transaction import Transaction
+import unittest
 
-from test_model_class import ModelTestCase
+from cuttle.transaction import StatementResult, Transaction
+
+from test_model_class import MemoryDbTestCase, ModelTestCase
 
 
 class TransactionTestCase(ModelTestCase):
@@ -24,3 +26,137 @@ class TransactionCloseTestCase(TransactionTestCase):
 
         t.end()
         self.assertIsNone(t._connection)
+
+
+class TransactionPipelineTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+
+    def select_names(self):
+        with self.testtable1() as heros:
+            heros.select('hero_name').execute()
+            return [row[0] for row in heros.fetchall()]
+
+    def test_writes_queued(self):
+        with self.db.transaction(pipeline=True) as t:
+            heros = self.testtable1(transaction=t)
+            self.assertIsNone(
+                heros.insert(['hero_name'], ['Goku']).execute())
+            heros.insert(['hero_name'], ['Gohan']).execute()
+            self.assertEqual(t.pending, 2)
+
+            results = t.commit()
+
+        self.assertEqual([r.rowcount for r in results], [1, 1])
+        self.assertEqual([r.lastrowid for r in results], [1, 2])
+        self.assertEqual(self.select_names(), ['Goku', 'Gohan'])
+
+    def test_read_flushes(self):
+        with self.db.transaction(pipeline=True) as t:
+            heros = self.testtable1(transaction=t)
+            heros.insert(['hero_name'], ['Goku']).execute()
+            heros.select('hero_name').execute()
+            self.assertEqual(heros.fetchall(), (('Goku',),))
+            self.assertEqual(t.pending, 0)
+            self.assertEqual(len(t.results), 1)
+
+    def test_stream_flushes(self):
+        with self.db.transaction(pipeline=True) as t:
+            heros = self.testtable1(transaction=t)
+            heros.insert(['hero_name'], ['Goku']).execute()
+            rows = list(heros.select('hero_name').stream())
+            self.assertEqual(rows, [('Goku',)])
+            self.assertEqual(t.pending, 0)
+
+    def test_executemany_queued(self):
+        with self.db.transaction(pipeline=True) as t:
+            heros = self.testtable1(transaction=t)
+            heros.insert(['hero_name'], [['Goku'], ['Gohan']]).executemany()
+            self.assertEqual(t.pending, 2)
+
+        self.assertEqual(self.select_names(), ['Goku', 'Gohan'])
+
+    def test_bulk_insert_queued(self):
+        with self.db.transaction(pipeline=True) as t:
+            heros = self.testtable1(transaction=t)
+            rows = [['Goku'], ['Gohan'], ['Goten']]
+            self.assertIsNone(
+                heros.bulk_insert(['hero_name'], rows, chunk_size=2))
+            self.assertEqual(t.pending, 2)
+            self.assertEqual(heros.load(['hero_name'], [['Trunks']]),
+                             (None, []))
+
+        self.assertEqual(self.select_names(),
+                         ['Goku', 'Gohan', 'Goten', 'Trunks'])
+
+    def test_rollback_discards_queue(self):
+        t = self.db.transaction(pipeline=True)
+        heros = self.testtable1(transaction=t)
+        heros.insert(['hero_name'], ['Goku']).execute()
+        t.rollback()
+        t.end()
+
+        self.assertEqual(t.pending, 0)
+        self.assertEqual(self.select_names(), [])
+
+
+class FakeCursor(object):
+
+    def __init__(self, rowcounts):
+        self.connection = True
+        self.rowcounts = rowcounts
+        self.executed = []
+
+    def mogrify(self, query, values):
+        return query % values
+
+    def execute(self, query):
+        self.executed.append(query)
+        self.results = iter(self.rowcounts.pop(0))
+        self.nextset()
+
+    def nextset(self):
+        self.rowcount = next(self.results, None)
+        if self.rowcount is None:
+            return None
+        self.lastrowid = self.rowcount * 10
+        return True
+
+
+class FakeConnection(object):
+    client_flag = 1 << 16
+
+    def __init__(self, cursor):
+        self._cur = cursor
+
+    def cursor(self):
+        return self._cur
+
+
+class TransactionMultiStatementTestCase(unittest.TestCase):
+
+    def test_single_packet(self):
+        cursor = FakeCursor([[1, 2, 3]])
+        t = Transaction(FakeConnection(cursor), pipeline=True)
+        for n in (1, 2, 3):
+            t.queue('UPDATE heros SET n = %s', [n])
+
+        self.assertEqual(t.flush(), [
+            StatementResult('UPDATE heros SET n = %s', 1, 10),
+            StatementResult('UPDATE heros SET n = %s', 2, 20),
+            StatementResult('UPDATE heros SET n = %s', 3, 30)
+        ])
+        self.assertEqual(cursor.executed, [
+            'UPDATE heros SET n = 1;UPDATE heros SET n = 2;'
+            'UPDATE heros SET n = 3'])
+
+    def test_packets_split(self):
+        cursor = FakeCursor([[1, 1], [1]])
+        t = Transaction(FakeConnection(cursor), pipeline=True)
+        t.pipeline_max_bytes = 50
+        for n in (1, 2, 3):
+            t.queue('UPDATE heros SET n = %s', [n])
+
+        self.assertEqual(len(t.flush()), 3)
+        self.assertEqual(len(cursor.executed), 2)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8
+"""
+Tests related to the BufferedWriter class.
+"""
+import threading
+import time
+
+from cuttle.writer import BufferedWriter
+
+from test_model_class import MemoryDbTestCase
+
+
+class BufferedWriterTestCase(MemoryDbTestCase):
+
+    def setUp(self):
+        self.db, self.testtable1 = self.createModel()
+
+    def count(self):
+        with self.testtable1() as heros:
+            heros.select().execute()
+            return len(heros.fetchall())
+
+    def test_improper_thresholds(self):
+        with self.assertRaises(ValueError):
+            BufferedWriter(self.db, max_rows=0)
+        with self.assertRaises(ValueError):
+            BufferedWriter(self.db, max_rows=10, max_buffered=5)
+
+    def test_flush_on_close(self):
+        with self.db.writer(max_latency=60) as writer:
+            for i in range(5):
+                writer.insert(self.testtable1, ['hero_name'],
+                              ['Hero{}'.format(i)])
+            self.assertEqual(writer.buffered, 5)
+
+        self.assertEqual(self.count(), 5)
+        self.assertEqual(writer.rows_written, 5)
+        self.assertEqual(writer.flushes, 1)
+
+    def test_flush_on_max_rows(self):
+        writer = self.db.writer(max_rows=3, max_latency=60)
+        self.addCleanup(writer.close)
+        for i in range(3):
+            writer.insert(self.testtable1, ['hero_name'], ['Hero{}'.format(i)])
+
+        deadline = time.time() + 5
+        while writer.rows_written < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count(), 3)
+
+    def test_flush_on_max_latency(self):
+        writer = self.db.writer(max_latency=0.05)
+        self.addCleanup(writer.close)
+        writer.insert(self.testtable1, ['hero_name'], ['Goku'])
+
+        deadline = time.time() + 5
+        while writer.rows_written < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count(), 1)
+
+    def test_explicit_flush(self):
+        writer = self.db.writer(max_latency=60)
+        self.addCleanup(writer.close)
+        writer.insert(self.testtable1, ['hero_name'], ['Goku'])
+
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(self.count(), 1)
+
+    def test_many_threads(self):
+        writer = self.db.writer(max_rows=50, max_buffered=100)
+
+        def ingest(n):
+            for i in range(100):
+                writer.insert(self.testtable1, ['hero_name'],
+                              ['T{}-{}'.format(n, i)])
+
+        threads = [threading.Thread(target=ingest, args=(n,))
+                   for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.close()
+
+        self.assertEqual(self.count(), 400)
+
+    def test_insert_after_close(self):
+        writer = self.db.writer()
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.insert(self.testtable1, ['hero_name'], ['Goku'])
+
+    def test_wrong_row_length(self):
+        with self.db.writer() as writer:
+            with self.assertRaises(ValueError):
+                writer.insert(self.testtable1, ['hero_name'], [])
+
+    def test_error_raised(self):
+        writer = self.db.writer(max_latency=60)
+        writer.insert(self.testtable1, ['villain_name'], ['Frieza'])
+        with self.assertRaises(ValueError):
+            writer.close()